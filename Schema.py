@@ -1,7 +1,7 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import Dict, List, Optional
 from enum import Enum
-from datetime import datetime
+from datetime import date, datetime
 
 # ------------------ USER SCHEMAS ------------------
 
@@ -24,12 +24,15 @@ class User(UserBase):
     class Config:
         from_attributes = True
 
+class UserInDB(User):
+    password_hash: str
+
 class UserUpdate(BaseModel):
-    name: Optional[str]
-    email: Optional[EmailStr]
-    role: Optional[UserRole]
-    contact: Optional[str]
-    password_hash: Optional[str]
+    name: Optional[str] = None
+    email: Optional[EmailStr] = None
+    role: Optional[UserRole] = None
+    contact: Optional[str] = None
+    password_hash: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -56,8 +59,8 @@ class Flight(FlightBase):
         from_attributes = True
 
 class FlightUpdate(BaseModel):
-    price: Optional[float]
-    seats_available: Optional[int]
+    price: Optional[float] = None
+    seats_available: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -80,10 +83,13 @@ class Hotel(HotelBase):
     class Config:
         from_attributes = True
 
+class HotelAvailability(Hotel):
+    rooms_free: int
+
 class HotelUpdate(BaseModel):
-    available_rooms: Optional[int]
-    price_per_night: Optional[float]
-    rating: Optional[float]
+    available_rooms: Optional[int] = None
+    price_per_night: Optional[float] = None
+    rating: Optional[float] = None
 
     class Config:
         from_attributes = True
@@ -114,9 +120,9 @@ class Booking(BookingBase):
         from_attributes = True
 
 class BookingUpdate(BaseModel):
-    check_in: Optional[datetime]
-    check_out: Optional[datetime]
-    total_amount: Optional[float]
+    check_in: Optional[datetime] = None
+    check_out: Optional[datetime] = None
+    total_amount: Optional[float] = None
 
     class Config:
         from_attributes = True
@@ -151,9 +157,172 @@ class Payment(PaymentBase):
         from_attributes = True
 
 class PaymentUpdate(BaseModel):
-    status: Optional[PaymentStatus]
-    amount: Optional[float]
-    method: Optional[PaymentMethod]
+    status: Optional[PaymentStatus] = None
+    amount: Optional[float] = None
+    method: Optional[PaymentMethod] = None
 
     class Config:
         from_attributes = True
+
+# ------------------ ITINERARY SCHEMAS ------------------
+
+class ItinerarySort(str, Enum):
+    price = "price"
+    duration = "duration"
+
+class Itinerary(BaseModel):
+    flights: List[Flight]
+    stops: int
+    total_price: float
+    departure_time: datetime
+    arrival_time: datetime
+    duration_minutes: float
+
+# ------------------ EXPORT SCHEMAS ------------------
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+class ArrowFormat(str, Enum):
+    parquet = "parquet"
+    arrow = "arrow"
+
+# ------------------ BULK SCHEMAS ------------------
+
+class BulkItemError(BaseModel):
+    index: int
+    detail: str
+
+class BulkResult(BaseModel):
+    succeeded: List[int]
+    errors: List[BulkItemError]
+
+class ImportResult(BaseModel):
+    imported: int
+    failed: int
+    errors: List[BulkItemError]
+
+# ------------------ IDEMPOTENCY SCHEMAS ------------------
+
+class IdempotentResponse(BaseModel):
+    key: str
+    fingerprint: str
+    status_code: int
+    content_type: Optional[str] = None
+    body: str
+    expires_at: float
+
+    class Config:
+        from_attributes = True
+
+# ------------------ CHANGE FEED SCHEMAS ------------------
+
+class ChangeResource(str, Enum):
+    users = "users"
+    flights = "flights"
+    hotels = "hotels"
+    bookings = "bookings"
+    payments = "payments"
+
+# ------------------ CACHE SCHEMAS ------------------
+
+class CacheStats(BaseModel):
+    entries: int
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+
+# ------------------ ANALYTICS SCHEMAS ------------------
+
+class RevenueGroupBy(str, Enum):
+    day = "day"
+    airline = "airline"
+    hotel = "hotel"
+    method = "method"
+
+class RevenueBasis(str, Enum):
+    payments = "payments"
+    bookings = "bookings"
+
+class RevenueGroup(BaseModel):
+    key: str
+    revenue: float
+    count: int
+
+class FlightLoad(BaseModel):
+    flight_id: int
+    flight_number: str
+    airline: str
+    seats_sold: int
+    seats_available: int
+    load_factor: float
+
+class HotelOccupancy(BaseModel):
+    hotel_id: int
+    name: str
+    location: str
+    available_rooms: int
+    room_nights: int
+    occupancy: float
+
+# ------------------ AGGREGATE SCHEMAS ------------------
+
+class StatusRevenue(BaseModel):
+    status: PaymentStatus
+    revenue: float
+    count: int
+
+class FlightBookings(BaseModel):
+    flight_id: int
+    bookings: int
+
+class HotelNight(BaseModel):
+    night: date
+    rooms_booked: int
+
+class AggregateCheck(BaseModel):
+    runs: int
+    last_checked: Optional[datetime] = None
+    corrections: Dict[str, int]
+
+# ------------------ PAGE SCHEMAS ------------------
+
+class UserPage(BaseModel):
+    items: List[User]
+    next_cursor: Optional[str] = None
+
+class FlightPage(BaseModel):
+    items: List[Flight]
+    next_cursor: Optional[str] = None
+
+class HotelPage(BaseModel):
+    items: List[Hotel]
+    next_cursor: Optional[str] = None
+
+class BookingPage(BaseModel):
+    items: List[Booking]
+    next_cursor: Optional[str] = None
+
+class PaymentPage(BaseModel):
+    items: List[Payment]
+    next_cursor: Optional[str] = None
+
+# ------------------ COMPOSITE SCHEMAS ------------------
+
+class BookingExpand(str, Enum):
+    user = "user"
+    flight = "flight"
+    hotel = "hotel"
+    payment = "payment"
+
+class BookingDetails(Booking):
+    user: Optional[User] = None
+    flight: Optional[Flight] = None
+    hotel: Optional[Hotel] = None
+    payment: Optional[Payment] = None
+
+class BookingDetailsPage(BaseModel):
+    items: List[BookingDetails]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,205 @@
+import asyncio
+import re
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, NamedTuple, Optional, Tuple
+
+from metrics import admission_wait, requests_coalesced, requests_shed
+
+# ------------------ ADMISSION CONTROL ------------------
+
+class Limit(NamedTuple):
+    concurrency: int
+    queue: int = 0
+    # Longest a request may wait for a slot, in seconds.
+    timeout: float = 0.0
+
+
+class ConcurrencyLimiter:
+    """At most ``concurrency`` holders; up to ``queue`` more wait in FIFO order.
+
+    Waiting is capped at ``timeout`` seconds. A released slot goes straight
+    to the oldest waiter, so a newcomer cannot overtake the queue.
+    """
+
+    def __init__(self, limit: Limit):
+        self.limit = limit
+        self.active = 0
+        self._waiters: "deque[asyncio.Future]" = deque()
+
+    async def acquire(self) -> Optional[str]:
+        """None once a slot is held, otherwise why none was given."""
+        if self.active < self.limit.concurrency and not self._waiters:
+            self.active += 1
+            return None
+        if len(self._waiters) >= self.limit.queue:
+            return "queue_full"
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await asyncio.wait_for(future, self.limit.timeout)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                # Handed a slot just as the wait ran out.
+                return None
+            self._discard(future)
+            return "timeout"
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                self._discard(future)
+            raise
+        return None
+
+    def release(self) -> None:
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def _discard(self, future: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(future)
+        except ValueError:
+            pass
+
+
+class SingleFlight:
+    """Runs one call per key at a time; same-key callers meanwhile share its result."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """The result of ``call()`` and whether it came from another caller's call."""
+        running = self._calls.get(key)
+        if running is not None:
+            try:
+                return await asyncio.shield(running), True
+            except asyncio.CancelledError:
+                if not running.cancelled():
+                    raise
+                # The caller running it went away; run it for this one.
+                return await self.do(key, call)
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            del self._calls[key]
+        return result, False
+
+
+class AdmissionMiddleware:
+    """Plain ASGI middleware shedding load and coalescing identical reads.
+
+    Requests to a route in ``limits`` take a slot from that route's
+    ConcurrencyLimiter; all other routes share one built from ``default``.
+    A request that finds the queue full, or waits longer than its
+    budget, is answered 503 with Retry-After straight away. Under a spike,
+    requests that cannot be served in time are turned away quickly instead
+    of piling up in the event loop and threadpool, which would make every
+    request late.
+
+    GETs to a route in ``coalesce`` that arrive while an identical one (same
+    URL and If-None-Match) is running wait for it and get a copy of its
+    response, without a slot of their own. The response is buffered, so
+    only routes answering with a small, unstreamed body belong there.
+    """
+
+    def __init__(self, app, routes: List[Any], limits: Dict[str, Limit], default: Limit,
+                 coalesce: Iterable[str] = (), retry_after: int = 1):
+        self.app = app
+        self.coalesce = set(coalesce)
+        self.retry_after = retry_after
+        self._limiters = {path: ConcurrencyLimiter(limit) for path, limit in limits.items()}
+        self._default = ConcurrencyLimiter(default)
+        self._flights = SingleFlight()
+        self._patterns = self._compile(routes)
+
+    @staticmethod
+    def _compile(routes: List[Any]) -> Dict[str, Tuple[re.Pattern, List[str]]]:
+        # One alternation of the route regexes per method, in routing order,
+        # so the first alternative that matches is the route the router
+        # would pick. One regex search instead of a match per route.
+        entries: Dict[str, List[Tuple[str, str]]] = {}
+        for route in routes:
+            regex, methods = getattr(route, "path_regex", None), getattr(route, "methods", None)
+            if regex is None or not methods:
+                continue
+            pattern = re.sub(r"\(\?P<\w+>", "(?:", regex.pattern.removeprefix("^").removesuffix("$"))
+            for method in methods:
+                entries.setdefault(method, []).append((f"({pattern})", route.path))
+        return {
+            method: (re.compile("|".join(pattern for pattern, _ in routes)), [path for _, path in routes])
+            for method, routes in entries.items()
+        }
+
+    def _route(self, scope) -> Optional[str]:
+        compiled = self._patterns.get(scope["method"])
+        if compiled is None:
+            return None
+        match = compiled[0].fullmatch(scope["path"])
+        return compiled[1][match.lastindex - 1] if match else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        path = self._route(scope)
+        if path not in self.coalesce or scope["method"] != "GET":
+            return await self._admit(path, scope, receive, send)
+
+        headers = dict(scope["headers"])
+        if b"x-profile" in headers:
+            return await self._admit(path, scope, receive, send)
+        key = (scope["path"], scope["query_string"], headers.get(b"if-none-match"))
+        messages, shared = await self._flights.do(key, lambda: self._buffered(path, scope, receive))
+        if shared:
+            requests_coalesced.inc(path)
+        for message in messages:
+            await send(dict(message))
+
+    async def _buffered(self, path: Optional[str], scope, receive) -> List[dict]:
+        messages = []
+
+        async def collect(message):
+            messages.append(message)
+
+        await self._admit(path, scope, receive, collect)
+        return messages
+
+    async def _admit(self, path: Optional[str], scope, receive, send) -> None:
+        limiter = self._limiters.get(path, self._default)
+        label = path if path in self._limiters else "default"
+        started = time.perf_counter()
+        refused = await limiter.acquire()
+        if refused is not None:
+            requests_shed.inc(label, refused)
+            return await self._shed(send)
+        admission_wait.observe(time.perf_counter() - started, label)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+    async def _shed(self, send) -> None:
+        body = b'{"detail":"Server is busy, retry later"}'
+        await send({"type": "http.response.start", "status": 503, "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(self.retry_after).encode()),
+        ]})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,107 @@
+import time
+from collections import defaultdict
+from enum import Enum
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+# ------------------ MATERIALIZED AGGREGATES ------------------
+
+class GroupTotals:
+    """Row count (and optionally a summed amount) per value of ``group``.
+
+    Registered on a table, so each insert or remove costs O(1); an update
+    arrives as remove(old) + insert(new), which moves the row between
+    groups when e.g. a payment goes from pending to successful. Amounts are
+    kept in integer cents so that repeated adds and subtracts never drift.
+    """
+
+    def __init__(self, group: str, amount: Optional[str] = None):
+        self.group = group
+        self.amount = amount
+        self.counts: Dict[Hashable, int] = defaultdict(int)
+        self.cents: Dict[Hashable, int] = defaultdict(int)
+
+    def _key(self, record) -> Optional[Hashable]:
+        key = getattr(record, self.group)
+        return key.value if isinstance(key, Enum) else key
+
+    def _add(self, record, sign: int) -> None:
+        key = self._key(record)
+        if key is None:
+            return
+        self.counts[key] += sign
+        if self.amount is not None:
+            self.cents[key] += sign * round(getattr(record, self.amount) * 100)
+        if not self.counts[key]:
+            del self.counts[key]
+            self.cents.pop(key, None)
+
+    def insert(self, record) -> None:
+        self._add(record, 1)
+
+    def remove(self, record) -> None:
+        self._add(record, -1)
+
+    def count(self, key: Hashable) -> int:
+        return self.counts.get(key, 0)
+
+    def total(self, key: Hashable) -> float:
+        return self.cents.get(key, 0) / 100
+
+    # Consistency checks (see verify).
+
+    def state(self) -> Dict[Tuple[Hashable, str], int]:
+        state = {(key, "count"): count for key, count in self.counts.items()}
+        state.update({(key, "cents"): cents for key, cents in self.cents.items() if cents})
+        return state
+
+    def fresh(self) -> "GroupTotals":
+        return GroupTotals(self.group, self.amount)
+
+    def apply(self, drift: Dict[Tuple[Hashable, str], int]) -> None:
+        for (key, part), delta in drift.items():
+            values = self.counts if part == "count" else self.cents
+            values[key] += delta
+        for key in [key for key, count in self.counts.items() if not count]:
+            del self.counts[key]
+            self.cents.pop(key, None)
+
+
+def verify(table, aggregate) -> int:
+    """Recompute ``aggregate`` from every row of ``table``; fix and count any drift.
+
+    Rows and the aggregate's state are captured together under the table
+    lock, which is where every update to the aggregate happens, so the
+    comparison is exact. The recompute itself runs without the lock, and
+    corrections are applied as deltas so later updates are kept.
+    """
+    with table.lock:
+        rows = list(table)
+        seen = aggregate.state()
+        expected = aggregate.fresh()
+    for row in rows:
+        expected.insert(row)
+    expected = expected.state()
+    drift = {key: expected.get(key, 0) - seen.get(key, 0)
+             for key in expected.keys() | seen.keys() if expected.get(key, 0) != seen.get(key, 0)}
+    if drift:
+        with table.lock:
+            aggregate.apply(drift)
+    return len(drift)
+
+
+class Verifier:
+    """Runs ``verify`` over named (table, aggregate) pairs and keeps the results."""
+
+    def __init__(self, aggregates: Dict[str, Tuple[Any, Any]]):
+        self.aggregates = aggregates
+        self.runs = 0
+        self.last_checked: Optional[float] = None
+        self.corrections: Dict[str, int] = {name: 0 for name in aggregates}
+
+    def run(self) -> Dict[str, int]:
+        found = {name: verify(table, aggregate) for name, (table, aggregate) in self.aggregates.items()}
+        for name, count in found.items():
+            self.corrections[name] += count
+        self.runs += 1
+        self.last_checked = time.time()
+        return found
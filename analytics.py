@@ -0,0 +1,154 @@
+from datetime import date, datetime
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from columns import ColumnStore
+from Schema import BookingType
+
+# ------------------ ANALYTICS ------------------
+
+# Everything here reads ColumnStore arrays and aggregates with numpy/pandas;
+# no per-record Python runs at query time. Bookings whose inventory was
+# released (failed payment) are left out of bookings-based figures, and, as
+# in inventory.py, only flight bookings take seats and hotel bookings rooms.
+
+PAYMENT_COLUMNS = {"booking_id": "int", "amount": "float", "payment_date": "datetime",
+                   "method": "category", "status": "category"}
+BOOKING_COLUMNS = {"booking_type": "category", "flight_id": "ref", "hotel_id": "ref", "check_in": "datetime",
+                   "check_out": "datetime", "booking_date": "datetime", "total_amount": "float"}
+FLIGHT_COLUMNS = {"flight_number": "object", "airline": "category", "seats_available": "int"}
+HOTEL_COLUMNS = {"name": "object", "location": "category", "available_rooms": "int"}
+
+
+def _category_code(store: ColumnStore, column: str, value) -> int:
+    """The code of ``value`` in a category column, -1 if it never occurred."""
+    labels = store.labels(column)
+    matches = np.flatnonzero(labels == getattr(value, "value", value))
+    return int(matches[0]) if len(matches) else -1
+
+
+def _date_mask(stamps: np.ndarray, start: Optional[datetime], end: Optional[datetime]) -> np.ndarray:
+    mask = np.ones(len(stamps), dtype=bool)
+    if start is not None:
+        mask &= stamps >= np.datetime64(start, "s")
+    if end is not None:
+        mask &= stamps <= np.datetime64(end, "s")
+    return mask
+
+
+def _active(ids: np.ndarray, released: Set[int]) -> np.ndarray:
+    if not released:
+        return np.ones(len(ids), dtype=bool)
+    return ~np.isin(ids, np.fromiter(released, dtype=np.int64, count=len(released)))
+
+
+def revenue(payments: ColumnStore, bookings: ColumnStore, flights: ColumnStore, released: Set[int],
+            group_by: str, basis: str = "payments", status=None,
+            start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[Dict]:
+    """Revenue and row count per day, airline, hotel or payment method.
+
+    ``basis="payments"`` sums Payment.amount (optionally one status);
+    ``basis="bookings"`` sums Booking.total_amount of bookings that hold
+    inventory, optionally only those with a payment in ``status``. Airline
+    and hotel are reached through the booking.
+    """
+    if basis == "payments":
+        cols = payments.arrays("booking_id", "amount", "payment_date", "method", "status")
+        mask = _date_mask(cols["payment_date"], start, end)
+        if status is not None:
+            mask &= cols["status"] == _category_code(payments, "status", status)
+        frame = pd.DataFrame({"amount": cols["amount"][mask], "when": cols["payment_date"][mask],
+                              "method": cols["method"][mask], "booking_id": cols["booking_id"][mask]})
+    else:
+        if group_by == "method":
+            raise ValueError("group_by=method needs basis=payments")
+        cols = bookings.arrays("total_amount", "booking_date")
+        mask = _date_mask(cols["booking_date"], start, end) & _active(cols["booking_id"], released)
+        if status is not None:
+            paid = payments.arrays("booking_id", "status")
+            matching = paid["booking_id"][paid["status"] == _category_code(payments, "status", status)]
+            mask &= np.isin(cols["booking_id"], matching)
+        frame = pd.DataFrame({"amount": cols["total_amount"][mask], "when": cols["booking_date"][mask],
+                              "booking_id": cols["booking_id"][mask]})
+
+    if group_by == "day":
+        keys = frame["when"].dt.strftime("%Y-%m-%d")
+    elif group_by == "method":
+        keys = pd.Series(payments.labels("method")[frame["method"].to_numpy()], index=frame.index)
+    else:
+        booking_cols = bookings.arrays("flight_id", "hotel_id")
+        by_booking = pd.DataFrame({"flight_id": booking_cols["flight_id"], "hotel_id": booking_cols["hotel_id"]},
+                                  index=booking_cols["booking_id"])
+        refs = by_booking.reindex(frame["booking_id"].to_numpy(), fill_value=-1)
+        if group_by == "hotel":
+            hotel_ids = refs["hotel_id"].to_numpy()
+            keep = hotel_ids >= 0
+            frame, keys = frame[keep], pd.Series(hotel_ids[keep].astype(str), index=frame.index[keep])
+        else:
+            flight_cols = flights.arrays("airline")
+            airline_of = pd.Series(flights.labels("airline")[flight_cols["airline"]], index=flight_cols["flight_id"])
+            airlines = airline_of.reindex(refs["flight_id"].to_numpy()).to_numpy()
+            keep = pd.notna(airlines)
+            frame, keys = frame[keep], pd.Series(airlines[keep], index=frame.index[keep])
+
+    grouped = frame["amount"].groupby(keys).agg(["sum", "count"])
+    grouped = grouped.sort_index() if group_by == "day" else grouped.sort_values("sum", ascending=False)
+    return [{"key": str(key), "revenue": round(float(total), 2), "count": int(count)}
+            for key, total, count in zip(grouped.index.tolist(), grouped["sum"].tolist(), grouped["count"].tolist())]
+
+
+def load_factor(flights: ColumnStore, bookings: ColumnStore, released: Set[int],
+                airline: Optional[str] = None, limit: int = 100) -> List[Dict]:
+    """Seats sold / (seats sold + seats_available) per flight, highest first."""
+    flight_cols = flights.arrays("flight_number", "airline", "seats_available")
+    booking_cols = bookings.arrays("booking_type", "flight_id")
+    seats_taken = booking_cols["booking_type"] == _category_code(bookings, "booking_type", BookingType.flight)
+    sold_ids = booking_cols["flight_id"][seats_taken & (booking_cols["flight_id"] >= 0)
+                                         & _active(booking_cols["booking_id"], released)]
+    sold = pd.Series(sold_ids).value_counts().reindex(flight_cols["flight_id"], fill_value=0).to_numpy()
+
+    seats = flight_cols["seats_available"]
+    capacity = sold + seats
+    factor = np.divide(sold, capacity, out=np.zeros(len(sold), dtype=np.float64), where=capacity > 0)
+
+    mask = np.ones(len(factor), dtype=bool)
+    if airline is not None:
+        mask &= flight_cols["airline"] == _category_code(flights, "airline", airline)
+    order = np.flatnonzero(mask)
+    order = order[np.argsort(-factor[order], kind="stable")[:limit]]
+    airlines = flights.labels("airline")
+    return [{"flight_id": int(flight_cols["flight_id"][i]), "flight_number": flight_cols["flight_number"][i],
+             "airline": airlines[flight_cols["airline"][i]], "seats_sold": int(sold[i]),
+             "seats_available": int(seats[i]), "load_factor": round(float(factor[i]), 4)} for i in order]
+
+
+def occupancy(hotels: ColumnStore, bookings: ColumnStore, released: Set[int], start: date, end: date,
+              location: Optional[str] = None, limit: int = 100) -> List[Dict]:
+    """Booked room-nights / (available_rooms x nights) over [start, end), highest first."""
+    nights = (end - start).days
+    hotel_cols = hotels.arrays("name", "location", "available_rooms")
+    booking_cols = bookings.arrays("booking_type", "hotel_id", "check_in", "check_out")
+    check_in = booking_cols["check_in"].astype("datetime64[D]")
+    check_out = booking_cols["check_out"].astype("datetime64[D]")
+    first, last = np.datetime64(start, "D"), np.datetime64(end, "D")
+    overlap = (np.minimum(check_out, last) - np.maximum(check_in, first)).astype(np.int64)
+    stays = (booking_cols["booking_type"] == _category_code(bookings, "booking_type", BookingType.hotel)) \
+        & (booking_cols["hotel_id"] >= 0) & ~np.isnat(check_in) & ~np.isnat(check_out) & (overlap > 0) \
+        & _active(booking_cols["booking_id"], released)
+    room_nights = pd.Series(overlap[stays]).groupby(booking_cols["hotel_id"][stays]).sum() \
+        .reindex(hotel_cols["hotel_id"], fill_value=0).to_numpy()
+
+    capacity = hotel_cols["available_rooms"] * nights
+    rate = np.divide(room_nights, capacity, out=np.zeros(len(room_nights), dtype=np.float64), where=capacity > 0)
+
+    mask = np.ones(len(rate), dtype=bool)
+    if location is not None:
+        mask &= hotel_cols["location"] == _category_code(hotels, "location", location)
+    order = np.flatnonzero(mask)
+    order = order[np.argsort(-rate[order], kind="stable")[:limit]]
+    locations = hotels.labels("location")
+    return [{"hotel_id": int(hotel_cols["hotel_id"][i]), "name": hotel_cols["name"][i],
+             "location": locations[hotel_cols["location"][i]], "available_rooms": int(hotel_cols["available_rooms"][i]),
+             "room_nights": int(room_nights[i]), "occupancy": round(float(rate[i]), 4)} for i in order]
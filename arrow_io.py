@@ -0,0 +1,189 @@
+import io
+import os
+import tempfile
+from enum import Enum
+from typing import Any, AsyncIterator, Iterable, Iterator, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet as pq
+from pydantic import ValidationError
+from sqlalchemy import DateTime, Float, Integer, String
+from sqlalchemy import Enum as SQLEnum
+
+from Schema import ArrowFormat
+
+# ------------------ ARROW / PARQUET I/O ------------------
+
+# Bulk transfer of whole tables as Parquet or Arrow IPC. Column names and
+# order come from the Pydantic schema, Arrow types and nullability from the
+# SQLAlchemy column in models.py. Both directions work one record batch at
+# a time: exports flush each batch to the client as it is encoded, imports
+# spool the upload to disk and read it back memory-mapped, batch by batch.
+
+BATCH_SIZE = 10000
+MEDIA_TYPES = {
+    ArrowFormat.parquet: "application/vnd.apache.parquet",
+    ArrowFormat.arrow: "application/vnd.apache.arrow.stream",
+}
+EXTENSIONS = {ArrowFormat.parquet: "parquet", ArrowFormat.arrow: "arrows"}
+_IPC_FILE_MAGIC = b"ARROW1"
+
+
+def _arrow_type(column) -> pa.DataType:
+    column_type = column.type
+    if isinstance(column_type, SQLEnum):
+        return pa.dictionary(pa.int32(), pa.string())
+    if isinstance(column_type, Integer):
+        return pa.int64()
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(column_type, String):
+        return pa.string()
+    raise TypeError(f"No Arrow type for column {column.name} ({column_type})")
+
+
+def arrow_schema(schema, model) -> pa.Schema:
+    """Arrow schema for ``schema``'s fields typed after ``model``'s columns."""
+    columns = model.__table__.columns
+    return pa.schema([
+        pa.field(name, _arrow_type(columns[name]), nullable=bool(columns[name].nullable))
+        for name in schema.__fields__
+    ])
+
+
+# ------------------ EXPORT ------------------
+
+class _Sink(io.RawIOBase):
+    """Write-only file whose contents are drained after every batch."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def _cell(value):
+    return value.value if isinstance(value, Enum) else value
+
+
+def _batch(rows: List[Any], schema: pa.Schema) -> pa.RecordBatch:
+    return pa.RecordBatch.from_arrays(
+        [pa.array([_cell(getattr(row, field.name)) for row in rows], type=field.type) for field in schema],
+        schema=schema)
+
+
+def record_batches(records: Iterable, schema: pa.Schema, batch_size: int = BATCH_SIZE) -> Iterator[pa.RecordBatch]:
+    rows = []
+    for record in records:
+        rows.append(record)
+        if len(rows) >= batch_size:
+            yield _batch(rows, schema)
+            rows = []
+    if rows:
+        yield _batch(rows, schema)
+
+
+def export_chunks(records: Iterable, schema: pa.Schema, format: ArrowFormat,
+                  batch_size: int = BATCH_SIZE) -> Iterator[bytes]:
+    sink = _Sink()
+    if format == ArrowFormat.parquet:
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    with writer:
+        for batch in record_batches(records, schema, batch_size):
+            # One Parquet row group per batch.
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
+
+
+# ------------------ IMPORT ------------------
+
+async def spool(chunks: AsyncIterator[bytes], directory: Optional[str] = None) -> str:
+    """Write an upload to a temporary file and return its path."""
+    handle, path = tempfile.mkstemp(prefix="import-", dir=directory)
+    try:
+        with os.fdopen(handle, "wb") as file:
+            async for chunk in chunks:
+                file.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+def _columns(names: List[str], schema, key: str) -> List[str]:
+    missing = [name for name, field in schema.__fields__.items()
+               if name != key and field.is_required() and name not in names]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    return [name for name in schema.__fields__ if name in names]
+
+
+def read_batches(path: str, format: ArrowFormat, schema, key: str,
+                 batch_size: int = BATCH_SIZE) -> Iterator[pa.RecordBatch]:
+    """Memory-mapped record batches of ``path`` with ``schema``'s columns.
+
+    Arrow input may be either the IPC stream or the IPC file format; other
+    columns are not read. Raises ValueError when the file is not readable
+    as ``format`` or lacks a required column (the key may be absent).
+    """
+    source = pa.memory_map(path)
+    try:
+        if format == ArrowFormat.parquet:
+            parquet = pq.ParquetFile(source)
+            columns = _columns(parquet.schema_arrow.names, schema, key)
+            yield from parquet.iter_batches(batch_size=batch_size, columns=columns)
+            return
+        if source.read(len(_IPC_FILE_MAGIC)) == _IPC_FILE_MAGIC:
+            source.seek(0)
+            reader = pa.ipc.open_file(source)
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        else:
+            source.seek(0)
+            reader = pa.ipc.open_stream(source)
+            batches = iter(reader)
+        columns = _columns(reader.schema.names, schema, key)
+        for batch in batches:
+            yield batch.select(columns)
+    except pa.ArrowInvalid as exc:
+        raise ValueError(f"Not a valid {format.value} file: {exc}")
+    finally:
+        source.close()
+
+
+def validate_rows(batch: pa.RecordBatch, schema, key: str) -> List[Tuple[Optional[Any], Optional[str]]]:
+    """``(record, None)`` or ``(None, error)`` for each row of ``batch``.
+
+    Rows without a primary key are validated with a placeholder and come
+    back with the key set to None; the caller assigns one once it accepts
+    the row, so rejected rows use up no IDs.
+    """
+    results = []
+    for row in batch.to_pylist():
+        new = row.get(key) is None
+        try:
+            record = schema.model_validate({**row, key: 0} if new else row)
+            results.append((record.copy(update={key: None}) if new else record, None))
+        except ValidationError as exc:
+            results.append((None, "; ".join(
+                f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in exc.errors())))
+    return results
@@ -0,0 +1,114 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterator, Set, Tuple
+
+from Schema import BookingType
+
+# ------------------ HOTEL OCCUPANCY INDEX ------------------
+
+def nights(check_in: date, check_out: date) -> Iterator[date]:
+    night = check_in
+    while night < check_out:
+        yield night
+        night += timedelta(days=1)
+
+
+class OccupancyIndex:
+    """Rooms booked per hotel per night, built from hotel bookings.
+
+    Registered on bookings_db; every hotel booking with a hotel_id, check_in
+    and check_out occupies one room for each night in [check_in, check_out).
+    Flight bookings are ignored even if they carry hotel fields.
+    Queries cost O(nights in the stay), independent of the number of
+    bookings. Released bookings stay on record but are not counted.
+    """
+
+    def __init__(self):
+        self._occupancy: Dict[int, Dict[date, int]] = defaultdict(dict)
+        self._released: Set[int] = set()
+
+    @staticmethod
+    def _stay(booking):
+        if booking.booking_type != BookingType.hotel:
+            return None
+        if booking.hotel_id is None or booking.check_in is None or booking.check_out is None:
+            return None
+        return booking.check_in.date(), booking.check_out.date()
+
+    def insert(self, booking) -> None:
+        stay = self._stay(booking)
+        if stay is None or booking.booking_id in self._released:
+            return
+        occupancy = self._occupancy[booking.hotel_id]
+        for night in nights(*stay):
+            occupancy[night] = occupancy.get(night, 0) + 1
+
+    def remove(self, booking) -> None:
+        stay = self._stay(booking)
+        if stay is None or booking.booking_id in self._released:
+            return
+        occupancy = self._occupancy.get(booking.hotel_id)
+        if occupancy is None:
+            return
+        for night in nights(*stay):
+            booked = occupancy.get(night, 0) - 1
+            if booked > 0:
+                occupancy[night] = booked
+            else:
+                occupancy.pop(night, None)
+        if not occupancy:
+            del self._occupancy[booking.hotel_id]
+
+    def release(self, booking) -> None:
+        if booking.booking_id not in self._released:
+            self.remove(booking)
+            self._released.add(booking.booking_id)
+
+    def restore(self, booking) -> None:
+        if booking.booking_id in self._released:
+            self._released.discard(booking.booking_id)
+            self.insert(booking)
+
+    def is_released(self, booking_id: int) -> bool:
+        return booking_id in self._released
+
+    def released(self) -> Set[int]:
+        return set(self._released)
+
+    def forget(self, booking_id: int) -> None:
+        self._released.discard(booking_id)
+
+    def booked(self, hotel_id: int, check_in: date, check_out: date) -> int:
+        occupancy = self._occupancy.get(hotel_id)
+        if not occupancy:
+            return 0
+        return max((occupancy.get(night, 0) for night in nights(check_in, check_out)), default=0)
+
+    def rooms_free(self, hotel, check_in: date, check_out: date) -> int:
+        return max(hotel.available_rooms - self.booked(hotel.hotel_id, check_in, check_out), 0)
+
+    def nightly(self, hotel_id: int, check_in: date, check_out: date) -> Dict[date, int]:
+        occupancy = self._occupancy.get(hotel_id, {})
+        return {night: occupancy.get(night, 0) for night in nights(check_in, check_out)}
+
+    # Consistency checks (see aggregates.verify).
+
+    def state(self) -> Dict[Tuple[int, date], int]:
+        return {(hotel_id, night): rooms for hotel_id, occupancy in self._occupancy.items()
+                for night, rooms in occupancy.items()}
+
+    def fresh(self) -> "OccupancyIndex":
+        index = OccupancyIndex()
+        index._released = set(self._released)
+        return index
+
+    def apply(self, drift: Dict[Tuple[int, date], int]) -> None:
+        for (hotel_id, night), delta in drift.items():
+            occupancy = self._occupancy[hotel_id]
+            rooms = occupancy.get(night, 0) + delta
+            if rooms > 0:
+                occupancy[night] = rooms
+            else:
+                occupancy.pop(night, None)
+            if not occupancy:
+                del self._occupancy[hotel_id]
@@ -0,0 +1,633 @@
+import asyncio
+import fcntl
+import os
+import time
+from contextlib import asynccontextmanager
+from enum import Enum
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from journal import LOCK_NAME, LOG_NAME, SNAPSHOT_NAME, CorruptJournal, LogWriter, SharedHeader, iter_frames, \
+    latest_snapshot, list_files, log_path, read_snapshot, snapshot_header, truncate, write_snapshot
+
+# ------------------ PERSISTENCE BACKENDS ------------------
+
+# The routes write the in-memory tables in store.py (and mostly read them;
+# see SQLAlchemyBackend.read); a backend decides what happens to those
+# writes. Each backend registers an
+# observer on every table, so changes made anywhere (including inventory
+# side effects on flights) are captured without the handlers knowing.
+# ``commit`` is awaited once per mutating request, inside ``writing()``;
+# ``refresh`` runs before every read. Both only matter when several worker
+# processes share the tables (SharedJournalBackend).
+
+class _LocalState:
+    """Tables owned by this process alone: nothing to refresh or lock."""
+
+    def refresh(self) -> None:
+        pass
+
+    def claim(self, name: str) -> bool:
+        """Whether this process is the one to do the once-per-start job ``name``."""
+        return True
+
+    @asynccontextmanager
+    async def writing(self):
+        yield
+
+
+class MemoryBackend(_LocalState):
+    """Records live only in this process."""
+
+    def attach(self, tables: Dict[str, Any]) -> None:
+        pass
+
+    async def start(self) -> None:
+        pass
+
+    async def commit(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+class _ChangeLog:
+    def __init__(self, backend, resource: str, key: str):
+        self.backend = backend
+        self.resource = resource
+        self.key = key
+
+    def insert(self, record) -> None:
+        self.backend.pending[(self.resource, getattr(record, self.key))] = record
+
+    def remove(self, record) -> None:
+        self.backend.pending[(self.resource, getattr(record, self.key))] = None
+
+
+def _next_ids(tables: Dict[str, Any]) -> Dict[str, int]:
+    """Each table's next ID; tables without IDs are left out."""
+    return {resource: table.peek_id() for resource, (table, _) in tables.items() if hasattr(table, "peek_id")}
+
+
+def _skip_ids(tables: Dict[str, Any], next_ids: Dict[str, int]) -> None:
+    for resource, next_id in next_ids.items():
+        if resource in tables and next_id is not None:
+            tables[resource][0].skip_ids(next_id)
+
+
+class SQLAlchemyBackend(_LocalState):
+    """Write-through persistence to an async SQLAlchemy engine.
+
+    Tables are loaded from the database on startup. Afterwards every change
+    is queued by primary key (so repeated updates collapse into one row
+    write) and flushed by ``commit`` in a single transaction: upserts go out
+    as one executemany per table, deletes as one ``IN`` statement. Requests
+    committing at the same time share a flush. Each table's next ID is
+    kept in ``id_sequences`` alongside, and Idempotency-Keys in
+    ``idempotency_keys``; expired keys are deleted on startup.
+
+    With SQLITE_TUNING on a SQLite database, flushes run on a
+    sqlite_writer.SQLiteWriter thread instead, so all writes go through
+    that single writer, and reads get a pool of query-only connections.
+
+    ``read`` runs sync queries (crud.py) against the database and
+    ``stream`` streams a SELECT, for the routes that read it rather than
+    the tables.
+    """
+
+    def __init__(self, url: Optional[str] = None, load_batch_size: int = 1000):
+        self.url = url
+        self.load_batch_size = load_batch_size
+        self.pending: Dict[Tuple[str, int], Any] = {}
+        self.tables: Dict[str, Any] = {}
+        self.engine = None
+        self.sessionmaker = None
+        self.read_engine = None
+        self.read_sessionmaker = None
+        self.writer = None
+        self._flush_lock = asyncio.Lock()
+        self._last_flush = None
+
+    @staticmethod
+    def _models() -> Dict[str, Any]:
+        import models
+
+        return {
+            "users": models.User,
+            "flights": models.Flight,
+            "hotels": models.Hotel,
+            "bookings": models.Booking,
+            "payments": models.Payment,
+            "idempotency": models.IdempotencyKey,
+        }
+
+    def attach(self, tables: Dict[str, Any]) -> None:
+        self.tables = tables
+
+    async def start(self) -> None:
+        from sqlalchemy import delete, select
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        import crud
+        import models
+        from database import ASYNC_DATABASE_URL, SQLITE_TUNING, Base, create_async_db_engine
+
+        model_classes = self._models()
+        url = self.url or ASYNC_DATABASE_URL
+        self.engine = create_async_db_engine(url)
+        self.sessionmaker = async_sessionmaker(self.engine, expire_on_commit=False)
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(delete(models.IdempotencyKey).where(models.IdempotencyKey.expires_at < time.time()))
+        self.read_engine = self.engine
+        if SQLITE_TUNING and self.engine.dialect.name == "sqlite":
+            self.writer = self._sqlite_writer()
+            self.read_engine = create_async_db_engine(url, read_only=True)
+        self.read_sessionmaker = async_sessionmaker(self.read_engine, expire_on_commit=False)
+
+        async with self.sessionmaker() as session:
+            for resource, (table, schema) in self.tables.items():
+                if resource not in model_classes:
+                    # No table for it; kept in memory only.
+                    continue
+                result = await session.stream_scalars(crud.stream(model_classes[resource], self.load_batch_size))
+                async for row in result:
+                    table.add(schema.model_validate(row))
+                table.add_index(_ChangeLog(self, resource, table.key), backfill=False)
+            sequences = await session.scalars(select(models.IdSequence))
+            _skip_ids(self.tables, {sequence.resource: sequence.next_id for sequence in sequences})
+        self.pending.clear()
+
+    def _sqlite_writer(self):
+        from sqlalchemy import create_engine
+
+        from database import tune_sqlite
+        from sqlite_writer import SQLiteWriter
+
+        # The same database through the sync driver, for the writer thread.
+        url = self.engine.url.set(drivername="sqlite")
+        return SQLiteWriter(tune_sqlite(create_engine(url, connect_args={"check_same_thread": False})))
+
+    def _upsert(self, model):
+        table = model.__table__
+        key = model.__mapper__.primary_key[0].name
+        dialect = self.engine.dialect.name
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        elif dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            return None
+        statement = insert(table)
+        return statement.on_conflict_do_update(
+            index_elements=[key],
+            set_={column.name: statement.excluded[column.name] for column in table.columns if column.name != key},
+        )
+
+    @staticmethod
+    def _row(record, model) -> Dict[str, Any]:
+        row = {}
+        for column in model.__table__.columns:
+            value = getattr(record, column.name, None)
+            row[column.name] = value.value if isinstance(value, Enum) else value
+        return row
+
+    def _write(self, session, model, rows: List[Dict[str, Any]]) -> None:
+        statement = self._upsert(model)
+        if statement is not None:
+            session.execute(statement, rows)
+        else:
+            for row in rows:
+                session.merge(model(**row))
+
+    def _flush(self, session, pending: Dict[Tuple[str, int], Any], next_ids: Dict[str, int]) -> None:
+        """Write ``pending`` with a sync session; the caller commits."""
+        from sqlalchemy import delete
+
+        import models
+
+        model_classes = self._models()
+        for resource, model in model_classes.items():
+            rows = [self._row(record, model) for (name, _), record in pending.items()
+                    if name == resource and record is not None]
+            if rows:
+                self._write(session, model, rows)
+        for resource, model in reversed(list(model_classes.items())):
+            ids = [record_id for (name, record_id), record in pending.items()
+                   if name == resource and record is None]
+            if ids:
+                key = model.__mapper__.primary_key[0]
+                session.execute(delete(model).where(key.in_(ids)))
+        changed = {name for name, _ in pending if name in model_classes and name in next_ids}
+        if changed:
+            self._write(session, models.IdSequence, [
+                {"resource": name, "next_id": next_ids[name]} for name in sorted(changed)])
+
+    async def read(self, fn: Callable[..., Any], *args) -> Any:
+        """``fn(db, *args)`` with a sync Session, e.g. a crud.py query."""
+        async with self.read_sessionmaker() as session:
+            return await session.run_sync(fn, *args)
+
+    async def stream(self, statement, schema) -> AsyncIterator[Any]:
+        """Rows of ``statement`` (e.g. crud.stream) as ``schema`` records."""
+        async with self.read_sessionmaker() as session:
+            result = await session.stream_scalars(statement)
+            async for row in result:
+                yield schema.model_validate(row)
+
+    def _requeue(self, pending: Dict[Tuple[str, int], Any]) -> None:
+        # Queue the rows of a failed flush again, as they are now: a newer
+        # flush may already have written a later version of some of them.
+        for resource, record_id in pending:
+            table = self.tables[resource][0]
+            self.pending.setdefault((resource, record_id), table.get(record_id))
+
+    async def commit(self) -> None:
+        if self.writer is not None:
+            await self._commit_to_writer()
+            return
+        # A flush already in progress may hold this request's changes, so
+        # wait for it rather than returning early.
+        if not self.pending and not self._flush_lock.locked():
+            return
+        async with self._flush_lock:
+            pending, self.pending = self.pending, {}
+            if not pending:
+                return
+            try:
+                async with self.sessionmaker() as session, session.begin():
+                    await session.run_sync(self._flush, pending, _next_ids(self.tables))
+            except BaseException:
+                self._requeue(pending)
+                raise
+
+    async def _commit_to_writer(self) -> None:
+        # No lock: every commit queues its own changes and the writer thread
+        # runs what concurrent requests queued in one transaction. Flushes
+        # run in queue order, so waiting for the last one queued covers
+        # changes that went out with another request's flush.
+        if not self.pending:
+            if self._last_flush is not None and not self._last_flush.done():
+                await asyncio.shield(asyncio.wrap_future(self._last_flush))
+            return
+        pending, self.pending = self.pending, {}
+        flush = self._last_flush = self.writer.submit(self._flush, pending, _next_ids(self.tables))
+        try:
+            # Shielded: the flush runs anyway once queued, even if the
+            # request is cancelled.
+            await asyncio.shield(asyncio.wrap_future(flush))
+        except Exception:
+            self._requeue(pending)
+            raise
+
+    async def stop(self) -> None:
+        if self.engine is not None:
+            await self.commit()
+            if self.writer is not None:
+                await asyncio.to_thread(self.writer.stop)
+                self.writer.engine.dispose()
+                self.writer = None
+            if self.read_engine is not self.engine:
+                await self.read_engine.dispose()
+            await self.engine.dispose()
+
+
+class JournalBackend(_LocalState):
+    """Write-ahead log plus periodic snapshots in a local directory.
+
+    Reads and writes stay in memory. ``commit`` appends the queued changes
+    to the log and fsyncs; requests committing while an fsync is running
+    queue up behind it and share the next one. Once ``snapshot_every``
+    entries have been logged, or every ``snapshot_interval`` seconds, the
+    tables are written to a snapshot and the log segments it covers are
+    deleted, so startup loads one snapshot and replays at most a bounded
+    log tail. File formats are described in journal.py.
+    """
+
+    def __init__(self, directory: Optional[str] = None, snapshot_every: Optional[int] = None,
+                 snapshot_interval: Optional[float] = None):
+        self.directory = directory or os.getenv("JOURNAL_DIR", "./journal")
+        self.snapshot_every = snapshot_every or int(os.getenv("JOURNAL_SNAPSHOT_EVERY", "100000"))
+        self.snapshot_interval = snapshot_interval or float(os.getenv("JOURNAL_SNAPSHOT_INTERVAL", "3600"))
+        self.pending: Dict[Tuple[str, int], Any] = {}
+        self.tables: Dict[str, Any] = {}
+        self.seq = 0
+        self.since_snapshot = 0
+        self._log = None
+        self._flush_lock = asyncio.Lock()
+        self._snapshot_task: Optional[asyncio.Task] = None
+        self._timer: Optional[asyncio.Task] = None
+
+    def attach(self, tables: Dict[str, Any]) -> None:
+        self.tables = tables
+
+    def _apply(self, resource: str, record_id: int, data: Optional[dict], next_id: Optional[int] = None) -> None:
+        table, schema = self.tables[resource]
+        if data is None:
+            table.remove(record_id)
+        elif record_id in table:
+            table.replace(schema.model_validate(data))
+        else:
+            table.add(schema.model_validate(data))
+        if next_id is not None:
+            table.skip_ids(next_id)
+
+    def _recover(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        snapshot = latest_snapshot(self.directory)
+        if snapshot is not None:
+            self.seq, path = snapshot
+            for resource, rows in read_snapshot(path):
+                table, schema = self.tables[resource]
+                for row in rows:
+                    table.add(schema.model_validate(row))
+            _skip_ids(self.tables, snapshot_header(path).get("next_ids", {}))
+        snapshot_seq = self.seq
+
+        segments = list_files(self.directory, LOG_NAME)
+        for position, (_, path) in enumerate(segments):
+            end = 5
+            for entry, end in iter_frames(path):
+                if entry[0] > self.seq:
+                    self._apply(*entry[1:])
+                    self.seq = entry[0]
+            if end < os.path.getsize(path):
+                if position != len(segments) - 1:
+                    raise CorruptJournal(f"{path} is damaged before the end of the log")
+                # A write torn by a crash; nothing after it was acknowledged.
+                truncate(path, end)
+
+        self.since_snapshot = self.seq - snapshot_seq
+        # Keep appending to the last segment; its torn tail is gone.
+        self._log = LogWriter(self.directory, segments[-1][0] if segments else self.seq + 1)
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self._recover)
+        for resource, (table, schema) in self.tables.items():
+            table.add_index(_ChangeLog(self, resource, table.key), backfill=False)
+        self.pending.clear()
+        self._timer = asyncio.create_task(self._snapshot_periodically())
+
+    async def _flush(self) -> None:
+        pending, self.pending = self.pending, {}
+        if not pending:
+            return
+        entries = []
+        next_ids = _next_ids(self.tables)
+        for (resource, record_id), record in pending.items():
+            self.seq += 1
+            entries.append([self.seq, resource, record_id, None if record is None else record.model_dump(mode="json"),
+                            next_ids.get(resource)])
+        self._log.append(entries)
+        await asyncio.to_thread(self._log.sync)
+        self.since_snapshot += len(entries)
+
+    async def commit(self) -> None:
+        if self.pending or self._flush_lock.locked():
+            async with self._flush_lock:
+                await self._flush()
+        if self.since_snapshot >= self.snapshot_every and (self._snapshot_task is None or self._snapshot_task.done()):
+            self._snapshot_task = asyncio.create_task(self.snapshot())
+
+    async def snapshot(self) -> None:
+        async with self._flush_lock:
+            rotated = await self._rotate()
+        if rotated is not None:
+            await asyncio.to_thread(self._write_snapshot, *rotated)
+
+    async def _rotate(self) -> Optional[Tuple[int, Dict[str, list], Dict[str, int], LogWriter]]:
+        """Start a new log segment; returns what the snapshot must contain."""
+        await self._flush()
+        if not self.since_snapshot:
+            return None
+        # Records are replaced, never mutated, so copying the row lists
+        # here (with no await in between) freezes a consistent state.
+        seq = self.seq
+        rows = {resource: list(table) for resource, (table, _) in self.tables.items()}
+        next_ids = _next_ids(self.tables)
+        previous, self._log = self._log, LogWriter(self.directory, seq + 1)
+        self.since_snapshot = 0
+        return seq, rows, next_ids, previous
+
+    def _write_snapshot(self, seq: int, rows: Dict[str, list], next_ids: Dict[str, int], previous) -> None:
+        previous.close()
+        write_snapshot(self.directory, seq, {
+            resource: [record.model_dump(mode="json") for record in records] for resource, records in rows.items()},
+            next_ids)
+        # The snapshot covers every entry up to seq; older files are obsolete.
+        for snapshot_seq, path in list_files(self.directory, SNAPSHOT_NAME):
+            if snapshot_seq < seq:
+                os.remove(path)
+        for first_seq, path in list_files(self.directory, LOG_NAME):
+            if first_seq <= seq:
+                os.remove(path)
+
+    async def _snapshot_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            await self.snapshot()
+
+    async def stop(self) -> None:
+        if self._log is None:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        if self._snapshot_task is not None:
+            await self._snapshot_task
+        # A snapshot on the way down makes the next start a plain load.
+        await self.snapshot()
+        await asyncio.to_thread(self._log.close)
+        self._log = None
+
+
+class SharedJournalBackend(JournalBackend):
+    """JournalBackend for several worker processes on one host.
+
+    Every worker holds a full copy of the tables and serves reads from it,
+    so reads scale with the number of workers. Writes are serialized by an
+    exclusive ``flock`` on the journal directory: the writer first applies
+    whatever other workers logged since it last looked, then runs the
+    request and appends its own changes to the shared log. The log's end is
+    published in a memory-mapped SharedHeader; before each read a worker
+    compares it with its own position and tails the log if it is behind,
+    so a client sees its writes whichever worker serves the next request.
+    ID sequences stay shared because IDs are only handed out while holding
+    the lock, on tables that are up to date.
+
+    JOURNAL_DIR on /dev/shm keeps the log and header in shared memory; on
+    a disk it also persists, as with the single-process journal.
+    """
+
+    def __init__(self, directory: Optional[str] = None, snapshot_every: Optional[int] = None,
+                 snapshot_interval: Optional[float] = None):
+        super().__init__(directory, snapshot_every, snapshot_interval)
+        self._header: Optional[SharedHeader] = None
+        self._lock_file = None
+        self._claims: Dict[str, Any] = {}
+        self._writer = asyncio.Lock()
+        self._holding = False
+        # First seq of the log segment this worker is reading, and the
+        # offset just past the last entry it applied.
+        self._tail: Tuple[int, int] = (0, 0)
+
+    # ------------------ cross-process lock ------------------
+
+    def _lock(self) -> None:
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+
+    def _unlock(self) -> None:
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def claim(self, name: str) -> bool:
+        # The first worker to flock <name>.lock keeps it until it stops;
+        # the others are told the job is taken.
+        if name in self._claims:
+            return True
+        handle = open(os.path.join(self.directory, f"{name}.lock"), "ab")
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            handle.close()
+            return False
+        self._claims[name] = handle
+        return True
+
+    @asynccontextmanager
+    async def writing(self):
+        async with self._writer:
+            acquire = asyncio.ensure_future(asyncio.to_thread(self._lock))
+            try:
+                await asyncio.shield(acquire)
+            except asyncio.CancelledError:
+                acquire.add_done_callback(lambda _: self._unlock())
+                raise
+            self._holding = True
+            try:
+                self._catch_up()
+                segment, offset = self._tail
+                path = log_path(self.directory, segment)
+                if os.path.getsize(path) > offset:
+                    # Left by a worker that died mid-append; never published.
+                    truncate(path, offset)
+                if self._log.first_seq != segment:
+                    self._log.close()
+                    self._log = LogWriter(self.directory, segment)
+                yield
+            finally:
+                self._holding = False
+                self._unlock()
+
+    # ------------------ following the log ------------------
+
+    def _publish(self) -> None:
+        self._tail = (self._log.first_seq, self._log.tell())
+        self._header.write(self.seq, self._log.first_seq, self.seq - self.since_snapshot)
+
+    def refresh(self) -> None:
+        if not self._holding and self._header.read()[0] > self.seq:
+            self._catch_up()
+
+    def _catch_up(self) -> None:
+        """Apply what other workers logged after ``_tail``."""
+        # Those changes are in the log already; keep them out of this
+        # worker's own queue.
+        own, self.pending = self.pending, {}
+        try:
+            segment, offset = self._tail
+            while True:
+                try:
+                    for entry, offset in iter_frames(log_path(self.directory, segment), offset):
+                        if entry[0] > self.seq:
+                            self._apply(*entry[1:])
+                            self.seq = entry[0]
+                except FileNotFoundError:
+                    pass
+                self._tail = (segment, offset)
+                if segment >= self._header.read()[1]:
+                    break
+                # The log was rotated: go on with the next segment, unless
+                # the ones in between were folded into a snapshot and
+                # deleted, in which case reload from that snapshot.
+                later = [first for first, _ in list_files(self.directory, LOG_NAME) if first > segment]
+                if not later:
+                    break
+                if later[0] > self.seq + 1:
+                    self._resync()
+                    later = [first for first in later if first == self.seq + 1] or later
+                segment, offset = later[0], 5
+            self.since_snapshot = self.seq - self._header.read()[2]
+        finally:
+            self.pending = own
+
+    def _resync(self) -> None:
+        seq, path = latest_snapshot(self.directory)
+        seen = {resource: set() for resource in self.tables}
+        for resource, rows in read_snapshot(path):
+            table, _ = self.tables[resource]
+            for row in rows:
+                seen[resource].add(row[table.key])
+                self._apply(resource, row[table.key], row)
+        for resource, (table, _) in self.tables.items():
+            for record in list(table):
+                if getattr(record, table.key) not in seen[resource]:
+                    table.remove(getattr(record, table.key))
+        _skip_ids(self.tables, snapshot_header(path).get("next_ids", {}))
+        self.seq = seq
+
+    # ------------------ JournalBackend hooks ------------------
+
+    def _recover(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_file = open(os.path.join(self.directory, LOCK_NAME), "ab")
+        self._header = SharedHeader(self.directory)
+        self._lock()
+        try:
+            super()._recover()
+            self._publish()
+        finally:
+            self._unlock()
+
+    async def _flush(self) -> None:
+        if self.pending:
+            await super()._flush()
+            self._publish()
+
+    async def _rotate(self):
+        rotated = await super()._rotate()
+        if rotated is not None:
+            self._publish()
+        return rotated
+
+    async def snapshot(self) -> None:
+        # Rotating needs the lock and current tables; writing the file
+        # does not, so other workers can go on writing meanwhile.
+        async with self.writing():
+            async with self._flush_lock:
+                rotated = await self._rotate()
+        if rotated is not None:
+            await asyncio.to_thread(self._write_snapshot, *rotated)
+
+    async def stop(self) -> None:
+        await super().stop()
+        for handle in self._claims.values():
+            handle.close()
+        self._claims = {}
+        if self._header is not None:
+            self._header.close()
+            self._lock_file.close()
+            self._header = None
+
+
+BACKENDS = {
+    "memory": MemoryBackend,
+    "sqlalchemy": SQLAlchemyBackend,
+    "journal": JournalBackend,
+    "shared": SharedJournalBackend,
+}
+
+
+def create_backend(name: Optional[str] = None):
+    name = name or os.getenv("PERSISTENCE_BACKEND", "memory")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown persistence backend: {name}")
+    return BACKENDS[name]()
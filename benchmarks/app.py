@@ -0,0 +1,38 @@
+"""The API with synthetic data loaded at startup.
+
+Used in-process by the runner and by uvicorn for the out-of-process target:
+
+    BENCH_ROWS=100000 uvicorn benchmarks.app:create_app --factory
+"""
+import os
+
+import main
+from benchmarks.data import Dataset, counts_for, seed
+
+dataset: Dataset = None
+
+
+def install(rows: int, seed_value: int = 0):
+    """Seed the tables from a startup handler, after the backend has loaded.
+
+    Tables that already hold data (from the journal, or seeded by another
+    worker sharing it) are left alone.
+    """
+    async def seed_tables():
+        global dataset
+        async with main.backend.writing():
+            if len(main.flights_db):
+                dataset = Dataset(rows=rows, seed=seed_value, counts=counts_for(rows))
+                return
+            dataset = seed({
+                "users": main.users_db, "flights": main.flights_db, "hotels": main.hotels_db,
+                "bookings": main.bookings_db, "payments": main.payments_db,
+            }, rows, seed_value)
+            await main.backend.commit()
+
+    main.app.router.on_startup.append(seed_tables)
+    return main.app
+
+
+def create_app():
+    return install(int(os.getenv("BENCH_ROWS", "10000")), int(os.getenv("BENCH_SEED", "0")))
@@ -0,0 +1,50 @@
+"""Compare two benchmark result files and flag regressions.
+
+    python -m benchmarks.compare before.json after.json --threshold 10
+
+Exits with status 1 when any endpoint's p95 latency grew, or its throughput
+fell, by more than ``--threshold`` percent.
+"""
+import argparse
+import json
+import sys
+
+
+def change(before: float, after: float) -> float:
+    return (after - before) / before * 100 if before else 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent")
+    args = parser.parse_args()
+
+    with open(args.before) as handle:
+        before = json.load(handle)
+    with open(args.after) as handle:
+        after = json.load(handle)
+
+    print(f"{before['revision']} -> {after['revision']}  (mix={after['mix']}, rows={after['rows']})")
+    print(f"{'endpoint':40} {'p50 %':>8} {'p95 %':>8} {'p99 %':>8} {'rps %':>8}")
+    regressions = []
+    endpoints = dict(after["endpoints"], TOTAL=after["total"])
+    baseline = dict(before["endpoints"], TOTAL=before["total"])
+    for name, new in endpoints.items():
+        old = baseline.get(name)
+        if old is None:
+            print(f"{name:40} {'new':>8}")
+            continue
+        deltas = [change(old[key], new[key]) for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")]
+        print(f"{name:40} " + " ".join(f"{delta:>+8.1f}" for delta in deltas))
+        if deltas[1] > args.threshold or deltas[3] < -args.threshold:
+            regressions.append(name)
+
+    if regressions:
+        print(f"regressed beyond {args.threshold}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Reproducible synthetic data for the benchmarks.
+
+Rows are generated from a seeded RNG and added straight to the in-memory
+tables (skipping the HTTP layer), so every index and observer sees them as
+it would in production. ``rows`` is the total across all five tables.
+"""
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List
+
+from Schema import (
+    Booking, BookingType, Flight, Hotel, Payment, PaymentMethod, PaymentStatus,
+    UserInDB, UserRole,
+)
+
+CITIES = [
+    "Amsterdam", "Athens", "Bangkok", "Barcelona", "Berlin", "Boston", "Cairo",
+    "Chicago", "Dubai", "Dublin", "Delhi", "Hong Kong", "Istanbul", "Lisbon",
+    "London", "Los Angeles", "Madrid", "Mexico City", "Miami", "Milan",
+    "Mumbai", "Munich", "New York", "Oslo", "Paris", "Prague", "Rome",
+    "San Francisco", "Seoul", "Singapore", "Stockholm", "Sydney", "Tokyo",
+    "Toronto", "Vienna", "Zurich",
+]
+AIRLINES = ["Aurora", "Borealis", "Cirrus", "Delta Wing", "Equator", "Fjord Air", "Gale", "Horizon"]
+EPOCH = datetime(2025, 1, 1)
+DAYS = 180
+
+# Share of ``rows`` given to each table.
+SHARES = {"users": 0.10, "flights": 0.20, "hotels": 0.05, "bookings": 0.40, "payments": 0.25}
+
+
+@dataclass
+class Dataset:
+    """What was generated, so request mixes only ask for rows that exist."""
+    rows: int
+    seed: int
+    counts: dict = field(default_factory=dict)
+    cities: List[str] = field(default_factory=lambda: list(CITIES))
+    epoch: datetime = EPOCH
+    days: int = DAYS
+
+
+def counts_for(rows: int) -> dict:
+    return {name: max(1, int(rows * share)) for name, share in SHARES.items()}
+
+
+def seed(tables: dict, rows: int, seed: int = 0) -> Dataset:
+    """Fill ``tables`` (users, flights, hotels, bookings, payments) with ``rows`` rows."""
+    rng = random.Random(seed)
+    counts = counts_for(rows)
+    users, flights, hotels = tables["users"], tables["flights"], tables["hotels"]
+    bookings, payments = tables["bookings"], tables["payments"]
+
+    for _ in range(counts["users"]):
+        user_id = users.next_id()
+        users.add(UserInDB.model_construct(
+            user_id=user_id, name=f"User {user_id}", email=f"user{user_id}@example.com",
+            role=UserRole.admin if user_id % 100 == 0 else UserRole.customer,
+            contact=f"+1-555-{user_id % 10000:04d}", password_hash="x" * 60,
+        ))
+
+    for _ in range(counts["flights"]):
+        flight_id = flights.next_id()
+        departure_city, arrival_city = rng.sample(CITIES, 2)
+        departure = EPOCH + timedelta(minutes=rng.randrange(DAYS * 24 * 60))
+        flights.add(Flight.model_construct(
+            flight_id=flight_id, flight_number=f"{rng.choice('ABCDEFGH')}{flight_id:07d}",
+            departure_city=departure_city, arrival_city=arrival_city,
+            departure_time=departure, arrival_time=departure + timedelta(minutes=rng.randint(45, 900)),
+            airline=rng.choice(AIRLINES), price=round(rng.uniform(40, 1500), 2),
+            seats_available=rng.randint(0, 300),
+        ))
+
+    for _ in range(counts["hotels"]):
+        hotel_id = hotels.next_id()
+        hotels.add(Hotel.model_construct(
+            hotel_id=hotel_id, name=f"Hotel {hotel_id}", location=rng.choice(CITIES),
+            available_rooms=rng.randint(5, 400), price_per_night=round(rng.uniform(30, 900), 2),
+            rating=round(rng.uniform(1, 5), 1),
+        ))
+
+    for _ in range(counts["bookings"]):
+        booking_id = bookings.next_id()
+        booked_at = EPOCH + timedelta(minutes=rng.randrange(DAYS * 24 * 60))
+        values = dict(
+            booking_id=booking_id, user_id=rng.randint(1, counts["users"]),
+            flight_id=None, hotel_id=None, check_in=None, check_out=None,
+            booking_date=booked_at, total_amount=round(rng.uniform(40, 3000), 2),
+        )
+        if rng.random() < 0.6:
+            values.update(booking_type=BookingType.flight, flight_id=rng.randint(1, counts["flights"]))
+        else:
+            check_in = booked_at.replace(hour=0, minute=0) + timedelta(days=rng.randint(1, 60))
+            values.update(booking_type=BookingType.hotel, hotel_id=rng.randint(1, counts["hotels"]),
+                          check_in=check_in, check_out=check_in + timedelta(days=rng.randint(1, 14)))
+        bookings.add(Booking.model_construct(**values))
+
+    methods, statuses = list(PaymentMethod), list(PaymentStatus)
+    for _ in range(counts["payments"]):
+        payment_id = payments.next_id()
+        payments.add(Payment.model_construct(
+            payment_id=payment_id, booking_id=rng.randint(1, counts["bookings"]),
+            payment_date=EPOCH + timedelta(minutes=rng.randrange(DAYS * 24 * 60)),
+            amount=round(rng.uniform(40, 3000), 2), method=rng.choice(methods),
+            status=rng.choices(statuses, weights=[85, 5, 10])[0],
+        ))
+
+    return Dataset(rows=rows, seed=seed, counts=counts)
@@ -0,0 +1,81 @@
+"""Memory held by the flight catalog, object mode vs. CATALOG_STORAGE=columnar.
+
+Builds the flight table with the indexes main.py registers in each mode and
+reports what tracemalloc sees allocated once loading is done (numpy arrays
+are tracked too), in total and per flight.
+
+    python -m benchmarks.memory --flights 50000 100000
+"""
+import argparse
+import gc
+import random
+import tracemalloc
+from datetime import timedelta
+
+from benchmarks.data import AIRLINES, CITIES, DAYS, EPOCH
+from columnar import FLIGHT_STORAGE, ColumnarRoutes, ColumnarTable, CompactDepartureIndex
+from indexes import DepartureIndex, RouteIndex
+from Schema import Flight
+from store import Table
+
+
+def objects():
+    table = Table("flight_id")
+    return table, [RouteIndex(), DepartureIndex()]
+
+
+def columnar():
+    table = ColumnarTable(Flight, "flight_id", FLIGHT_STORAGE)
+    return table, [ColumnarRoutes(), CompactDepartureIndex()]
+
+
+MODES = {"objects": objects, "columnar": columnar}
+
+
+def flights(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    for flight_id in range(1, count + 1):
+        departure_city, arrival_city = rng.sample(CITIES, 2)
+        departure = EPOCH + timedelta(minutes=rng.randrange(DAYS * 24 * 60))
+        yield Flight(
+            flight_id=flight_id, flight_number=f"{rng.choice('ABCDEFGH')}{flight_id:07d}",
+            departure_city=departure_city, arrival_city=arrival_city,
+            departure_time=departure, arrival_time=departure + timedelta(minutes=rng.randint(45, 900)),
+            airline=rng.choice(AIRLINES), price=round(rng.uniform(40, 1500), 2),
+            seats_available=rng.randint(0, 300),
+        )
+
+
+def measure(mode: str, count: int) -> int:
+    """Bytes still allocated after loading ``count`` flights in ``mode``."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        table, indexes = MODES[mode]()
+        for index in indexes:
+            table.add_index(index)
+        for flight in flights(count):
+            table.add(flight)
+        gc.collect()
+        held, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del table, indexes
+    return held
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--flights", type=int, nargs="+", default=[50000])
+    args = parser.parse_args()
+
+    print(f"{'flights':>10} {'mode':>10} {'MiB':>10} {'bytes/flight':>14}")
+    for count in args.flights:
+        held = {mode: measure(mode, count) for mode in MODES}
+        for mode, size in held.items():
+            print(f"{count:>10} {mode:>10} {size / 2 ** 20:>10.1f} {size / count:>14.0f}")
+        print(f"{'':>10} {'ratio':>10} {held['objects'] / held['columnar']:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Weighted request mixes over the main.py routes.
+
+Each scenario is a function that turns an RNG and the generated dataset into
+``(method, url, json_body)``; its name is the route template, which is the
+key results are reported under.
+"""
+import random
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from benchmarks.data import Dataset
+
+Request = Tuple[str, str, Optional[dict]]
+Scenario = Callable[[random.Random, Dataset], Request]
+
+
+def _id(rng: random.Random, data: Dataset, table: str) -> int:
+    return rng.randint(1, data.counts[table])
+
+
+def _day(rng: random.Random, data: Dataset):
+    return data.epoch + timedelta(days=rng.randrange(data.days))
+
+
+def _route(rng: random.Random, data: Dataset) -> str:
+    origin, destination = rng.sample(data.cities, 2)
+    return f"from={origin}&to={destination}"
+
+
+def _search_flights(rng: random.Random, data: Dataset) -> Request:
+    day = _day(rng, data)
+    return "GET", f"/flights/search?{_route(rng, data)}&date_from={day.isoformat()}" \
+                  f"&date_to={(day + timedelta(days=30)).isoformat()}", None
+
+
+def _search_hotels(rng: random.Random, data: Dataset) -> Request:
+    day = _day(rng, data).date()
+    return "GET", f"/hotels/search?location={rng.choice(data.cities)}&check_in={day}" \
+                  f"&check_out={day + timedelta(days=3)}", None
+
+
+def _availability(rng: random.Random, data: Dataset) -> Request:
+    day = _day(rng, data).date()
+    return "GET", f"/hotels/{_id(rng, data, 'hotels')}/availability?check_in={day}" \
+                  f"&check_out={day + timedelta(days=2)}", None
+
+
+def _create_booking(rng: random.Random, data: Dataset) -> Request:
+    return "POST", "/bookings/", {
+        "user_id": _id(rng, data, "users"), "booking_type": "flight",
+        "flight_id": _id(rng, data, "flights"), "booking_date": _day(rng, data).isoformat(),
+        "total_amount": round(rng.uniform(40, 1500), 2),
+    }
+
+
+def _create_payment(rng: random.Random, data: Dataset) -> Request:
+    return "POST", "/payments/", {
+        "booking_id": _id(rng, data, "bookings"), "payment_date": _day(rng, data).isoformat(),
+        "amount": round(rng.uniform(40, 1500), 2), "method": "credit_card",
+    }
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "GET /flights/{flight_id}": lambda rng, data: ("GET", f"/flights/{_id(rng, data, 'flights')}", None),
+    "GET /flights/": lambda rng, data: ("GET", "/flights/?limit=100&airline=Aurora", None),
+    "GET /flights/search": _search_flights,
+    "GET /itineraries/search": lambda rng, data: (
+        "GET", f"/itineraries/search?{_route(rng, data)}&date_from={_day(rng, data).isoformat()}&max_stops=1", None),
+    "GET /hotels/{hotel_id}": lambda rng, data: ("GET", f"/hotels/{_id(rng, data, 'hotels')}", None),
+    "GET /hotels/search": _search_hotels,
+    "GET /hotels/{hotel_id}/availability": _availability,
+    "GET /users/{user_id}": lambda rng, data: ("GET", f"/users/{_id(rng, data, 'users')}", None),
+    "GET /bookings/{booking_id}": lambda rng, data: ("GET", f"/bookings/{_id(rng, data, 'bookings')}", None),
+    "GET /bookings/{booking_id}/full": lambda rng, data: (
+        "GET", f"/bookings/{_id(rng, data, 'bookings')}/full", None),
+    "GET /users/{user_id}/bookings": lambda rng, data: (
+        "GET", f"/users/{_id(rng, data, 'users')}/bookings?expand=flight,hotel", None),
+    "GET /payments/": lambda rng, data: ("GET", "/payments/?limit=100&status=pending", None),
+    "POST /bookings/": _create_booking,
+    "PUT /flights/{flight_id}": lambda rng, data: (
+        "PUT", f"/flights/{_id(rng, data, 'flights')}", {"price": round(rng.uniform(40, 1500), 2)}),
+    "POST /payments/": _create_payment,
+}
+
+# Relative weights per scenario; "browse" approximates storefront traffic,
+# "write" stresses inventory and persistence.
+MIXES: Dict[str, Dict[str, int]] = {
+    "browse": {
+        "GET /flights/{flight_id}": 25, "GET /flights/search": 15, "GET /itineraries/search": 5,
+        "GET /hotels/{hotel_id}": 15, "GET /hotels/search": 10, "GET /hotels/{hotel_id}/availability": 5,
+        "GET /flights/": 4, "GET /users/{user_id}": 5, "GET /bookings/{booking_id}": 5,
+        "GET /bookings/{booking_id}/full": 4, "GET /users/{user_id}/bookings": 3,
+        "GET /payments/": 1, "POST /bookings/": 2, "POST /payments/": 1,
+    },
+    "read": {
+        "GET /flights/{flight_id}": 25, "GET /flights/search": 15, "GET /itineraries/search": 5,
+        "GET /hotels/{hotel_id}": 15, "GET /hotels/search": 10, "GET /hotels/{hotel_id}/availability": 5,
+        "GET /flights/": 4, "GET /users/{user_id}": 5, "GET /bookings/{booking_id}": 5,
+        "GET /bookings/{booking_id}/full": 4, "GET /users/{user_id}/bookings": 3, "GET /payments/": 1,
+    },
+    "write": {
+        "POST /bookings/": 40, "PUT /flights/{flight_id}": 20, "POST /payments/": 20,
+        "GET /flights/{flight_id}": 10, "GET /bookings/{booking_id}": 10,
+    },
+    "search": {
+        "GET /flights/search": 45, "GET /itineraries/search": 15, "GET /hotels/search": 40,
+    },
+}
+
+
+def plan(mix: str, count: int, data: Dataset, seed: int = 0) -> List[Tuple[str, Request]]:
+    """``count`` requests drawn from ``mix``; the same seed yields the same plan."""
+    rng = random.Random(seed)
+    weights = MIXES[mix]
+    names = rng.choices(list(weights), weights=list(weights.values()), k=count)
+    return [(name, SCENARIOS[name](rng, data)) for name in names]
@@ -0,0 +1,248 @@
+"""Replay a request mix against the API and record per-endpoint numbers.
+
+Two targets: ``inprocess`` drives the app through httpx's ASGI transport
+(no sockets, measures the app itself) and ``uvicorn`` starts a local server
+and goes over HTTP. Throughput, p50/p95/p99 latency and peak RSS are
+reported per route and written to JSON for ``benchmarks.compare``.
+
+    python -m benchmarks.run --rows 100000 --mix browse --requests 20000
+    python -m benchmarks.run --target uvicorn --rows 1000000 --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.data import Dataset, counts_for
+from benchmarks.mix import MIXES, plan
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes(pid: int) -> Optional[int]:
+    """Current resident set size of ``pid``; None where /proc is unavailable."""
+    try:
+        with open(f"/proc/{pid}/statm") as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        return None
+
+
+def peak_rss_bytes(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if pid == os.getpid():
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return None
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+class Recorder:
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.peak_rss: Dict[str, int] = defaultdict(int)
+
+    def record(self, name: str, seconds: float, status: int) -> None:
+        self.latencies[name].append(seconds)
+        self.statuses[name][status] += 1
+        rss = rss_bytes(self.pid)
+        if rss is not None and rss > self.peak_rss[name]:
+            self.peak_rss[name] = rss
+
+    def summary(self, elapsed: float) -> dict:
+        endpoints = {}
+        for name, samples in sorted(self.latencies.items()):
+            ordered = sorted(samples)
+            statuses = self.statuses[name]
+            endpoints[name] = {
+                "requests": len(ordered),
+                "errors": sum(count for status, count in statuses.items() if status >= 500 or status == 0),
+                "statuses": {str(status): count for status, count in sorted(statuses.items())},
+                "throughput_rps": round(len(ordered) / elapsed, 2),
+                "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+                "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+                "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+                "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+                "peak_rss_mb": round(self.peak_rss[name] / 2 ** 20, 1) if self.peak_rss[name] else None,
+            }
+        return endpoints
+
+
+async def drive(client: httpx.AsyncClient, requests, concurrency: int, recorder: Optional[Recorder]) -> float:
+    queue = iter(requests)
+
+    async def worker():
+        for name, (method, url, body) in queue:
+            began = time.perf_counter()
+            try:
+                status = (await client.request(method, url, json=body)).status_code
+            except httpx.HTTPError:
+                status = 0
+            if recorder is not None:
+                recorder.record(name, time.perf_counter() - began, status)
+
+    began = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - began
+
+
+async def run_inprocess(args) -> dict:
+    from benchmarks import app as bench_app
+
+    app = bench_app.install(args.rows, args.seed)
+    began = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        load_seconds = time.perf_counter() - began
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return await measure(client, bench_app.dataset, os.getpid(), load_seconds, args)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_uvicorn(args) -> dict:
+    port = free_port()
+    env = dict(os.environ, BENCH_ROWS=str(args.rows), BENCH_SEED=str(args.seed),
+               PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.app:create_app", "--factory",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+            began = time.perf_counter()
+            while True:
+                if server.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with status {server.returncode}")
+                if time.perf_counter() - began > args.startup_timeout:
+                    raise RuntimeError("uvicorn did not become ready in time")
+                try:
+                    if (await client.get("/cache/stats")).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(0.2)
+            dataset = Dataset(rows=args.rows, seed=args.seed, counts=counts_for(args.rows))
+            return await measure(client, dataset, server.pid, time.perf_counter() - began, args)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+async def measure(client: httpx.AsyncClient, dataset: Dataset, pid: int, load_seconds: float, args) -> dict:
+    if args.warmup:
+        await drive(client, plan(args.mix, args.warmup, dataset, args.seed + 1), args.concurrency, None)
+    recorder = Recorder(pid)
+    elapsed = await drive(client, plan(args.mix, args.requests, dataset, args.seed), args.concurrency, recorder)
+    endpoints = recorder.summary(elapsed)
+    ordered = sorted(sample for samples in recorder.latencies.values() for sample in samples)
+    peak = peak_rss_bytes(pid)
+    return {
+        "load_seconds": round(load_seconds, 2),
+        "elapsed_seconds": round(elapsed, 3),
+        "total": {
+            "requests": len(ordered),
+            "errors": sum(endpoint["errors"] for endpoint in endpoints.values()),
+            "throughput_rps": round(len(ordered) / elapsed, 2),
+            "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+            "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+            "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+            "peak_rss_mb": round(peak / 2 ** 20, 1) if peak else None,
+        },
+        "endpoints": endpoints,
+    }
+
+
+def git_revision() -> str:
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return revision + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(result: dict) -> None:
+    print(f"{result['revision']}  {result['target']}  mix={result['mix']}  rows={result['rows']}  "
+          f"concurrency={result['concurrency']}  load={result['load_seconds']}s")
+    print(f"{'endpoint':40} {'reqs':>7} {'rps':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'rss MB':>8} {'err':>5}")
+    rows = list(result["endpoints"].items()) + [("TOTAL", result["total"])]
+    for name, stats in rows:
+        print(f"{name:40} {stats['requests']:>7} {stats['throughput_rps']:>9.1f} {stats['p50_ms']:>8.2f} "
+              f"{stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f} {stats['peak_rss_mb'] or 0:>8.1f} "
+              f"{stats['errors']:>5}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--rows", type=int, default=10000, help="synthetic rows across all tables (10k to 10M)")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="browse")
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--warmup", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--startup-timeout", type=float, default=1800)
+    parser.add_argument("--output", help="JSON file to write (default: benchmarks/results/<revision>-...json)")
+    args = parser.parse_args()
+
+    runner = run_inprocess if args.target == "inprocess" else run_uvicorn
+    result = {
+        "revision": git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "persistence_backend": os.getenv("PERSISTENCE_BACKEND", "memory"),
+        "target": args.target,
+        "mix": args.mix,
+        "rows": args.rows,
+        "seed": args.seed,
+        "concurrency": args.concurrency,
+    }
+    result.update(asyncio.run(runner(args)))
+
+    output = args.output or os.path.join(
+        ROOT, "benchmarks", "results",
+        f"{result['revision']}-{args.target}-{args.mix}-{args.rows}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as handle:
+        json.dump(result, handle, indent=2)
+    print_report(result)
+    print(f"wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Read throughput against the number of uvicorn worker processes.
+
+For each worker count the API is started with ``--workers N`` on the
+shared journal backend (seeded once, in shared memory), and the read-only
+mix is driven from several client processes so the load generator is not
+what saturates first. Reports throughput, speedup over the first worker
+count and p50/p99 latency, and writes them to JSON.
+
+    python -m benchmarks.scaling --workers 1 2 4 8 --rows 100000 --clients 8
+
+Near-linear scaling needs at least as many free cores as workers plus
+clients; on a smaller machine the numbers show the host's limit instead.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks.data import Dataset, counts_for
+from benchmarks.mix import MIXES, plan
+from benchmarks.run import ROOT, drive, free_port, git_revision, percentile
+
+
+class _Samples:
+    """Recorder stand-in that keeps only what crosses the process boundary."""
+
+    def __init__(self):
+        self.latencies = []
+        self.statuses = Counter()
+
+    def record(self, name: str, seconds: float, status: int) -> None:
+        self.latencies.append(seconds)
+        self.statuses[status] += 1
+
+
+def client(port: int, mix: str, requests: int, rows: int, seed: int, concurrency: int) -> dict:
+    """One load-generating process; returns its latencies and wall-clock window."""
+    async def run():
+        dataset = Dataset(rows=rows, seed=0, counts=counts_for(rows))
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as http:
+            samples = _Samples()
+            began = time.time()
+            await drive(http, plan(mix, requests, dataset, seed), concurrency, samples)
+            return {"began": began, "ended": time.time(), "latencies": samples.latencies,
+                    "statuses": dict(samples.statuses)}
+
+    return asyncio.run(run())
+
+
+def wait_ready(port: int, server: subprocess.Popen, timeout: float) -> None:
+    began = time.perf_counter()
+    while True:
+        if server.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with status {server.returncode}")
+        if time.perf_counter() - began > timeout:
+            raise RuntimeError("uvicorn did not become ready in time")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/cache/stats", timeout=5).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+
+
+def measure(workers: int, args) -> dict:
+    port = free_port()
+    journal = tempfile.mkdtemp(prefix="bench-shared-", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+    env = dict(os.environ, BENCH_ROWS=str(args.rows), BENCH_SEED="0", PERSISTENCE_BACKEND="shared",
+               JOURNAL_DIR=journal,
+               PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.app:create_app", "--factory", "--workers", str(workers),
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        wait_ready(port, server, args.startup_timeout)
+        per_client = args.requests // args.clients
+        with multiprocessing.Pool(args.clients) as pool:
+            if args.warmup:
+                pool.starmap(client, [(port, args.mix, args.warmup // args.clients, args.rows, 1000 + i,
+                                       args.concurrency) for i in range(args.clients)])
+            results = pool.starmap(client, [(port, args.mix, per_client, args.rows, i, args.concurrency)
+                                            for i in range(args.clients)])
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+        shutil.rmtree(journal, ignore_errors=True)
+
+    elapsed = max(result["ended"] for result in results) - min(result["began"] for result in results)
+    ordered = sorted(sample for result in results for sample in result["latencies"])
+    statuses = Counter()
+    for result in results:
+        statuses.update({int(status): count for status, count in result["statuses"].items()})
+    return {
+        "workers": workers,
+        "requests": len(ordered),
+        "errors": sum(count for status, count in statuses.items() if status >= 500 or status == 0),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(ordered) / elapsed, 2),
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--mix", choices=sorted(MIXES), default="read")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--warmup", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=4, help="load-generating processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="connections per client process")
+    parser.add_argument("--startup-timeout", type=float, default=1800)
+    parser.add_argument("--output", help="JSON file to write (default: benchmarks/results/<revision>-scaling-...json)")
+    args = parser.parse_args()
+
+    runs = []
+    for workers in args.workers:
+        runs.append(measure(workers, args))
+        base = runs[0]["throughput_rps"] / runs[0]["workers"]
+        run = runs[-1]
+        run["speedup"] = round(run["throughput_rps"] / runs[0]["throughput_rps"], 2)
+        run["efficiency"] = round(run["throughput_rps"] / (base * workers), 2)
+        print(f"workers={workers:<3} rps={run['throughput_rps']:>9.1f} speedup={run['speedup']:>5.2f}x "
+              f"efficiency={run['efficiency']:>4.0%} p50={run['p50_ms']:.2f}ms p99={run['p99_ms']:.2f}ms "
+              f"errors={run['errors']}", flush=True)
+
+    result = {
+        "revision": git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "cpus": os.cpu_count(),
+        "mix": args.mix,
+        "rows": args.rows,
+        "clients": args.clients,
+        "concurrency": args.concurrency,
+        "runs": runs,
+    }
+    output = args.output or os.path.join(
+        ROOT, "benchmarks", "results", f"{result['revision']}-scaling-{args.mix}-{args.rows}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as handle:
+        json.dump(result, handle, indent=2)
+    print(f"wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
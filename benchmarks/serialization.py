@@ -0,0 +1,80 @@
+"""Per-request cost of the flight list endpoint, fast path vs. response_model.
+
+Loads synthetic flights into the in-memory store and times
+``GET /flights/?limit=N`` against a baseline route that returns the same page
+through FastAPI's response_model validation and the stdlib JSON encoder.
+
+    python benchmarks/serialization.py --flights 20000 --limit 1000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from statistics import median
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("PERSISTENCE_BACKEND", "memory")
+
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+import main
+from Schema import Flight, FlightPage
+
+
+def load_flights(count: int) -> None:
+    start = datetime(2025, 1, 1)
+    cities = ["AMS", "BER", "CDG", "JFK", "LHR", "MAD", "NRT", "SFO"]
+    for i in range(count):
+        departure = start + timedelta(minutes=17 * i)
+        main.flights_db.add(Flight(
+            flight_id=main.flights_db.next_id(),
+            flight_number=f"FL{i:06d}",
+            airline=f"Airline {i % 12}",
+            departure_city=cities[i % len(cities)],
+            arrival_city=cities[(i + 3) % len(cities)],
+            departure_time=departure,
+            arrival_time=departure + timedelta(hours=2),
+            price=100 + i % 400,
+            seats_available=180,
+        ))
+
+
+@main.app.get("/_baseline/flights/", response_model=FlightPage, response_class=JSONResponse)
+async def baseline_flights(limit: int = 100):
+    items, next_cursor = main.list_page(main.flights_db, main.flight_filters, {}, None, limit)
+    return FlightPage(items=items, next_cursor=next_cursor)
+
+
+def timed(client: TestClient, url: str, requests: int) -> list:
+    client.get(url).raise_for_status()
+    samples = []
+    for _ in range(requests):
+        began = time.perf_counter()
+        client.get(url).raise_for_status()
+        samples.append(time.perf_counter() - began)
+    return samples
+
+
+def run() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--flights", type=int, default=20000)
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    load_flights(args.flights)
+    with TestClient(main.app) as client:
+        fast = timed(client, f"/flights/?limit={args.limit}", args.requests)
+        baseline = timed(client, f"/_baseline/flights/?limit={args.limit}", args.requests)
+
+    fast_ms, baseline_ms = median(fast) * 1000, median(baseline) * 1000
+    print(f"{args.limit} flights per page, {args.requests} requests")
+    print(f"response_model + json: {baseline_ms:8.2f} ms/request (median)")
+    print(f"ORJSONResponse:        {fast_ms:8.2f} ms/request (median)")
+    print(f"speedup:               {baseline_ms / fast_ms:8.2f}x")
+
+
+if __name__ == "__main__":
+    run()
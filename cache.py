@@ -0,0 +1,91 @@
+import time
+from collections import OrderedDict
+from hashlib import blake2b
+from threading import Lock
+from typing import Dict, Hashable, NamedTuple, Optional
+
+# ------------------ RESPONSE CACHE ------------------
+
+class CacheEntry(NamedTuple):
+    body: bytes
+    etag: str
+    expires_at: float
+
+
+class ResponseCache:
+    """Bounded LRU cache of serialized responses with a TTL.
+
+    Entries are keyed by ``(resource, id)`` and dropped by ``invalidate``
+    as soon as the record changes, so the TTL is only a safety net.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, body: bytes) -> CacheEntry:
+        entry = CacheEntry(body, f'"{blake2b(body, digest_size=12).hexdigest()}"', time.monotonic() + self.ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+class CacheInvalidator:
+    """Table index that drops a record's cached response whenever it changes."""
+
+    def __init__(self, cache: ResponseCache, resource: str, key: str):
+        self.cache = cache
+        self.resource = resource
+        self.key = key
+
+    def insert(self, record) -> None:
+        self.cache.invalidate((self.resource, getattr(record, self.key)))
+
+    def remove(self, record) -> None:
+        self.cache.invalidate((self.resource, getattr(record, self.key)))
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
@@ -0,0 +1,453 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from functools import lru_cache
+from threading import RLock
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from store import update_indexes
+
+# ------------------ COLUMNAR TABLE ------------------
+
+# CATALOG_STORAGE=columnar stores flights and hotels as one numpy array per
+# field instead of one Pydantic object per row; objects are built only when
+# a record is read. Kinds:
+#   "str"       Python str (object array), for unique-ish values
+#   "category"  int32 code into the table's interned string pool
+#   "datetime"  int64 microseconds since the epoch in UTC, plus an int32
+#               UTC offset in seconds so aware values come back with the
+#               offset they were stored with (NAIVE for naive values)
+#   "float"     float64, NaN for None
+#   "int"       int64
+
+EPOCH = datetime(1970, 1, 1)
+NAIVE = np.iinfo(np.int32).min
+
+FLIGHT_STORAGE = {
+    "flight_number": "str", "departure_city": "category", "arrival_city": "category",
+    "departure_time": "datetime", "arrival_time": "datetime", "airline": "category",
+    "price": "float", "seats_available": "int",
+}
+HOTEL_STORAGE = {
+    "name": "str", "location": "category", "available_rooms": "int",
+    "price_per_night": "float", "rating": "float",
+}
+
+_DTYPES = {"str": object, "category": np.int32, "datetime": np.int64, "float": np.float64, "int": np.int64}
+
+
+def to_micros(value: datetime) -> int:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def utc_offset(value: datetime) -> int:
+    offset = value.utcoffset()
+    return NAIVE if offset is None else offset // timedelta(seconds=1)
+
+
+@lru_cache(maxsize=None)
+def _zone(offset: int) -> timezone:
+    return timezone.utc if offset == 0 else timezone(timedelta(seconds=offset))
+
+
+def from_micros(value: int, offset: int = NAIVE) -> datetime:
+    moment = EPOCH + timedelta(microseconds=value)
+    if offset == NAIVE:
+        return moment
+    return (moment + timedelta(seconds=offset)).replace(tzinfo=_zone(offset))
+
+
+class ColumnarTable:
+    """Drop-in for store.Table holding rows as struct-of-arrays.
+
+    Primary keys sit in a sorted int64 array, so a lookup is a
+    ``searchsorted`` and pages are slices; new IDs are almost always the
+    largest and simply append. Deleted rows are tombstoned and compacted
+    once they outnumber live ones. Strings of category columns are
+    interned once per table and shared between columns (a city has the
+    same code as departure and as arrival). Registered indexes receive
+    materialized records exactly as with Table.
+
+    It also answers ``arrays``/``labels`` like columns.ColumnStore, so the
+    analytics routes read it directly.
+    """
+
+    def __init__(self, schema, key: str, columns: Dict[str, str], capacity: int = 1024):
+        self.schema = schema
+        self.key = key
+        self.kinds = dict(columns)
+        self.lock = RLock()
+        self._next_id = 1
+        self._size = 0
+        self._count = 0
+        self._indexes: List[Any] = []
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._live = np.zeros(capacity, dtype=bool)
+        self._columns = {name: np.zeros(capacity, dtype=_DTYPES[kind]) for name, kind in self.kinds.items()}
+        self._offsets = {name: np.zeros(capacity, dtype=np.int32)
+                         for name, kind in self.kinds.items() if kind == "datetime"}
+        self._labels: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    # ------------------ encoding ------------------
+
+    def code(self, value) -> int:
+        """Interned code of a category value, -1 if it was never stored."""
+        return self._codes.get(value.value if isinstance(value, Enum) else value, -1)
+
+    def _encode(self, kind: str, value: Any) -> Any:
+        if isinstance(value, Enum):
+            value = value.value
+        if kind == "category":
+            code = self._codes.get(value)
+            if code is None:
+                code = self._codes[value] = len(self._labels)
+                self._labels.append(value)
+            return code
+        if kind == "datetime":
+            return to_micros(value)
+        if kind == "float" and value is None:
+            return np.nan
+        return value
+
+    def _decode(self, name: str, kind: str, slots) -> List[Any]:
+        values = self._columns[name][slots].tolist()
+        if kind == "category":
+            labels = self._labels
+            return [labels[value] for value in values]
+        if kind == "datetime":
+            offsets = self._offsets[name][slots].tolist()
+            return [from_micros(value, offset) for value, offset in zip(values, offsets)]
+        if kind == "float":
+            return [None if value != value else value for value in values]
+        return values
+
+    def _materialize_many(self, slots) -> List[Any]:
+        """Build records for ``slots`` decoding one column at a time.
+
+        Validating the decoded dict in pydantic-core is cheaper than
+        ``model_construct``, which walks the fields in Python.
+        """
+        names = [self.key, *self.kinds]
+        columns = [self._ids[slots].tolist()]
+        columns += [self._decode(name, kind, slots) for name, kind in self.kinds.items()]
+        validate = self.schema.model_validate
+        return [validate(dict(zip(names, row))) for row in zip(*columns)]
+
+    def _materialize(self, slot: int):
+        return self._materialize_many([slot])[0]
+
+    # ------------------ slots ------------------
+
+    def _slot(self, record_id: int) -> int:
+        slot = int(np.searchsorted(self._ids[:self._size], record_id))
+        if slot < self._size and self._ids[slot] == record_id:
+            return slot
+        return -1
+
+    def _resize(self, capacity: int) -> None:
+        def grown(column):
+            bigger = np.zeros(capacity, dtype=column.dtype)
+            bigger[:self._size] = column[:self._size]
+            return bigger
+
+        self._ids = grown(self._ids)
+        self._live = grown(self._live)
+        self._columns = {name: grown(column) for name, column in self._columns.items()}
+        self._offsets = {name: grown(column) for name, column in self._offsets.items()}
+
+    def _new_slot(self, record_id: int) -> int:
+        if self._size == len(self._ids):
+            self._resize(len(self._ids) * 2)
+        slot = self._size
+        if slot and record_id < self._ids[slot - 1]:
+            # Out-of-order ID (e.g. restored from a backend): shift the tail.
+            slot = int(np.searchsorted(self._ids[:self._size], record_id))
+            for column in [self._ids, self._live, *self._columns.values(), *self._offsets.values()]:
+                column[slot + 1:self._size + 1] = column[slot:self._size]
+        self._size += 1
+        self._ids[slot] = record_id
+        return slot
+
+    def _write(self, slot: int, record) -> None:
+        for name, kind in self.kinds.items():
+            value = getattr(record, name)
+            self._columns[name][slot] = self._encode(kind, value)
+            if kind == "datetime":
+                self._offsets[name][slot] = utc_offset(value)
+
+    def _compact(self) -> None:
+        keep = np.flatnonzero(self._live[:self._size])
+        for column in [self._ids, *self._columns.values(), *self._offsets.values()]:
+            column[:len(keep)] = column[keep]
+        self._live[:len(keep)] = True
+        self._live[len(keep):self._size] = False
+        self._size = len(keep)
+
+    # ------------------ Table interface ------------------
+
+    def next_id(self) -> int:
+        with self.lock:
+            record_id = self._next_id
+            self._next_id += 1
+            return record_id
+
+    def peek_id(self) -> int:
+        """The ID ``next_id`` hands out next, without taking it."""
+        return self._next_id
+
+    def skip_ids(self, next_id: int) -> None:
+        """Never hand out an ID below ``next_id``, e.g. one restored by a backend."""
+        with self.lock:
+            self._next_id = max(self._next_id, next_id)
+
+    def add_index(self, index, backfill: bool = True) -> None:
+        with self.lock:
+            if backfill:
+                for record in self.scan():
+                    index.insert(record)
+            self._indexes.append(index)
+
+    def get(self, record_id: int) -> Optional[Any]:
+        with self.lock:
+            slot = self._slot(record_id)
+            if slot < 0 or not self._live[slot]:
+                return None
+            return self._materialize(slot)
+
+    def get_many(self, record_ids: List[int]) -> List[Optional[Any]]:
+        with self.lock:
+            ids = self._ids[:self._size]
+            wanted = np.asarray(record_ids, dtype=np.int64)
+            slots = np.minimum(np.searchsorted(ids, wanted), max(self._size - 1, 0))
+            found = (ids[slots] == wanted) & self._live[slots] if self._size else np.zeros(len(wanted), dtype=bool)
+            records = iter(self._materialize_many(slots[found]))
+            return [next(records) if hit else None for hit in found.tolist()]
+
+    def add(self, record):
+        with self.lock:
+            record_id = getattr(record, self.key)
+            next_id = self._next_id
+            if record_id >= next_id:
+                self._next_id = record_id + 1
+            slot = self._slot(record_id)
+            if slot < 0:
+                slot = self._new_slot(record_id)
+            live = bool(self._live[slot])
+            old = self._materialize(slot) if live and self._indexes else None
+            if not live:
+                self._live[slot] = True
+                self._count += 1
+            self._write(slot, record)
+
+            def undo():
+                if live:
+                    self._write(slot, old)
+                else:
+                    self._live[slot] = False
+                    self._count -= 1
+                self._next_id = next_id
+
+            update_indexes(self._indexes, old, record, undo)
+        return record
+
+    def replace(self, record):
+        with self.lock:
+            record_id = getattr(record, self.key)
+            slot = self._slot(record_id)
+            if slot < 0 or not self._live[slot]:
+                raise KeyError(record_id)
+            old = self._materialize(slot) if self._indexes else None
+            self._write(slot, record)
+
+            def undo():
+                self._write(slot, old)
+
+            update_indexes(self._indexes, old, record, undo)
+        return record
+
+    def remove(self, record_id: int) -> Optional[Any]:
+        with self.lock:
+            slot = self._slot(record_id)
+            if slot < 0 or not self._live[slot]:
+                return None
+            record = self._materialize(slot)
+            self._live[slot] = False
+            self._count -= 1
+
+            def undo():
+                self._live[slot] = True
+                self._count += 1
+
+            update_indexes(self._indexes, record, None, undo)
+            if self._size - self._count > max(1024, self._count):
+                self._compact()
+        return record
+
+    def page(self, after: int = 0, limit: int = 100) -> List[Any]:
+        with self.lock:
+            start = int(np.searchsorted(self._ids[:self._size], after, side="right"))
+            slots = np.flatnonzero(self._live[start:self._size])[:limit] + start
+            return self._materialize_many(slots)
+
+    def scan(self, batch_size: int = 1000) -> Iterator[Any]:
+        after = 0
+        while True:
+            records = self.page(after, batch_size)
+            if not records:
+                return
+            yield from records
+            after = getattr(records[-1], self.key)
+
+    def __contains__(self, record_id: int) -> bool:
+        with self.lock:
+            slot = self._slot(record_id)
+            return slot >= 0 and bool(self._live[slot])
+
+    def __iter__(self) -> Iterator[Any]:
+        return self.scan()
+
+    def __len__(self) -> int:
+        return self._count
+
+    # ------------------ vectorized access ------------------
+
+    def arrays(self, *names: str) -> Dict[str, np.ndarray]:
+        """Copies of the live rows of ``names`` (plus the key), in key order."""
+        with self.lock:
+            live = self._live[:self._size]
+            result = {self.key: self._ids[:self._size][live]}
+            for name in names:
+                result[name] = self._columns[name][:self._size][live]
+            return result
+
+    def labels(self, name: Optional[str] = None) -> np.ndarray:
+        with self.lock:
+            return np.array(self._labels, dtype=object)
+
+    def _mask(self, filters: Dict[str, Any], start: int = 0) -> np.ndarray:
+        """Live rows from ``start`` on whose fields equal ``filters``; caller holds the lock."""
+        mask = self._live[start:self._size].copy()
+        for field, value in filters.items():
+            kind = self.kinds[field]
+            wanted = self.code(value) if kind == "category" else self._encode(kind, value)
+            mask &= self._columns[field][start:self._size] == wanted
+        return mask
+
+    def matching(self, field: str, value, after: int = 0) -> np.ndarray:
+        """IDs greater than ``after`` whose ``field`` equals ``value``, ascending."""
+        with self.lock:
+            start = int(np.searchsorted(self._ids[:self._size], after, side="right"))
+            return self._ids[start:self._size][self._mask({field: value}, start)]
+
+    def where(self, filters: Dict[str, Any], after: int = 0, limit: int = 100) -> List[Any]:
+        """Like ``page`` but only rows whose fields equal ``filters``, in one pass."""
+        with self.lock:
+            start = int(np.searchsorted(self._ids[:self._size], after, side="right"))
+            slots = np.flatnonzero(self._mask(filters, start))[:limit] + start
+            return self._materialize_many(slots)
+
+
+# ------------------ VECTORIZED INDEXES ------------------
+
+class ColumnFilter:
+    """FieldIndex interface answered by a vectorized scan of one column.
+
+    Nothing is stored per row; with the table's columns this costs a
+    comparison over one array per query instead of a sorted ID list per
+    value kept up to date on every write.
+    """
+
+    def __init__(self, table: ColumnarTable, field: str):
+        self.table = table
+        self.field = field
+
+    def insert(self, record) -> None:
+        pass
+
+    def remove(self, record) -> None:
+        pass
+
+    def lookup(self, value) -> List[int]:
+        return self.table.matching(self.field, value).tolist()
+
+    def count(self, value) -> int:
+        return len(self.table.matching(self.field, value))
+
+    def ids_after(self, value, after: int) -> Iterator[int]:
+        return iter(self.table.matching(self.field, value, after).tolist())
+
+
+class _TimeSorted:
+    """Flight IDs grouped by a key, each group as two parallel int64 arrays.
+
+    Entries are (departure time in microseconds, flight_id) sorted by time,
+    then ID: 16 bytes per flight instead of a tuple holding a datetime.
+    """
+
+    def __init__(self):
+        self._groups: Dict[Any, Tuple[array, array]] = defaultdict(lambda: (array("q"), array("q")))
+
+    def _group(self, flight) -> Any:
+        raise NotImplementedError
+
+    def insert(self, flight) -> None:
+        times, ids = self._groups[self._group(flight)]
+        when = to_micros(flight.departure_time)
+        i = bisect_right(times, when)
+        while i > 0 and times[i - 1] == when and ids[i - 1] > flight.flight_id:
+            i -= 1
+        times.insert(i, when)
+        ids.insert(i, flight.flight_id)
+
+    def remove(self, flight) -> None:
+        group = self._group(flight)
+        entries = self._groups.get(group)
+        if entries is None:
+            return
+        times, ids = entries
+        when = to_micros(flight.departure_time)
+        for i in range(bisect_left(times, when), bisect_right(times, when)):
+            if ids[i] == flight.flight_id:
+                del times[i]
+                del ids[i]
+                break
+        if not times:
+            del self._groups[group]
+
+    def _between(self, group, start: Optional[datetime], end: Optional[datetime]) -> List[int]:
+        entries = self._groups.get(group)
+        if entries is None:
+            return []
+        times, ids = entries
+        lo = bisect_left(times, to_micros(start)) if start is not None else 0
+        hi = bisect_right(times, to_micros(end)) if end is not None else len(times)
+        return ids[lo:hi].tolist()
+
+
+class ColumnarRoutes(_TimeSorted):
+    """RouteIndex interface over compact per-route arrays."""
+
+    def _group(self, flight) -> Tuple[str, str]:
+        return flight.departure_city, flight.arrival_city
+
+    def search(self, departure_city: str, arrival_city: str,
+               start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[int]:
+        return self._between((departure_city, arrival_city), start, end)
+
+
+class CompactDepartureIndex(_TimeSorted):
+    """DepartureIndex interface over compact per-city arrays."""
+
+    def _group(self, flight) -> str:
+        return flight.departure_city
+
+    def departing(self, city: str, start: Optional[datetime] = None,
+                  end: Optional[datetime] = None) -> List[int]:
+        return self._between(city, start, end)
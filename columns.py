@@ -0,0 +1,122 @@
+from enum import Enum
+from threading import RLock
+from typing import Any, Dict, List
+
+import numpy as np
+
+# ------------------ COLUMN STORE ------------------
+
+# Column kinds and how each is held:
+#   "float"     float64
+#   "int"       int64
+#   "ref"       int64, -1 for None (optional foreign keys)
+#   "datetime"  datetime64[s], NaT for None
+#   "category"  int32 codes into a per-column list of labels (enums by value)
+#   "object"    the Python value itself
+_DTYPES = {
+    "float": np.float64,
+    "int": np.int64,
+    "ref": np.int64,
+    "datetime": "datetime64[s]",
+    "category": np.int32,
+    "object": object,
+}
+
+
+class ColumnStore:
+    """A table's records mirrored as numpy arrays, one per column.
+
+    Registered on a Table like any index, it overwrites a record's slot on
+    insert and marks it dead on remove, compacting once dead slots
+    outnumber live ones. Aggregations then run over whole arrays instead of
+    looping over Pydantic objects.
+    """
+
+    def __init__(self, key: str, columns: Dict[str, str], capacity: int = 1024):
+        self.key = key
+        self.kinds = dict(columns)
+        self._lock = RLock()
+        self._slots: Dict[int, int] = {}
+        self._size = 0
+        self._ids = np.empty(capacity, dtype=np.int64)
+        self._live = np.zeros(capacity, dtype=bool)
+        self._columns = {name: np.empty(capacity, dtype=_DTYPES[kind]) for name, kind in self.kinds.items()}
+        self._labels: Dict[str, List[Any]] = {name: [] for name, kind in self.kinds.items() if kind == "category"}
+        self._codes: Dict[str, Dict[Any, int]] = {name: {} for name in self._labels}
+
+    def _grow(self) -> None:
+        capacity = len(self._ids) * 2
+        self._ids = np.resize(self._ids, capacity)
+        live = np.zeros(capacity, dtype=bool)
+        live[:self._size] = self._live[:self._size]
+        self._live = live
+        for name, column in self._columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._columns[name] = grown
+
+    def _encode(self, name: str, kind: str, value: Any) -> Any:
+        if isinstance(value, Enum):
+            value = value.value
+        if kind == "category":
+            code = self._codes[name].get(value)
+            if code is None:
+                code = self._codes[name][value] = len(self._labels[name])
+                self._labels[name].append(value)
+            return code
+        if value is None:
+            return -1 if kind == "ref" else np.datetime64("NaT") if kind == "datetime" else value
+        if kind == "datetime" and value.tzinfo is not None:
+            return value.replace(tzinfo=None) - value.utcoffset()
+        return value
+
+    def insert(self, record) -> None:
+        with self._lock:
+            record_id = getattr(record, self.key)
+            slot = self._slots.get(record_id)
+            if slot is None:
+                if self._size == len(self._ids):
+                    self._grow()
+                slot = self._slots[record_id] = self._size
+                self._size += 1
+                self._ids[slot] = record_id
+                self._live[slot] = True
+            for name, kind in self.kinds.items():
+                self._columns[name][slot] = self._encode(name, kind, getattr(record, name))
+
+    def remove(self, record) -> None:
+        with self._lock:
+            slot = self._slots.pop(getattr(record, self.key), None)
+            if slot is None:
+                return
+            self._live[slot] = False
+            dead = self._size - len(self._slots)
+            if dead > 1024 and dead > len(self._slots):
+                self._compact()
+
+    def _compact(self) -> None:
+        keep = np.flatnonzero(self._live[:self._size])
+        self._ids[:len(keep)] = self._ids[keep]
+        for column in self._columns.values():
+            column[:len(keep)] = column[keep]
+        self._live[:len(keep)] = True
+        self._live[len(keep):] = False
+        self._size = len(keep)
+        self._slots = {int(record_id): slot for slot, record_id in enumerate(self._ids[:self._size])}
+
+    def arrays(self, *names: str) -> Dict[str, np.ndarray]:
+        """Copies of the live rows of ``names`` (plus the key), in slot order."""
+        with self._lock:
+            live = self._live[:self._size]
+            result = {self.key: self._ids[:self._size][live]}
+            for name in names:
+                result[name] = self._columns[name][:self._size][live]
+            return result
+
+    def labels(self, name: str) -> np.ndarray:
+        """Category labels, indexable by the codes ``arrays`` returns."""
+        with self._lock:
+            return np.array(self._labels[name], dtype=object)
+
+    def __len__(self) -> int:
+        return len(self._slots)
@@ -1,7 +1,11 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session, joinedload, selectinload
 from typing import List, Optional
-from datetime import datetime
-from . import models, Schema
+from collections import Counter
+from datetime import datetime, time, timedelta
+import models, Schema
+from availability import nights
+from inventory import InsufficientInventory
 
 # ------------------ USER CRUD ------------------
 
@@ -23,8 +27,15 @@ def get_user(db: Session, user_id: int) -> Optional[models.User]:
     return db.query(models.User).filter(models.User.user_id == user_id).first()
 
 
-def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[models.User]:
-    return db.query(models.User).offset(skip).limit(limit).all()
+# List reads are keyset-paginated: ``after`` is the last primary key of the
+# previous page, so every page is an index range scan rather than an OFFSET.
+
+def get_users(db: Session, after: int = 0, limit: int = 100,
+              role: Optional[models.UserRole] = None) -> List[models.User]:
+    query = db.query(models.User).filter(models.User.user_id > after)
+    if role is not None:
+        query = query.filter(models.User.role == role)
+    return query.order_by(models.User.user_id).limit(limit).all()
 
 
 def update_user(db: Session, user_id: int, user: Schema.UserUpdate) -> Optional[models.User]:
@@ -76,8 +87,16 @@ def get_flight(db: Session, flight_id: int) -> Optional[models.Flight]:
     return db.query(models.Flight).filter(models.Flight.flight_id == flight_id).first()
 
 
-def get_flights(db: Session, skip: int = 0, limit: int = 100) -> List[models.Flight]:
-    return db.query(models.Flight).offset(skip).limit(limit).all()
+def get_flights(db: Session, after: int = 0, limit: int = 100, airline: Optional[str] = None,
+                departure_city: Optional[str] = None, arrival_city: Optional[str] = None) -> List[models.Flight]:
+    query = db.query(models.Flight).filter(models.Flight.flight_id > after)
+    if airline is not None:
+        query = query.filter(models.Flight.airline == airline)
+    if departure_city is not None:
+        query = query.filter(models.Flight.departure_city == departure_city)
+    if arrival_city is not None:
+        query = query.filter(models.Flight.arrival_city == arrival_city)
+    return query.order_by(models.Flight.flight_id).limit(limit).all()
 
 
 def update_flight(db: Session, flight_id: int, flight: Schema.FlightUpdate) -> Optional[models.Flight]:
@@ -123,8 +142,12 @@ def get_hotel(db: Session, hotel_id: int) -> Optional[models.Hotel]:
     return db.query(models.Hotel).filter(models.Hotel.hotel_id == hotel_id).first()
 
 
-def get_hotels(db: Session, skip: int = 0, limit: int = 100) -> List[models.Hotel]:
-    return db.query(models.Hotel).offset(skip).limit(limit).all()
+def get_hotels(db: Session, after: int = 0, limit: int = 100,
+               location: Optional[str] = None) -> List[models.Hotel]:
+    query = db.query(models.Hotel).filter(models.Hotel.hotel_id > after)
+    if location is not None:
+        query = query.filter(models.Hotel.location == location)
+    return query.order_by(models.Hotel.hotel_id).limit(limit).all()
 
 
 def update_hotel(db: Session, hotel_id: int, hotel: Schema.HotelUpdate) -> Optional[models.Hotel]:
@@ -149,16 +172,86 @@ def delete_hotel(db: Session, hotel_id: int) -> Optional[models.Hotel]:
     return None
 
 
+# ------------------ INVENTORY ------------------
+
+# Same rules as inventory.Inventory. Seats are taken with a conditional
+# UPDATE, so the check and the decrement happen in one statement and
+# concurrent bookings cannot oversell. Hotel rooms are counted per night:
+# available_rooms is the hotel's capacity and bookings never change it; a
+# stay fits when every night has fewer bookings holding inventory than that.
+
+def rooms_free(db: Session, db_booking: models.Booking) -> bool:
+    if db_booking.check_in is None or db_booking.check_out is None:
+        raise ValueError("Hotel bookings need check_in and check_out")
+    check_in, check_out = db_booking.check_in.date(), db_booking.check_out.date()
+    if check_out <= check_in:
+        raise ValueError("check_out must be after check_in")
+    hotel = (
+        db.query(models.Hotel)
+        .filter(models.Hotel.hotel_id == db_booking.hotel_id)
+        .with_for_update()
+        .first()
+    )
+    if hotel is None:
+        return False
+    stays = (
+        db.query(models.Booking.check_in, models.Booking.check_out)
+        .outerjoin(models.Payment)
+        .filter(
+            models.Booking.booking_type == models.BookingType.hotel,
+            models.Booking.hotel_id == hotel.hotel_id,
+            models.Booking.check_in < datetime.combine(check_out, time.min),
+            models.Booking.check_out >= datetime.combine(check_in + timedelta(days=1), time.min),
+            or_(models.Payment.payment_id.is_(None), models.Payment.status != models.PaymentStatus.failed),
+        )
+        .all()
+    )
+    booked = Counter(night for stay_in, stay_out in stays for night in nights(stay_in.date(), stay_out.date())
+                     if check_in <= night < check_out)
+    return max(booked.values(), default=0) < hotel.available_rooms
+
+
+def reserve_inventory(db: Session, db_booking: models.Booking) -> bool:
+    if db_booking.booking_type == models.BookingType.hotel:
+        return rooms_free(db, db_booking)
+    result = db.execute(
+        update(models.Flight)
+        .where(models.Flight.flight_id == db_booking.flight_id, models.Flight.seats_available >= 1)
+        .values(seats_available=models.Flight.seats_available - 1)
+    )
+    return result.rowcount == 1
+
+
+def release_inventory(db: Session, db_booking: models.Booking) -> None:
+    # A hotel booking stops counting once deleted or its payment fails.
+    if db_booking.booking_type == models.BookingType.flight:
+        db.execute(
+            update(models.Flight)
+            .where(models.Flight.flight_id == db_booking.flight_id)
+            .values(seats_available=models.Flight.seats_available + 1)
+        )
+
+
+def holds_inventory(db_booking: models.Booking) -> bool:
+    return db_booking.payment is None or db_booking.payment.status != models.PaymentStatus.failed
+
+
 # ------------------ BOOKING CRUD ------------------
 
 def create_booking(db: Session, booking: Schema.BookingCreate):
     db_booking = models.Booking(
         user_id=booking.user_id,
+        booking_type=booking.booking_type,
         flight_id=booking.flight_id,
         hotel_id=booking.hotel_id,
+        check_in=booking.check_in,
+        check_out=booking.check_out,
         booking_date=booking.booking_date,
         total_amount=booking.total_amount,
     )
+    if not reserve_inventory(db, db_booking):
+        db.rollback()
+        raise InsufficientInventory("No seats or rooms available")
     db.add(db_booking)
     db.commit()
     db.refresh(db_booking)
@@ -169,8 +262,45 @@ def get_booking(db: Session, booking_id: int) -> Optional[models.Booking]:
     return db.query(models.Booking).filter(models.Booking.booking_id == booking_id).first()
 
 
-def get_bookings(db: Session, skip: int = 0, limit: int = 100) -> List[models.Booking]:
-    return db.query(models.Booking).offset(skip).limit(limit).all()
+def get_bookings(db: Session, after: int = 0, limit: int = 100, user_id: Optional[int] = None,
+                 booking_type: Optional[models.BookingType] = None, flight_id: Optional[int] = None,
+                 hotel_id: Optional[int] = None) -> List[models.Booking]:
+    query = db.query(models.Booking).filter(models.Booking.booking_id > after)
+    if user_id is not None:
+        query = query.filter(models.Booking.user_id == user_id)
+    if booking_type is not None:
+        query = query.filter(models.Booking.booking_type == booking_type)
+    if flight_id is not None:
+        query = query.filter(models.Booking.flight_id == flight_id)
+    if hotel_id is not None:
+        query = query.filter(models.Booking.hotel_id == hotel_id)
+    return query.order_by(models.Booking.booking_id).limit(limit).all()
+
+
+# Related rows are loaded eagerly so a booking page costs a fixed number of
+# queries: one joined SELECT for a single booking, and one SELECT per
+# expanded relationship (selectinload) for a list.
+
+def get_booking_full(db: Session, booking_id: int) -> Optional[models.Booking]:
+    return (
+        db.query(models.Booking)
+        .options(
+            joinedload(models.Booking.user),
+            joinedload(models.Booking.flight),
+            joinedload(models.Booking.hotel),
+            joinedload(models.Booking.payment),
+        )
+        .filter(models.Booking.booking_id == booking_id)
+        .first()
+    )
+
+
+def get_user_bookings(db: Session, user_id: int, after: int = 0, limit: int = 100,
+                      expand: Optional[List[str]] = None) -> List[models.Booking]:
+    query = db.query(models.Booking).filter(models.Booking.user_id == user_id, models.Booking.booking_id > after)
+    for name in expand or ():
+        query = query.options(selectinload(getattr(models.Booking, name)))
+    return query.order_by(models.Booking.booking_id).limit(limit).all()
 
 
 def update_booking(db: Session, booking_id: int, booking: Schema.BookingUpdate) -> Optional[models.Booking]:
@@ -187,6 +317,8 @@ def update_booking(db: Session, booking_id: int, booking: Schema.BookingUpdate)
 def delete_booking(db: Session, booking_id: int) -> Optional[models.Booking]:
     db_booking = db.query(models.Booking).filter(models.Booking.booking_id == booking_id).first()
     if db_booking:
+        if holds_inventory(db_booking):
+            release_inventory(db, db_booking)
         db.delete(db_booking)
         db.commit()
         return db_booking
@@ -213,14 +345,28 @@ def get_payment(db: Session, payment_id: int) -> Optional[models.Payment]:
     return db.query(models.Payment).filter(models.Payment.payment_id == payment_id).first()
 
 
-def get_payments(db: Session, skip: int = 0, limit: int = 100) -> List[models.Payment]:
-    return db.query(models.Payment).offset(skip).limit(limit).all()
+def get_payments(db: Session, after: int = 0, limit: int = 100, booking_id: Optional[int] = None,
+                 status: Optional[models.PaymentStatus] = None,
+                 method: Optional[models.PaymentMethod] = None) -> List[models.Payment]:
+    query = db.query(models.Payment).filter(models.Payment.payment_id > after)
+    if booking_id is not None:
+        query = query.filter(models.Payment.booking_id == booking_id)
+    if status is not None:
+        query = query.filter(models.Payment.status == status)
+    if method is not None:
+        query = query.filter(models.Payment.method == method)
+    return query.order_by(models.Payment.payment_id).limit(limit).all()
 
 
 def update_payment(db: Session, payment_id: int, payment: Schema.PaymentUpdate) -> Optional[models.Payment]:
     db_payment = db.query(models.Payment).filter(models.Payment.payment_id == payment_id).first()
     if db_payment:
-        if payment.status:
+        if payment.status and payment.status != db_payment.status:
+            if payment.status == models.PaymentStatus.failed:
+                release_inventory(db, db_payment.booking)
+            elif db_payment.status == models.PaymentStatus.failed and not reserve_inventory(db, db_payment.booking):
+                db.rollback()
+                raise InsufficientInventory("No seats or rooms available")
             db_payment.status = payment.status
         if payment.amount is not None:
             db_payment.amount = payment.amount
@@ -239,3 +385,14 @@ def delete_payment(db: Session, payment_id: int) -> Optional[models.Payment]:
         db.commit()
         return db_payment
     return None
+
+
+# ------------------ STREAMING READS ------------------
+
+def stream(model, batch_size: int = 1000):
+    # A SELECT of the whole table in key order, for Session.scalars or
+    # AsyncSession.stream_scalars. yield_per with stream_results uses a
+    # server-side cursor where the driver supports one, so only batch_size
+    # rows are held at a time.
+    key = model.__mapper__.primary_key[0]
+    return select(model).order_by(key).execution_options(stream_results=True, yield_per=batch_size)
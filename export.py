@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, List, Union
+
+from fastapi.responses import StreamingResponse
+
+from Schema import ExportFormat
+
+# ------------------ STREAMING EXPORT ------------------
+
+# Rows are serialized in batches and handed to StreamingResponse as they are
+# produced, so memory stays flat however large the table is. Records come
+# from a table scan, or as an async stream of database rows (crud.stream).
+
+BATCH_SIZE = 500
+
+
+def _cell(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def ndjson_chunks(records: Iterable, fields: List[str], batch_size: int = BATCH_SIZE) -> Iterator[str]:
+    lines = []
+    for record in records:
+        lines.append(json.dumps({field: _cell(getattr(record, field)) for field in fields}))
+        if len(lines) >= batch_size:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def csv_chunks(records: Iterable, fields: List[str], batch_size: int = BATCH_SIZE,
+               header: bool = True) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(fields)
+    for i, record in enumerate(records, 1):
+        writer.writerow([_cell(getattr(record, field)) for field in fields])
+        if i % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+async def async_chunks(records: AsyncIterable, fields: List[str], format: ExportFormat,
+                       batch_size: int = BATCH_SIZE) -> AsyncIterator[str]:
+    batch, first = [], True
+    async for record in records:
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield _write(batch, fields, format, first)
+            batch, first = [], False
+    if batch or first:
+        yield _write(batch, fields, format, first)
+
+
+def _write(batch: List, fields: List[str], format: ExportFormat, header: bool) -> str:
+    size = max(len(batch), 1)
+    if format == ExportFormat.csv:
+        return "".join(csv_chunks(batch, fields, size, header))
+    return "".join(ndjson_chunks(batch, fields, size))
+
+
+def export_response(records: Union[Iterable, AsyncIterable], model, name: str,
+                    format: ExportFormat) -> StreamingResponse:
+    # Only the fields of the response model are written, so stored-only
+    # fields such as password hashes never leave the service.
+    fields = list(model.__fields__)
+    if hasattr(records, "__aiter__"):
+        chunks = async_chunks(records, fields, format)
+    elif format == ExportFormat.csv:
+        chunks = csv_chunks(records, fields)
+    else:
+        chunks = ndjson_chunks(records, fields)
+    media_type = "text/csv" if format == ExportFormat.csv else "application/x-ndjson"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{name}.{format.value}"'},
+    )
@@ -0,0 +1,138 @@
+import asyncio
+import secrets
+from threading import Lock
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from serialization import dumps
+
+# ------------------ CHANGE FEED ------------------
+
+# Every create, update and delete on the tables becomes an event with a
+# sequence number, kept in a fixed-size ring and streamed to subscribers
+# over Server-Sent Events. Subscribers read the ring through their own
+# cursor instead of having events pushed into per-subscriber queues: a slow
+# one only holds up its own stream (the socket write is awaited before the
+# next read), and memory stays at the ring's size however many there are.
+# One that falls more than the ring's size behind gets a ``reset`` event and
+# continues from the oldest event still kept.
+#
+# Event IDs are ``<epoch>-<seq>``, the epoch being random per feed. An
+# EventSource reconnecting with a Last-Event-ID from before a restart, or
+# from another worker process, has an epoch this feed does not know, so it
+# gets a ``reset`` instead of events that merely share its sequence number.
+
+
+class ChangeFeed:
+    """Ring buffer of encoded change events, numbered from 1.
+
+    Sequence numbers count the events of this process; with several worker
+    processes each has its own feed, which also carries the changes it picked
+    up from the others.
+    """
+
+    def __init__(self, capacity: int = 10000):
+        self.capacity = capacity
+        self.epoch = secrets.token_hex(4)
+        self.seq = 0
+        self._ring: List[Optional[Tuple[str, bytes]]] = [None] * capacity
+        self._lock = Lock()
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def publish(self, resource: str, record_id: int, op: str, changes: dict) -> None:
+        with self._lock:
+            self.seq += 1
+            data = dumps({"seq": self.seq, "resource": resource, "id": record_id, "op": op, "changes": changes})
+            self._ring[self.seq % self.capacity] = (
+                resource, b"id: %s-%d\nevent: change\ndata: %s\n\n" % (self.epoch.encode(), self.seq, data))
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+    def read(self, after: int, resources: Optional[Iterable[str]] = None,
+             limit: int = 1000) -> Tuple[List[bytes], int, bool]:
+        """Encoded events after ``after``: ``(events, cursor, missed)``.
+
+        ``cursor`` is where the next read should continue; ``missed`` says
+        events after ``after`` were already overwritten, or that ``after``
+        is past the end of this feed (a position from before a restart or
+        from another worker), in which case reading continues at the end.
+        """
+        with self._lock:
+            if after > self.seq:
+                return [], self.seq, True
+            oldest = max(1, self.seq - self.capacity + 1)
+            missed = after + 1 < oldest
+            start = max(after + 1, oldest)
+            end = min(self.seq, start + limit - 1)
+            entries = [self._ring[seq % self.capacity] for seq in range(start, end + 1)]
+        events = [event for resource, event in entries if resources is None or resource in resources]
+        return events, max(after, end), missed
+
+    def position(self, event_id: str) -> Optional[int]:
+        """The sequence number of an event ID from this feed, None if from another.
+
+        Raises ValueError for something that is not an event ID.
+        """
+        epoch, _, seq = event_id.rpartition("-")
+        seq = int(seq)
+        return seq if epoch == self.epoch else None
+
+    async def wait(self, after: int, timeout: float) -> bool:
+        """Wait up to ``timeout`` seconds for an event after ``after``."""
+        loop = asyncio.get_running_loop()
+        waiter = (loop, loop.create_future())
+        with self._lock:
+            if self.seq > after:
+                return True
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class ChangeRecorder:
+    """Table observer publishing the table's changes to a ChangeFeed.
+
+    Only ``fields`` are published, so columns such as password hashes stay
+    out of the feed; an update touching none of them publishes nothing.
+    Table.replace removes the old record while it is still in the table and
+    inserts the new one right after, which tells an update from a delete.
+    """
+
+    def __init__(self, feed: ChangeFeed, resource: str, table, fields: Sequence[str]):
+        self.feed = feed
+        self.resource = resource
+        self.table = table
+        self.fields = tuple(fields)
+        self._replaced = None
+
+    def _values(self, record, fields: Iterable[str]) -> dict:
+        return {name: getattr(record, name) for name in fields}
+
+    def insert(self, record) -> None:
+        old, self._replaced = self._replaced, None
+        record_id = getattr(record, self.table.key)
+        if old is None or getattr(old, self.table.key) != record_id:
+            self.feed.publish(self.resource, record_id, "created", self._values(record, self.fields))
+            return
+        changed = [name for name in self.fields if getattr(old, name) != getattr(record, name)]
+        if changed:
+            self.feed.publish(self.resource, record_id, "updated", self._values(record, changed))
+
+    def remove(self, record) -> None:
+        record_id = getattr(record, self.table.key)
+        if record_id in self.table:
+            self._replaced = record
+        else:
+            self.feed.publish(self.resource, record_id, "deleted", {})
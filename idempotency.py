@@ -0,0 +1,161 @@
+import asyncio
+import time
+from collections import OrderedDict
+from hashlib import blake2b
+from threading import RLock
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import Response
+
+from Schema import IdempotentResponse
+
+# ------------------ IDEMPOTENCY KEYS ------------------
+
+# A POST carrying an Idempotency-Key header runs once. Retries with the same
+# key get the first response back (marked Idempotent-Replayed) instead of
+# creating another record; retries that arrive while the first request is
+# still running wait for it. Reusing a key for a different request (other
+# route or body) is refused.
+
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyKeyReused(Exception):
+    pass
+
+
+def fingerprint(method: str, target: str, body: bytes) -> str:
+    return blake2b(f"{method} {target}\n".encode() + body, digest_size=16).hexdigest()
+
+
+class IdempotencyStore:
+    """Bounded, TTL-evicted map of Idempotency-Key to stored response.
+
+    Shaped like store.Table (``key``, add/replace/remove, iteration,
+    ``add_index``) so the persistence backend journals it next to the
+    records a request created: with the journal and sqlalchemy backends
+    keys survive a restart, with the shared backend every worker sees them. Entries leave
+    in insertion order, which with one TTL for all is also expiry order.
+    Responses with a 5xx status are not kept, so those can be retried.
+    """
+
+    key = "key"
+
+    def __init__(self, max_entries: int = 50000, ttl: float = 86400.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = RLock()
+        self._entries: "OrderedDict[str, IdempotentResponse]" = OrderedDict()
+        self._indexes: List[Any] = []
+        self._running: Dict[str, Tuple[str, asyncio.Future]] = {}
+
+    # ------------------ Table interface ------------------
+
+    def add_index(self, index, backfill: bool = True) -> None:
+        with self.lock:
+            if backfill:
+                for record in self._entries.values():
+                    index.insert(record)
+            self._indexes.append(index)
+
+    def get(self, key: str) -> Optional[IdempotentResponse]:
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at < time.time():
+            return None
+        return entry
+
+    def add(self, record: IdempotentResponse) -> IdempotentResponse:
+        with self.lock:
+            self.remove(record.key)
+            now = time.time()
+            if record.expires_at < now:
+                # Expired already, as when replayed from a journal after a
+                # restart; there is nothing to keep.
+                return record
+            self._entries[record.key] = record
+            for index in self._indexes:
+                index.insert(record)
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or next(iter(self._entries.values())).expires_at < now):
+                self.remove(next(iter(self._entries)))
+        return record
+
+    replace = add
+
+    def remove(self, key: str) -> Optional[IdempotentResponse]:
+        with self.lock:
+            record = self._entries.pop(key, None)
+            if record is not None:
+                for index in self._indexes:
+                    index.remove(record)
+        return record
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __iter__(self) -> Iterator[IdempotentResponse]:
+        return iter(list(self._entries.values()))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ------------------ running requests once ------------------
+
+    def record(self, key: str, request_fingerprint: str, status_code: int, content_type: Optional[str],
+               body: bytes) -> IdempotentResponse:
+        response = IdempotentResponse(key=key, fingerprint=request_fingerprint, status_code=status_code,
+                                      content_type=content_type, body=body.decode(),
+                                      expires_at=time.time() + self.ttl)
+        return self.add(response) if status_code < 500 else response
+
+    async def once(self, key: str, request_fingerprint: str,
+                   execute: Callable[[], Awaitable[Tuple[IdempotentResponse, bool]]]) -> Tuple[IdempotentResponse, bool]:
+        """The response for ``key``, from the store or by awaiting ``execute()``.
+
+        ``execute`` returns the response and whether it was found stored
+        (by another worker) rather than produced; so does this. Raises
+        IdempotencyKeyReused when the key belongs to a different request.
+        """
+        stored = self.get(key)
+        if stored is not None:
+            return self._matching(stored, request_fingerprint), True
+        running = self._running.get(key)
+        if running is not None:
+            if running[0] != request_fingerprint:
+                raise IdempotencyKeyReused(key)
+            try:
+                return await asyncio.shield(running[1]), True
+            except asyncio.CancelledError:
+                if not running[1].cancelled():
+                    raise
+                # The first request was abandoned; run this one instead.
+                return await self.once(key, request_fingerprint, execute)
+
+        future = asyncio.get_running_loop().create_future()
+        self._running[key] = (request_fingerprint, future)
+        try:
+            response, replayed = await execute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()
+            raise
+        else:
+            future.set_result(response)
+        finally:
+            del self._running[key]
+        return self._matching(response, request_fingerprint), replayed
+
+    @staticmethod
+    def _matching(response: IdempotentResponse, request_fingerprint: str) -> IdempotentResponse:
+        if response.fingerprint != request_fingerprint:
+            raise IdempotencyKeyReused(response.key)
+        return response
+
+
+def replay(response: IdempotentResponse, replayed: bool) -> Response:
+    headers = {"Idempotent-Replayed": "true"} if replayed else None
+    return Response(response.body, status_code=response.status_code, media_type=response.content_type,
+                    headers=headers)
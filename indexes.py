@@ -0,0 +1,124 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """``value`` as naive UTC, so aware and naive times compare and sort."""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+# ------------------ FLIGHT ROUTE INDEX ------------------
+
+class RouteIndex:
+    """Flights grouped by (departure_city, arrival_city).
+
+    Each route holds ``(departure_time, flight_id)`` pairs kept sorted, so a
+    departure window is located with two bisects instead of a scan.
+    """
+
+    def __init__(self):
+        self._routes: Dict[Tuple[str, str], List[Tuple[datetime, int]]] = defaultdict(list)
+
+    def insert(self, flight) -> None:
+        insort(self._routes[(flight.departure_city, flight.arrival_city)],
+               (naive_utc(flight.departure_time), flight.flight_id))
+
+    def remove(self, flight) -> None:
+        route = (flight.departure_city, flight.arrival_city)
+        entries = self._routes.get(route)
+        if not entries:
+            return
+        entry = (naive_utc(flight.departure_time), flight.flight_id)
+        i = bisect_left(entries, entry)
+        if i < len(entries) and entries[i] == entry:
+            del entries[i]
+        if not entries:
+            del self._routes[route]
+
+    def search(self, departure_city: str, arrival_city: str,
+               start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[int]:
+        entries = self._routes.get((departure_city, arrival_city))
+        if not entries:
+            return []
+        lo = bisect_left(entries, (naive_utc(start),)) if start is not None else 0
+        hi = bisect_right(entries, (naive_utc(end), float("inf"))) if end is not None else len(entries)
+        return [flight_id for _, flight_id in entries[lo:hi]]
+
+
+# ------------------ DEPARTURE INDEX ------------------
+
+class DepartureIndex:
+    """Flights grouped by departure_city, sorted by departure_time.
+
+    This is the adjacency structure of the time-dependent flight graph: the
+    onward connections from a city after a given arrival are a bisect away.
+    """
+
+    def __init__(self):
+        self._cities: Dict[str, List[Tuple[datetime, int]]] = defaultdict(list)
+
+    def insert(self, flight) -> None:
+        insort(self._cities[flight.departure_city], (naive_utc(flight.departure_time), flight.flight_id))
+
+    def remove(self, flight) -> None:
+        entries = self._cities.get(flight.departure_city)
+        if not entries:
+            return
+        entry = (naive_utc(flight.departure_time), flight.flight_id)
+        i = bisect_left(entries, entry)
+        if i < len(entries) and entries[i] == entry:
+            del entries[i]
+        if not entries:
+            del self._cities[flight.departure_city]
+
+    def departing(self, city: str, start: Optional[datetime] = None,
+                  end: Optional[datetime] = None) -> List[int]:
+        entries = self._cities.get(city)
+        if not entries:
+            return []
+        lo = bisect_left(entries, (naive_utc(start),)) if start is not None else 0
+        hi = bisect_right(entries, (naive_utc(end), float("inf"))) if end is not None else len(entries)
+        return [flight_id for _, flight_id in entries[lo:hi]]
+
+
+# ------------------ FIELD INDEX ------------------
+
+class FieldIndex:
+    """Primary keys grouped by the value of one attribute, kept sorted."""
+
+    def __init__(self, field: str, key: str):
+        self.field = field
+        self.key = key
+        self._values: Dict[Any, List[int]] = defaultdict(list)
+
+    def insert(self, record) -> None:
+        value = getattr(record, self.field)
+        if value is not None:
+            insort(self._values[value], getattr(record, self.key))
+
+    def remove(self, record) -> None:
+        value = getattr(record, self.field)
+        entries = self._values.get(value)
+        if not entries:
+            return
+        record_id = getattr(record, self.key)
+        i = bisect_left(entries, record_id)
+        if i < len(entries) and entries[i] == record_id:
+            del entries[i]
+        if not entries:
+            del self._values[value]
+
+    def lookup(self, value) -> List[int]:
+        return list(self._values.get(value, ()))
+
+    def count(self, value) -> int:
+        return len(self._values.get(value, ()))
+
+    def ids_after(self, value, after: int) -> Iterator[int]:
+        entries = self._values.get(value, [])
+        for i in range(bisect_right(entries, after), len(entries)):
+            yield entries[i]
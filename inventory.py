@@ -0,0 +1,196 @@
+from threading import RLock
+from typing import Optional, Set
+
+from Schema import BookingType, PaymentStatus
+
+# ------------------ SEAT AND ROOM RESERVATION ------------------
+
+class InsufficientInventory(Exception):
+    pass
+
+
+class Inventory:
+    """Reserves flight seats and hotel room-nights for bookings.
+
+    Every check-and-update runs under the lock of the one flight or hotel it
+    touches, taken from a fixed pool of striped locks, so bookings for
+    different resources never wait on each other.
+
+    A flight booking takes one seat off ``seats_available``. A hotel booking
+    occupies one room per night of its stay in the occupancy index, checked
+    against ``available_rooms`` as the hotel's capacity. A released booking
+    (failed payment) stays on record but holds no inventory until restored.
+    """
+
+    def __init__(self, flights, hotels, bookings, occupancy, stripes: int = 256):
+        self.flights = flights
+        self.hotels = hotels
+        self.bookings = bookings
+        self.occupancy = occupancy
+        self._locks = [RLock() for _ in range(stripes)]
+        self._released_seats: Set[int] = set()
+
+    def lock(self, resource: str, record_id: int) -> RLock:
+        return self._locks[hash((resource, record_id)) % len(self._locks)]
+
+    def released(self) -> Set[int]:
+        """IDs of bookings that currently hold no seat or rooms."""
+        return set(self._released_seats) | self.occupancy.released()
+
+    # ------------------ FLIGHT SEATS ------------------
+
+    def _take_seat(self, flight_id: Optional[int]) -> None:
+        with self.lock("flights", flight_id):
+            flight = self.flights.get(flight_id)
+            if flight is None:
+                raise LookupError("Flight not found")
+            if flight.seats_available < 1:
+                raise InsufficientInventory("No seats available on this flight")
+            self.flights.replace(flight.copy(update={"seats_available": flight.seats_available - 1}))
+
+    def _return_seat(self, flight_id: int) -> None:
+        with self.lock("flights", flight_id):
+            flight = self.flights.get(flight_id)
+            if flight is not None:
+                self.flights.replace(flight.copy(update={"seats_available": flight.seats_available + 1}))
+
+    # ------------------ HOTEL ROOMS ------------------
+
+    @staticmethod
+    def _stay(booking):
+        if booking.check_in is None or booking.check_out is None:
+            raise ValueError("Hotel bookings need check_in and check_out")
+        if booking.check_out.date() <= booking.check_in.date():
+            raise ValueError("check_out must be after check_in")
+        return booking.check_in.date(), booking.check_out.date()
+
+    def _hotel(self, hotel_id: Optional[int]):
+        hotel = self.hotels.get(hotel_id)
+        if hotel is None:
+            raise LookupError("Hotel not found")
+        return hotel
+
+    def _overbooked(self, booking) -> bool:
+        hotel = self._hotel(booking.hotel_id)
+        return self.occupancy.booked(hotel.hotel_id, *self._stay(booking)) > hotel.available_rooms
+
+    # ------------------ BOOKINGS ------------------
+
+    def book(self, booking):
+        """Reserve inventory for a new booking and store it."""
+        if booking.booking_type == BookingType.flight:
+            self._take_seat(booking.flight_id)
+            try:
+                return self.bookings.add(booking)
+            except BaseException:
+                self._return_seat(booking.flight_id)
+                raise
+
+        with self.lock("hotels", booking.hotel_id):
+            hotel = self._hotel(booking.hotel_id)
+            if self.occupancy.booked(hotel.hotel_id, *self._stay(booking)) >= hotel.available_rooms:
+                raise InsufficientInventory("No rooms available for these nights")
+            return self.bookings.add(booking)
+
+    def rebook(self, old, new):
+        """Store an updated booking, re-checking the rooms for a changed stay."""
+        if old.booking_type != BookingType.hotel or self.occupancy.is_released(old.booking_id):
+            return self.bookings.replace(new)
+        with self.lock("hotels", old.hotel_id):
+            self._stay(new)
+            self.bookings.replace(new)
+            if self._overbooked(new):
+                self.bookings.replace(old)
+                raise InsufficientInventory("No rooms available for these nights")
+            return new
+
+    def cancel(self, booking_id: int):
+        """Delete a booking and give back whatever inventory it still holds."""
+        booking = self.bookings.remove(booking_id)
+        if booking is None:
+            return None
+        if booking.booking_type == BookingType.flight:
+            with self.lock("flights", booking.flight_id):
+                if booking_id in self._released_seats:
+                    self._released_seats.discard(booking_id)
+                else:
+                    self._return_seat(booking.flight_id)
+        else:
+            self.occupancy.forget(booking_id)
+        return booking
+
+    def release(self, booking) -> None:
+        """Give back the inventory of a booking that stays on record."""
+        if booking.booking_type == BookingType.flight:
+            with self.lock("flights", booking.flight_id):
+                if booking.booking_id not in self._released_seats:
+                    self._return_seat(booking.flight_id)
+                    self._released_seats.add(booking.booking_id)
+        else:
+            # The bookings lock keeps occupancy changes atomic with respect
+            # to consistency checks, which snapshot under it.
+            with self.lock("hotels", booking.hotel_id), self.bookings.lock:
+                self.occupancy.release(booking)
+
+    def restore(self, booking) -> None:
+        """Reserve inventory again for a previously released booking."""
+        if booking.booking_type == BookingType.flight:
+            with self.lock("flights", booking.flight_id):
+                if booking.booking_id in self._released_seats:
+                    self._take_seat(booking.flight_id)
+                    self._released_seats.discard(booking.booking_id)
+        else:
+            with self.lock("hotels", booking.hotel_id), self.bookings.lock:
+                if self.occupancy.is_released(booking.booking_id):
+                    self.occupancy.restore(booking)
+                    if self._overbooked(booking):
+                        self.occupancy.release(booking)
+                        raise InsufficientInventory("No rooms available for these nights")
+
+    def mark(self, booking_id: int, released: bool) -> None:
+        """Record whether a booking holds inventory, without moving any.
+
+        For changes whose seat and room counts are already in the tables:
+        replayed from a journal or written by another worker.
+        """
+        booking = self.bookings.get(booking_id)
+        if booking is None:
+            return
+        if booking.booking_type == BookingType.flight:
+            with self.lock("flights", booking.flight_id):
+                if released:
+                    self._released_seats.add(booking_id)
+                else:
+                    self._released_seats.discard(booking_id)
+        else:
+            with self.lock("hotels", booking.hotel_id), self.bookings.lock:
+                if released and not self.occupancy.is_released(booking_id):
+                    self.occupancy.release(booking)
+                elif not released and self.occupancy.is_released(booking_id):
+                    self.occupancy.restore(booking)
+
+
+class SettlementTracker:
+    """Payments observer keeping ``Inventory``'s released set in step.
+
+    A booking's inventory follows the status of the payment last created
+    for it or changed in status (see settle_inventory in main.py). Writes
+    made through ``release``/``restore`` already agree, so this only
+    changes anything for payments loaded at startup or applied from
+    another worker.
+    """
+
+    def __init__(self, inventory: Inventory):
+        self.inventory = inventory
+        # Table.replace removes the old record right before inserting the
+        # new one; an update that keeps the status settles nothing.
+        self._replaced = None
+
+    def insert(self, payment) -> None:
+        old, self._replaced = self._replaced, None
+        if old is not None and old.payment_id == payment.payment_id and old.status == payment.status:
+            return
+        self.inventory.mark(payment.booking_id, payment.status == PaymentStatus.failed)
+
+    def remove(self, payment) -> None:
+        self._replaced = payment
@@ -0,0 +1,101 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from heapq import heappop, heappush
+from itertools import count
+from typing import List, Optional
+
+from Schema import Itinerary, ItinerarySort
+from indexes import naive_utc
+
+# ------------------ ITINERARY SEARCH ------------------
+
+def _cost(path, sort: ItinerarySort) -> float:
+    if sort == ItinerarySort.duration:
+        return (naive_utc(path[-1].arrival_time) - naive_utc(path[0].departure_time)).total_seconds()
+    return sum(flight.price for flight in path)
+
+
+def _itinerary(path) -> Itinerary:
+    departure, arrival = path[0].departure_time, path[-1].arrival_time
+    return Itinerary(
+        flights=list(path),
+        stops=len(path) - 1,
+        total_price=sum(flight.price for flight in path),
+        departure_time=departure,
+        arrival_time=arrival,
+        duration_minutes=(naive_utc(arrival) - naive_utc(departure)).total_seconds() / 60,
+    )
+
+
+def search_itineraries(
+    flights,
+    departures,
+    origin: str,
+    destination: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    k: int = 5,
+    sort: ItinerarySort = ItinerarySort.price,
+    max_stops: int = 2,
+    min_layover: timedelta = timedelta(0),
+    max_layover: Optional[timedelta] = None,
+    max_expansions: int = 10000,
+) -> List[Itinerary]:
+    """Return the k best connections from origin to destination.
+
+    Best-first search over partial itineraries ordered by cost (total price
+    or elapsed time); both are non-decreasing as legs are added, so
+    complete itineraries come off the heap in order. Only flights reachable
+    from the origin within the layover bounds are ever looked at.
+
+    When no maximum layover is set, a partial itinerary is dropped once k
+    others dominate it: they reached the same city no later, with no more
+    stops, through no city it has not been through itself (so every onward
+    flight open to it is open to them), at no higher cost. Heap order makes
+    their price no higher; for ``sort=duration`` they must also have left
+    no earlier, as elapsed time is counted from the first departure.
+    ``max_expansions`` caps the work done per query.
+    """
+    heap = []
+    tie = count()
+    for flight in flights.get_many(departures.departing(origin, start, end)):
+        if flight is None or flight.seats_available <= 0 or flight.arrival_city == origin:
+            continue
+        path = (flight,)
+        heappush(heap, (_cost(path, sort), next(tie), path))
+
+    results = []
+    settled = defaultdict(list)
+    expansions = 0
+    while heap and len(results) < k and expansions < max_expansions:
+        _, _, path = heappop(heap)
+        last = path[-1]
+        arrived = naive_utc(last.arrival_time)
+        departed = naive_utc(path[0].departure_time)
+        city = last.arrival_city
+        if city == destination:
+            results.append(_itinerary(path))
+            continue
+        stops = len(path) - 1
+        if stops >= max_stops:
+            continue
+        visited = frozenset({origin}.union(flight.arrival_city for flight in path))
+        if max_layover is None:
+            labels = settled[city]
+            dominating = sum(
+                1 for arrival, s, departure, through in labels
+                if arrival <= arrived and s <= stops and through <= visited
+                and (sort != ItinerarySort.duration or departure >= departed)
+            )
+            if dominating >= k:
+                continue
+            labels.append((arrived, stops, departed, visited))
+        expansions += 1
+
+        window_end = arrived + max_layover if max_layover is not None else None
+        for flight in flights.get_many(departures.departing(city, arrived + min_layover, window_end)):
+            if flight is None or flight.seats_available <= 0 or flight.arrival_city in visited:
+                continue
+            extended = path + (flight,)
+            heappush(heap, (_cost(extended, sort), next(tie), extended))
+    return results
@@ -0,0 +1,236 @@
+import mmap
+import os
+import re
+import struct
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack is optional
+    msgpack = None
+
+from serialization import dumps
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:  # pragma: no cover - orjson is optional
+    from json import loads as _json_loads
+
+# ------------------ JOURNAL FILES ------------------
+
+# A journal directory holds numbered log segments and snapshots:
+#
+#   log-<first seq>.wal        append-only change entries
+#   snapshot-<seq>.snap        every record as of entry <seq>
+#   state, lock                only with several worker processes, see
+#                              SharedHeader and backends.SharedJournalBackend
+#
+# Both are sequences of frames: a 4-byte length, a 4-byte CRC32 and a
+# payload encoded with msgpack when installed, JSON otherwise. The codec is
+# named in the 5-byte file header, so either build can read what it wrote.
+# A log entry is ``[seq, resource, id, record or None, next id]``, the last
+# being the table's next ID after the change (absent from older logs and
+# for tables without IDs); the snapshot header carries the same per table,
+# so IDs are not reused after a restart even when the highest record was
+# deleted. A short or corrupt frame at the end of a log is a write torn by
+# a crash and is cut off during recovery.
+
+MAGIC = b"TBJ1"
+FRAME = struct.Struct(">II")
+LOG_NAME = re.compile(r"^log-(\d{20})\.wal$")
+SNAPSHOT_NAME = re.compile(r"^snapshot-(\d{20})\.snap$")
+SNAPSHOT_CHUNK = 10000
+STATE_NAME = "state"
+LOCK_NAME = "lock"
+
+
+class CorruptJournal(Exception):
+    pass
+
+
+def _codec() -> bytes:
+    return b"m" if msgpack is not None else b"j"
+
+
+def _encode(codec: bytes, value: Any) -> bytes:
+    if codec == b"m":
+        return msgpack.packb(value, use_bin_type=True)
+    return dumps(value)
+
+
+def _decode(codec: bytes, payload: bytes) -> Any:
+    if codec == b"m":
+        if msgpack is None:
+            raise CorruptJournal("Journal was written with msgpack, which is not installed")
+        return msgpack.unpackb(payload, raw=False)
+    return _json_loads(payload)
+
+
+def frame(codec: bytes, value: Any) -> bytes:
+    payload = _encode(codec, value)
+    return FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def iter_frames(path: str, offset: int = 5) -> Iterator[Tuple[Any, int]]:
+    """Decoded frames of ``path`` from ``offset``, each with the byte offset just past it.
+
+    Stops quietly at the first short or corrupt frame.
+    """
+    with open(path, "rb") as handle:
+        header = handle.read(5)
+        if header[:4] != MAGIC:
+            raise CorruptJournal(f"{path} is not a journal file")
+        codec = header[4:5]
+        handle.seek(offset)
+        while True:
+            head = handle.read(FRAME.size)
+            if len(head) < FRAME.size:
+                return
+            length, checksum = FRAME.unpack(head)
+            payload = handle.read(length)
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                return
+            offset += FRAME.size + length
+            yield _decode(codec, payload), offset
+
+
+def _fsync_directory(directory: str) -> None:
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    except OSError:  # pragma: no cover - not supported on every platform
+        pass
+    finally:
+        os.close(fd)
+
+
+def log_path(directory: str, first_seq: int) -> str:
+    return os.path.join(directory, f"log-{first_seq:020d}.wal")
+
+
+def list_files(directory: str, pattern) -> List[Tuple[int, str]]:
+    found = []
+    for name in os.listdir(directory):
+        match = pattern.match(name)
+        if match:
+            found.append((int(match.group(1)), os.path.join(directory, name)))
+    return sorted(found)
+
+
+class LogWriter:
+    """Appends entries to the current log segment; ``sync`` makes them durable."""
+
+    def __init__(self, directory: str, first_seq: int):
+        self.directory = directory
+        self.first_seq = first_seq
+        self.codec = _codec()
+        self.path = log_path(directory, first_seq)
+        new = not os.path.exists(self.path)
+        self._file = open(self.path, "ab")
+        if new:
+            self._file.write(MAGIC + self.codec)
+            self._file.flush()
+            _fsync_directory(directory)
+        else:
+            with open(self.path, "rb") as handle:
+                self.codec = handle.read(5)[4:5]
+
+    def append(self, entries: Iterable[Any]) -> None:
+        self._file.write(b"".join(frame(self.codec, entry) for entry in entries))
+
+    def sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def close(self) -> None:
+        self.sync()
+        self._file.close()
+
+
+def write_snapshot(directory: str, seq: int, tables: Dict[str, List[Any]],
+                   next_ids: Optional[Dict[str, int]] = None) -> str:
+    """Write every record atomically: to a temp file, fsync, then rename."""
+    codec = _codec()
+    path = os.path.join(directory, f"snapshot-{seq:020d}.snap")
+    partial = path + ".tmp"
+    with open(partial, "wb") as handle:
+        handle.write(MAGIC + codec)
+        handle.write(frame(codec, {"seq": seq, "counts": {name: len(rows) for name, rows in tables.items()},
+                                   "next_ids": next_ids or {}}))
+        for resource, rows in tables.items():
+            for start in range(0, len(rows), SNAPSHOT_CHUNK):
+                handle.write(frame(codec, [resource, rows[start:start + SNAPSHOT_CHUNK]]))
+        handle.write(frame(codec, {"end": seq}))
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(partial, path)
+    _fsync_directory(directory)
+    return path
+
+
+def snapshot_header(path: str) -> Dict[str, Any]:
+    """The snapshot's first frame: ``seq``, row ``counts`` and ``next_ids``."""
+    header, _ = next(iter_frames(path), (None, 0))
+    if not isinstance(header, dict) or "seq" not in header:
+        raise CorruptJournal(f"{path} has no header")
+    return header
+
+
+def read_snapshot(path: str) -> Iterator[Tuple[str, List[Any]]]:
+    """Stream ``(resource, rows)`` chunks; raises if the snapshot is incomplete."""
+    frames = iter_frames(path)
+    header, _ = next(frames, (None, 0))
+    if not isinstance(header, dict) or "seq" not in header:
+        raise CorruptJournal(f"{path} has no header")
+    for value, _ in frames:
+        if isinstance(value, dict):
+            if value.get("end") != header["seq"]:
+                raise CorruptJournal(f"{path} has a bad trailer")
+            return
+        resource, rows = value
+        yield resource, rows
+    raise CorruptJournal(f"{path} is incomplete")
+
+
+def truncate(path: str, size: int) -> None:
+    with open(path, "r+b") as handle:
+        handle.truncate(size)
+        os.fsync(handle.fileno())
+
+
+def latest_snapshot(directory: str) -> Optional[Tuple[int, str]]:
+    snapshots = list_files(directory, SNAPSHOT_NAME)
+    return snapshots[-1] if snapshots else None
+
+
+class SharedHeader:
+    """Where the log ends, in a memory-mapped file every process maps.
+
+    Three int64s: the last logged seq, the first seq of the segment being
+    appended to, and the seq of the last snapshot. Reading them costs no
+    system call, so readers can check for new entries on every request.
+    """
+
+    LAYOUT = struct.Struct("<qqq")
+
+    def __init__(self, directory: str):
+        fd = os.open(os.path.join(directory, STATE_NAME), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < self.LAYOUT.size:
+                os.ftruncate(fd, self.LAYOUT.size)
+            self._map = mmap.mmap(fd, self.LAYOUT.size)
+        finally:
+            os.close(fd)
+
+    def read(self) -> Tuple[int, int, int]:
+        return self.LAYOUT.unpack_from(self._map)
+
+    def write(self, seq: int, segment: int, snapshot: int) -> None:
+        self.LAYOUT.pack_into(self._map, 0, seq, segment, snapshot)
+
+    def close(self) -> None:
+        self._map.close()
@@ -1,197 +1,1131 @@
-from fastapi import FastAPI, HTTPException
-from typing import List
-from datetime import datetime
-from Schema import User, UserCreate, UserUpdate, Flight, FlightCreate, FlightUpdate, Hotel, HotelCreate, HotelUpdate, \
-    Booking, BookingCreate, BookingUpdate, Payment, PaymentCreate, PaymentUpdate
+import asyncio
+import os
+import time
+from fastapi import Body, FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import ValidationError
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from datetime import date, datetime, timedelta
+from Schema import User, UserCreate, UserUpdate, UserRole, UserInDB, Flight, FlightCreate, FlightUpdate, Hotel, HotelCreate, \
+    HotelUpdate, HotelAvailability, Booking, BookingCreate, BookingUpdate, BookingType, Payment, PaymentCreate, \
+    PaymentUpdate, PaymentStatus, PaymentMethod, UserPage, FlightPage, HotelPage, BookingPage, PaymentPage, \
+    Itinerary, ItinerarySort, BulkItemError, BulkResult, ExportFormat, BookingExpand, BookingDetails, \
+    BookingDetailsPage, CacheStats, RevenueGroupBy, RevenueBasis, RevenueGroup, FlightLoad, HotelOccupancy, \
+    StatusRevenue, FlightBookings, HotelNight, AggregateCheck, ArrowFormat, ImportResult, \
+    IdempotentResponse, ChangeResource
+from store import Table
+from indexes import RouteIndex, DepartureIndex, FieldIndex
+from availability import OccupancyIndex
+from itinerary import search_itineraries
+from inventory import Inventory, InsufficientInventory, SettlementTracker
+from export import export_response
+from pagination import decode_cursor, next_page, paginate
+from backends import SQLAlchemyBackend, create_backend
+from cache import ResponseCache, CacheInvalidator, etag_matches
+from serialization import ORJSONResponse, changes, dumps
+from metrics import registry, instrument_engine, sample_threadpool, MetricsMiddleware
+from profiling import Profiler
+from columns import ColumnStore
+from columnar import ColumnarTable, ColumnFilter, ColumnarRoutes, CompactDepartureIndex, FLIGHT_STORAGE, HOTEL_STORAGE
+import analytics
+import crud
+from aggregates import GroupTotals, Verifier
+import database
+import models
+import arrow_io
+from idempotency import IdempotencyStore, IdempotencyKeyReused, MAX_KEY_LENGTH, fingerprint, replay
+from settlement import SettlementPipeline, SettlementWatch, create_processor
+from feed import ChangeFeed, ChangeRecorder
+from admission import AdmissionMiddleware, Limit
 
 # ------------------ MOCK DATABASE ------------------
-users_db = []
-flights_db = []
-hotels_db = []
-bookings_db = []
-payments_db = []
+# CATALOG_STORAGE=columnar keeps flights and hotels as numpy columns
+# (columnar.py); filter lookups then become vectorized scans instead of
+# per-row index entries, and route lookups use compact sorted arrays.
+COLUMNAR_CATALOG = os.getenv("CATALOG_STORAGE", "objects") == "columnar"
 
-app = FastAPI()
+users_db = Table("user_id")
+bookings_db = Table("booking_id")
+payments_db = Table("payment_id")
+if COLUMNAR_CATALOG:
+    flights_db = ColumnarTable(Flight, "flight_id", FLIGHT_STORAGE)
+    hotels_db = ColumnarTable(Hotel, "hotel_id", HOTEL_STORAGE)
+    flight_routes = ColumnarRoutes()
+    flight_departures = CompactDepartureIndex()
+    hotel_locations = ColumnFilter(hotels_db, "location")
+else:
+    flights_db = Table("flight_id")
+    hotels_db = Table("hotel_id")
+    flight_routes = RouteIndex()
+    flight_departures = DepartureIndex()
+    hotel_locations = FieldIndex("location", "hotel_id")
+flights_db.add_index(flight_routes)
+flights_db.add_index(flight_departures)
+hotel_occupancy = OccupancyIndex()
+bookings_db.add_index(hotel_occupancy)
+
+inventory = Inventory(flights_db, hotels_db, bookings_db, hotel_occupancy)
+payments_db.add_index(SettlementTracker(inventory))
+settlement_watch = SettlementWatch()
+payments_db.add_index(settlement_watch, backfill=False)
+
+# Secondary indexes answering the filters on the list endpoints.
+user_filters = {"role": FieldIndex("role", "user_id")}
+user_emails = FieldIndex("email", "user_id")
+users_db.add_index(user_emails)
+flight_filters = {
+    field: ColumnFilter(flights_db, field) if COLUMNAR_CATALOG else FieldIndex(field, "flight_id")
+    for field in ("airline", "departure_city", "arrival_city")
+}
+hotel_filters = {"location": hotel_locations}
+booking_filters = {
+    "user_id": FieldIndex("user_id", "booking_id"),
+    "booking_type": FieldIndex("booking_type", "booking_id"),
+    "flight_id": FieldIndex("flight_id", "booking_id"),
+    "hotel_id": FieldIndex("hotel_id", "booking_id"),
+}
+payment_filters = {
+    "booking_id": FieldIndex("booking_id", "payment_id"),
+    "status": FieldIndex("status", "payment_id"),
+    "method": FieldIndex("method", "payment_id"),
+}
+for table, filters in [(users_db, user_filters), (flights_db, flight_filters), (hotels_db, hotel_filters),
+                       (bookings_db, booking_filters), (payments_db, payment_filters)]:
+    for index in filters.values():
+        table.add_index(index)
+
+# Columnar mirrors of the tables, read by the analytics routes.
+payment_columns = ColumnStore("payment_id", analytics.PAYMENT_COLUMNS)
+booking_columns = ColumnStore("booking_id", analytics.BOOKING_COLUMNS)
+payments_db.add_index(payment_columns)
+bookings_db.add_index(booking_columns)
+if COLUMNAR_CATALOG:
+    flight_columns, hotel_columns = flights_db, hotels_db
+else:
+    flight_columns = ColumnStore("flight_id", analytics.FLIGHT_COLUMNS)
+    hotel_columns = ColumnStore("hotel_id", analytics.HOTEL_COLUMNS)
+    flights_db.add_index(flight_columns)
+    hotels_db.add_index(hotel_columns)
+
+# Counters polled by dashboards. The observers keep them current on every
+# write; a full recompute re-checks them every AGGREGATE_VERIFY_INTERVAL
+# seconds. Rooms booked per hotel per night is hotel_occupancy itself.
+revenue_by_status = GroupTotals("status", "amount")
+payments_db.add_index(revenue_by_status)
+bookings_per_flight = GroupTotals("flight_id")
+bookings_db.add_index(bookings_per_flight)
+aggregate_verifier = Verifier({
+    "revenue_by_status": (payments_db, revenue_by_status),
+    "bookings_per_flight": (bookings_db, bookings_per_flight),
+    "hotel_nights": (bookings_db, hotel_occupancy),
+})
+AGGREGATE_VERIFY_INTERVAL = float(os.getenv("AGGREGATE_VERIFY_INTERVAL", "300"))
+
+# Serialized GET /flights/{id} and /hotels/{id} responses. Invalidators sit
+# on the tables, so seat changes made by bookings drop the entry as well.
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "300")),
+)
+flights_db.add_index(CacheInvalidator(response_cache, "flights", "flight_id"), backfill=False)
+hotels_db.add_index(CacheInvalidator(response_cache, "hotels", "hotel_id"), backfill=False)
+
+# Responses of create requests sent with an Idempotency-Key, so retries get
+# the first response back instead of creating the record again.
+idempotency_keys = IdempotencyStore(
+    max_entries=int(os.getenv("IDEMPOTENCY_KEYS_MAX", "50000")),
+    ttl=float(os.getenv("IDEMPOTENCY_TTL", "86400")),
+)
+IDEMPOTENT_PATHS = {f"/{resource}/{suffix}" for resource in ("users", "flights", "hotels", "bookings", "payments")
+                    for suffix in ("", "bulk")}
+
+# Creates, updates and deletes streamed by GET /changes/stream. Recorders are
+# added once the backend has loaded the tables, so loading is not replayed
+# as creates; only the public schema's fields are published.
+change_feed = ChangeFeed(capacity=int(os.getenv("CHANGE_FEED_SIZE", "10000")))
+CHANGE_SOURCES = {
+    ChangeResource.users: (users_db, User),
+    ChangeResource.flights: (flights_db, Flight),
+    ChangeResource.hotels: (hotels_db, Hotel),
+    ChangeResource.bookings: (bookings_db, Booking),
+    ChangeResource.payments: (payments_db, Payment),
+}
+CHANGE_FEED_KEEPALIVE = 15.0
+
+# Where writes go, from PERSISTENCE_BACKEND: "memory" (default), "sqlalchemy",
+# "journal", or "shared" for a journal shared by several worker processes.
+PERSISTED_TABLES = {
+    "users": (users_db, UserInDB),
+    "flights": (flights_db, Flight),
+    "hotels": (hotels_db, Hotel),
+    "bookings": (bookings_db, Booking),
+    "payments": (payments_db, Payment),
+    "idempotency": (idempotency_keys, IdempotentResponse),
+}
+backend = create_backend()
+backend.attach(PERSISTED_TABLES)
+
+# SQL statement counts and timings, also attributed to the request that ran them.
+instrument_engine(database.engine)
+profiler = Profiler()
+
+app = FastAPI(default_response_class=ORJSONResponse)
 
 @app.on_event("startup")
-def on_startup():
-    # Initialize the database, could be connecting to a real DB
-    pass
+async def on_startup():
+    await backend.start()
+    if getattr(backend, "engine", None) is not None:
+        instrument_engine(backend.engine, "backend")
+        if backend.read_engine is not backend.engine:
+            instrument_engine(backend.read_engine, "backend-read")
+        if backend.writer is not None:
+            instrument_engine(backend.writer.engine, "backend")
+    for resource, (table, schema) in CHANGE_SOURCES.items():
+        table.add_index(ChangeRecorder(change_feed, resource.value, table, schema.__fields__), backfill=False)
+    app.state.aggregate_checks = asyncio.create_task(check_aggregates())
+    if settlement is not None:
+        # Pending payments from before the start are settled by one worker.
+        await settlement.start(recover=backend.claim("settlement"))
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    app.state.aggregate_checks.cancel()
+    if settlement is not None:
+        await settlement.stop()
+    await backend.stop()
+
+async def check_aggregates():
+    while True:
+        await asyncio.sleep(AGGREGATE_VERIFY_INTERVAL)
+        await asyncio.to_thread(aggregate_verifier.run)
+
+@app.middleware("http")
+async def commit_writes(request: Request, call_next):
+    # Handlers only touch the in-memory tables; the backend persists what
+    # changed before the response goes out. With several worker processes
+    # (PERSISTENCE_BACKEND=shared) reads first pick up other workers'
+    # writes and writes run one at a time across workers.
+    if request.method in ("GET", "HEAD", "OPTIONS"):
+        backend.refresh()
+        return await call_next(request)
+    key = request.headers.get("idempotency-key")
+    if key is not None and request.method == "POST" and request.url.path in IDEMPOTENT_PATHS:
+        return await idempotent_write(request, call_next, key)
+    async with backend.writing():
+        response = await call_next(request)
+        await backend.commit()
+    return response
+
+async def idempotent_write(request: Request, call_next, key: str) -> Response:
+    # The first request with a key runs, duplicates arriving meanwhile wait
+    # for it and later ones get its stored response. The response is only
+    # recorded once the records the request created are committed, so a
+    # failed commit is retried rather than replayed.
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return ORJSONResponse({"detail": f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters"},
+                              status_code=400)
+    request_fingerprint = fingerprint(request.method, f"{request.url.path}?{request.url.query}", await request.body())
+
+    async def execute():
+        async with backend.writing():
+            # Another worker may have answered it while this one waited.
+            stored = idempotency_keys.get(key)
+            if stored is not None:
+                return stored, True
+            response = await call_next(request)
+            body = b"".join([chunk async for chunk in response.body_iterator])
+            await backend.commit()
+            stored = idempotency_keys.record(key, request_fingerprint, response.status_code,
+                                             response.headers.get("content-type"), body)
+            await backend.commit()
+            return stored, False
+
+    try:
+        stored, replayed = await idempotency_keys.once(key, request_fingerprint, execute)
+    except IdempotencyKeyReused:
+        return ORJSONResponse({"detail": "Idempotency-Key was already used for a different request"},
+                              status_code=422)
+    return replay(stored, replayed)
+
+# Concurrency per route: hot lookups and the expensive reads get pools of
+# their own, everything else shares the default one. Past a pool's queue or
+# queue-time budget requests get a 503 with Retry-After. Long-lived streams
+# never queue. Identical in-flight GETs to the COALESCED_ROUTES share one
+# response.
+def admission_limit(name: str, concurrency: int, queue: int, timeout: float) -> Limit:
+    return Limit(
+        concurrency=int(os.getenv(f"ADMISSION_{name}_CONCURRENCY", str(concurrency))),
+        queue=int(os.getenv(f"ADMISSION_{name}_QUEUE", str(queue))),
+        timeout=float(os.getenv(f"ADMISSION_{name}_TIMEOUT", str(timeout))),
+    )
+
+LOOKUP_LIMIT = admission_limit("LOOKUP", 64, 512, 0.25)
+SEARCH_LIMIT = admission_limit("SEARCH", 16, 128, 1.0)
+REPORT_LIMIT = admission_limit("REPORT", 2, 16, 5.0)
+STREAM_LIMIT = Limit(concurrency=1000)
+ADMISSION_LIMITS = {
+    "/flights/{flight_id}": LOOKUP_LIMIT,
+    "/hotels/{hotel_id}": LOOKUP_LIMIT,
+    "/hotels/{hotel_id}/availability": LOOKUP_LIMIT,
+    "/flights/search": SEARCH_LIMIT,
+    "/hotels/search": SEARCH_LIMIT,
+    "/itineraries/search": SEARCH_LIMIT,
+    "/analytics/revenue": REPORT_LIMIT,
+    "/analytics/load-factor": REPORT_LIMIT,
+    "/analytics/occupancy": REPORT_LIMIT,
+    "/admin/export/{resource}": REPORT_LIMIT,
+    "/changes/stream": STREAM_LIMIT,
+    "/payments/{payment_id}/status": STREAM_LIMIT,
+    "/metrics": Limit(concurrency=8),
+}
+COALESCED_ROUTES = {
+    "/flights/{flight_id}", "/hotels/{hotel_id}", "/hotels/{hotel_id}/availability",
+    "/flights/search", "/hotels/search", "/itineraries/search",
+    "/analytics/revenue", "/analytics/load-factor", "/analytics/occupancy",
+}
+app.add_middleware(
+    AdmissionMiddleware,
+    routes=app.routes,
+    limits=ADMISSION_LIMITS,
+    default=admission_limit("DEFAULT", 128, 512, 1.0),
+    coalesce=COALESCED_ROUTES,
+    retry_after=int(os.getenv("ADMISSION_RETRY_AFTER", "1")),
+)
+
+# Added after commit_writes so it is the outermost layer and its timings
+# include the backend flush.
+app.add_middleware(MetricsMiddleware, profiler=profiler)
+
+# ------------------ BULK HELPERS ------------------
+
+async def run_bulk(items: List[Any], apply: Callable[[Any], Awaitable[Any]], key: str) -> BulkResult:
+    # Items are applied one by one so that each failure is reported against
+    # its index while the rest of the batch still goes through. They reach
+    # the database in the request's single commit: with the sqlalchemy
+    # backend that is one executemany upsert per table.
+    succeeded, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            succeeded.append(getattr(await apply(item), key))
+        except HTTPException as exc:
+            errors.append(BulkItemError(index=index, detail=str(exc.detail)))
+        except ValidationError as exc:
+            errors.append(BulkItemError(index=index, detail="; ".join(
+                f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in exc.errors())))
+        except (KeyError, TypeError) as exc:
+            errors.append(BulkItemError(index=index, detail=f"Invalid item: {exc}"))
+    return BulkResult(succeeded=succeeded, errors=errors)
+
+# With the sqlalchemy backend the database is the system of record, and the
+# record, list, export and booking-detail routes read it through crud.py.
+# The tables keep serving searches, analytics, the response cache (whose
+# invalidators sit on them) and the checks on the write paths.
+def reads_database() -> bool:
+    return isinstance(backend, SQLAlchemyBackend)
+
+def to_schema(schema, row):
+    return schema.model_validate(row) if row is not None else None
+
+async def lookup(table, record_id: int, schema, query):
+    if reads_database():
+        return await backend.read(lambda db: to_schema(schema, query(db, record_id)))
+    return table.get(record_id)
+
+def export_source(table, model, schema):
+    # Database rows are streamed a batch at a time (crud.stream), never
+    # loaded as a whole.
+    if reads_database():
+        return backend.stream(crud.stream(model), schema)
+    return table.scan()
+
+def cached_response(request: Request, resource: str, record_id: int, table, detail: str) -> Response:
+    entry = response_cache.get((resource, record_id))
+    if entry is None:
+        record = table.get(record_id)
+        if not record:
+            raise HTTPException(status_code=404, detail=detail)
+        entry = response_cache.put((resource, record_id), dumps(record))
+    headers = {"ETag": entry.etag}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+async def list_page(table, filters: Dict[str, FieldIndex], values: Dict[str, Any], cursor: Optional[str], limit: int,
+                    schema=None, query=None):
+    # ``query`` is the crud.py list read answering the same page from the
+    # database, keyset-paginated on the primary key like the tables.
+    try:
+        if query is not None and reads_database():
+            after = decode_cursor(cursor)
+            rows = await backend.read(
+                lambda db: [schema.model_validate(row) for row in query(db, after, limit + 1, **values)])
+            return next_page(rows, table.key, limit)
+        return paginate(table, filters, values, cursor, limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
 # ------------------ USER ROUTES ------------------
 
+def check_email(email: str, user_id: Optional[int] = None):
+    # users.email is unique in models.py; enforce it here too so a write the
+    # database would reject never reaches the backend.
+    if any(other != user_id for other in user_emails.lookup(email)):
+        raise HTTPException(status_code=409, detail="Email already registered")
+
 @app.post("/users/", response_model=User)
-def create_user(user: UserCreate):
-    user_id = len(users_db) + 1
-    new_user = User(user_id=user_id, **user.dict())
-    users_db.append(new_user)
-    return new_user
+async def create_user(user: UserCreate):
+    check_email(user.email)
+    new_user = UserInDB(user_id=users_db.next_id(), **user.dict())
+    return users_db.add(new_user)
+
+@app.post("/users/bulk", response_model=BulkResult)
+async def create_users_bulk(items: List[Dict[str, Any]] = Body(...)):
+    return await run_bulk(items, lambda item: create_user(UserCreate(**item)), "user_id")
+
+@app.patch("/users/bulk", response_model=BulkResult)
+async def update_users_bulk(items: List[Dict[str, Any]] = Body(...)):
+    return await run_bulk(items, lambda item: update_user(item["user_id"], UserUpdate(**item)), "user_id")
 
-@app.get("/users/", response_model=List[User])
-def get_users():
-    return users_db
+@app.delete("/users/bulk", response_model=BulkResult)
+async def delete_users_bulk(ids: List[int] = Body(...)):
+    return await run_bulk(ids, lambda user_id: delete_user(user_id), "user_id")
+
+@app.get("/users/export")
+async def export_users(format: ExportFormat = ExportFormat.ndjson):
+    return export_response(export_source(users_db, models.User, User), User, "users", format)
+
+@app.get("/users/", response_model=UserPage)
+async def get_users(cursor: Optional[str] = None, limit: int = Query(100, ge=1, le=1000), role: Optional[UserRole] = None):
+    items, next_cursor = await list_page(users_db, user_filters, {"role": role}, cursor, limit, User, crud.get_users)
+    return UserPage(items=items, next_cursor=next_cursor)
 
 @app.get("/users/{user_id}", response_model=User)
-def get_user(user_id: int):
-    user = next((user for user in users_db if user.user_id == user_id), None)
+async def get_user(user_id: int):
+    user = await lookup(users_db, user_id, User, crud.get_user)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 @app.put("/users/{user_id}", response_model=User)
-def update_user(user_id: int, user_update: UserUpdate):
-    user = next((user for user in users_db if user.user_id == user_id), None)
+async def update_user(user_id: int, user_update: UserUpdate):
+    user = users_db.get(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    updated_user = user.copy(update=user_update.dict(exclude_unset=True))
-    users_db[users_db.index(user)] = updated_user
-    return updated_user
+    updated_user = user.copy(update=changes(user_update))
+    check_email(updated_user.email, user_id)
+    return users_db.replace(updated_user)
 
 @app.delete("/users/{user_id}", response_model=User)
-def delete_user(user_id: int):
-    user = next((user for user in users_db if user.user_id == user_id), None)
+async def delete_user(user_id: int):
+    user = users_db.get(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    users_db.remove(user)
+    users_db.remove(user_id)
     return user
 
 
 # ------------------ FLIGHT ROUTES ------------------
 
 @app.post("/flights/", response_model=Flight)
-def create_flight(flight: FlightCreate):
-    flight_id = len(flights_db) + 1
-    new_flight = Flight(flight_id=flight_id, **flight.dict())
-    flights_db.append(new_flight)
-    return new_flight
+async def create_flight(flight: FlightCreate):
+    new_flight = Flight(flight_id=flights_db.next_id(), **flight.dict())
+    return flights_db.add(new_flight)
+
+@app.post("/flights/bulk", response_model=BulkResult)
+async def create_flights_bulk(items: List[Dict[str, Any]] = Body(...)):
+    return await run_bulk(items, lambda item: create_flight(FlightCreate(**item)), "flight_id")
+
+@app.patch("/flights/bulk", response_model=BulkResult)
+async def update_flights_bulk(items: List[Dict[str, Any]] = Body(...)):
+    return await run_bulk(items, lambda item: update_flight(item["flight_id"], FlightUpdate(**item)), "flight_id")
+
+@app.delete("/flights/bulk", response_model=BulkResult)
+async def delete_flights_bulk(ids: List[int] = Body(...)):
+    return await run_bulk(ids, lambda flight_id: delete_flight(flight_id), "flight_id")
+
+@app.get("/flights/export")
+async def export_flights(format: ExportFormat = ExportFormat.ndjson):
+    return export_response(export_source(flights_db, models.Flight, Flight), Flight, "flights", format)
+
+@app.get("/flights/", response_model=FlightPage)
+async def get_flights(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    airline: Optional[str] = None,
+    departure_city: Optional[str] = None,
+    arrival_city: Optional[str] = None,
+):
+    values = {"airline": airline, "departure_city": departure_city, "arrival_city": arrival_city}
+    items, next_cursor = await list_page(flights_db, flight_filters, values, cursor, limit, Flight, crud.get_flights)
+    return ORJSONResponse(FlightPage(items=items, next_cursor=next_cursor))
+
+@app.get("/flights/search", response_model=List[Flight])
+async def search_flights(
+    departure_city: str = Query(..., alias="from"),
+    arrival_city: str = Query(..., alias="to"),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    max_price: Optional[float] = None,
+):
+    flights = flights_db.get_many(flight_routes.search(departure_city, arrival_city, date_from, date_to))
+    return ORJSONResponse([flight for flight in flights if flight and (max_price is None or flight.price <= max_price)])
 
 @app.get("/flights/{flight_id}", response_model=Flight)
-def get_flight(flight_id: int):
-    flight = next((flight for flight in flights_db if flight.flight_id == flight_id), None)
-    if not flight:
-        raise HTTPException(status_code=404, detail="Flight not found")
-    return flight
+async def get_flight(flight_id: int, request: Request):
+    return cached_response(request, "flights", flight_id, flights_db, "Flight not found")
 
 @app.put("/flights/{flight_id}", response_model=Flight)
-def update_flight(flight_id: int, flight_update: FlightUpdate):
-    flight = next((flight for flight in flights_db if flight.flight_id == flight_id), None)
-    if not flight:
-        raise HTTPException(status_code=404, detail="Flight not found")
+async def update_flight(flight_id: int, flight_update: FlightUpdate):
+    with inventory.lock("flights", flight_id):
+        flight = flights_db.get(flight_id)
+        if not flight:
+            raise HTTPException(status_code=404, detail="Flight not found")
 
-    updated_flight = flight.copy(update=flight_update.dict(exclude_unset=True))
-    flights_db[flights_db.index(flight)] = updated_flight
-    return updated_flight
+        updated_flight = flight.copy(update=changes(flight_update))
+        return flights_db.replace(updated_flight)
 
 @app.delete("/flights/{flight_id}", response_model=Flight)
-def delete_flight(flight_id: int):
-    flight = next((flight for flight in flights_db if flight.flight_id == flight_id), None)
+async def delete_flight(flight_id: int):
+    flight = flights_db.get(flight_id)
     if not flight:
         raise HTTPException(status_code=404, detail="Flight not found")
-    flights_db.remove(flight)
+    flights_db.remove(flight_id)
     return flight
 
 
+# ------------------ ITINERARY ROUTES ------------------
+
+@app.get("/itineraries/search", response_model=List[Itinerary])
+async def search_itinerary(
+    origin: str = Query(..., alias="from"),
+    destination: str = Query(..., alias="to"),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    k: int = Query(5, ge=1, le=50),
+    sort: ItinerarySort = ItinerarySort.price,
+    max_stops: int = Query(2, ge=0, le=4),
+    min_layover_minutes: int = Query(30, ge=0),
+    max_layover_minutes: Optional[int] = Query(None, ge=0),
+):
+    max_layover = timedelta(minutes=max_layover_minutes) if max_layover_minutes is not None else None
+    return ORJSONResponse(search_itineraries(
+        flights_db, flight_departures, origin, destination,
+        start=date_from, end=date_to, k=k, sort=sort, max_stops=max_stops,
+        min_layover=timedelta(minutes=min_layover_minutes), max_layover=max_layover,
+    ))
+
+
 # ------------------ HOTEL ROUTES ------------------
 
 @app.post("/hotels/", response_model=Hotel)
-def create_hotel(hotel: HotelCreate):
-    hotel_id = len(hotels_db) + 1
-    new_hotel = Hotel(hotel_id=hotel_id, **hotel.dict())
-    hotels_db.append(new_hotel)
-    return new_hotel
+async def create_hotel(hotel: HotelCreate):
+    new_hotel = Hotel(hotel_id=hotels_db.next_id(), **hotel.dict())
+    return hotels_db.add(new_hotel)
 
-@app.get("/hotels/{hotel_id}", response_model=Hotel)
-def get_hotel(hotel_id: int):
-    hotel = next((hotel for hotel in hotels_db if hotel.hotel_id == hotel_id), None)
+@app.post("/hotels/bulk", response_model=BulkResult)
+async def create_hotels_bulk(items: List[Dict[str, Any]] = Body(...)):
+    return await run_bulk(items, lambda item: create_hotel(HotelCreate(**item)), "hotel_id")
+
+@app.patch("/hotels/bulk", response_model=BulkResult)
+async def update_hotels_bulk(items: List[Dict[str, Any]] = Body(...)):
+    return await run_bulk(items, lambda item: update_hotel(item["hotel_id"], HotelUpdate(**item)), "hotel_id")
+
+@app.delete("/hotels/bulk", response_model=BulkResult)
+async def delete_hotels_bulk(ids: List[int] = Body(...)):
+    return await run_bulk(ids, lambda hotel_id: delete_hotel(hotel_id), "hotel_id")
+
+@app.get("/hotels/export")
+async def export_hotels(format: ExportFormat = ExportFormat.ndjson):
+    return export_response(export_source(hotels_db, models.Hotel, Hotel), Hotel, "hotels", format)
+
+def check_stay(check_in: date, check_out: date):
+    if check_out <= check_in:
+        raise HTTPException(status_code=400, detail="check_out must be after check_in")
+
+@app.get("/hotels/", response_model=HotelPage)
+async def get_hotels(cursor: Optional[str] = None, limit: int = Query(100, ge=1, le=1000), location: Optional[str] = None):
+    items, next_cursor = await list_page(hotels_db, hotel_filters, {"location": location}, cursor, limit,
+                                         Hotel, crud.get_hotels)
+    return ORJSONResponse(HotelPage(items=items, next_cursor=next_cursor))
+
+@app.get("/hotels/search", response_model=List[HotelAvailability])
+async def search_hotels(location: str, check_in: date, check_out: date, rooms: int = Query(1, ge=1)):
+    check_stay(check_in, check_out)
+    results = []
+    for hotel_id in hotel_locations.lookup(location):
+        hotel = hotels_db.get(hotel_id)
+        if not hotel:
+            continue
+        rooms_free = hotel_occupancy.rooms_free(hotel, check_in, check_out)
+        if rooms_free >= rooms:
+            results.append(HotelAvailability(rooms_free=rooms_free, **hotel.dict()))
+    return ORJSONResponse(results)
+
+@app.get("/hotels/{hotel_id}/availability", response_model=HotelAvailability)
+async def get_hotel_availability(hotel_id: int, check_in: date, check_out: date):
+    check_stay(check_in, check_out)
+    hotel = hotels_db.get(hotel_id)
     if not hotel:
         raise HTTPException(status_code=404, detail="Hotel not found")
-    return hotel
+    return ORJSONResponse(HotelAvailability(rooms_free=hotel_occupancy.rooms_free(hotel, check_in, check_out), **hotel.dict()))
+
+@app.get("/hotels/{hotel_id}", response_model=Hotel)
+async def get_hotel(hotel_id: int, request: Request):
+    return cached_response(request, "hotels", hotel_id, hotels_db, "Hotel not found")
 
 @app.put("/hotels/{hotel_id}", response_model=Hotel)
-def update_hotel(hotel_id: int, hotel_update: HotelUpdate):
-    hotel = next((hotel for hotel in hotels_db if hotel.hotel_id == hotel_id), None)
-    if not hotel:
-        raise HTTPException(status_code=404, detail="Hotel not found")
+async def update_hotel(hotel_id: int, hotel_update: HotelUpdate):
+    with inventory.lock("hotels", hotel_id):
+        hotel = hotels_db.get(hotel_id)
+        if not hotel:
+            raise HTTPException(status_code=404, detail="Hotel not found")
 
-    updated_hotel = hotel.copy(update=hotel_update.dict(exclude_unset=True))
-    hotels_db[hotels_db.index(hotel)] = updated_hotel
-    return updated_hotel
+        updated_hotel = hotel.copy(update=changes(hotel_update))
+        return hotels_db.replace(updated_hotel)
 
 @app.delete("/hotels/{hotel_id}", response_model=Hotel)
-def delete_hotel(hotel_id: int):
-    hotel = next((hotel for hotel in hotels_db if hotel.hotel_id == hotel_id), None)
+async def delete_hotel(hotel_id: int):
+    hotel = hotels_db.get(hotel_id)
     if not hotel:
         raise HTTPException(status_code=404, detail="Hotel not found")
-    hotels_db.remove(hotel)
+    hotels_db.remove(hotel_id)
     return hotel
 
 
 # ------------------ BOOKING ROUTES ------------------
 
+def inventory_error(exc: Exception) -> HTTPException:
+    if isinstance(exc, InsufficientInventory):
+        return HTTPException(status_code=409, detail=str(exc))
+    if isinstance(exc, LookupError):
+        return HTTPException(status_code=404, detail=str(exc))
+    return HTTPException(status_code=400, detail=str(exc))
+
 @app.post("/bookings/", response_model=Booking)
-def create_booking(booking: BookingCreate):
-    booking_id = len(bookings_db) + 1
-    new_booking = Booking(booking_id=booking_id, **booking.dict())
-    bookings_db.append(new_booking)
-    return new_booking
+async def create_booking(booking: BookingCreate):
+    new_booking = Booking(booking_id=bookings_db.next_id(), **booking.dict())
+    try:
+        return inventory.book(new_booking)
+    except (InsufficientInventory, LookupError, ValueError) as exc:
+        raise inventory_error(exc)
+
+@app.post("/bookings/bulk", response_model=BulkResult)
+async def create_bookings_bulk(items: List[Dict[str, Any]] = Body(...)):
+    return await run_bulk(items, lambda item: create_booking(BookingCreate(**item)), "booking_id")
+
+@app.patch("/bookings/bulk", response_model=BulkResult)
+async def update_bookings_bulk(items: List[Dict[str, Any]] = Body(...)):
+    return await run_bulk(items, lambda item: update_booking(item["booking_id"], BookingUpdate(**item)), "booking_id")
+
+@app.delete("/bookings/bulk", response_model=BulkResult)
+async def delete_bookings_bulk(ids: List[int] = Body(...)):
+    return await run_bulk(ids, lambda booking_id: delete_booking(booking_id), "booking_id")
+
+@app.get("/bookings/export")
+async def export_bookings(format: ExportFormat = ExportFormat.ndjson):
+    return export_response(export_source(bookings_db, models.Booking, Booking), Booking, "bookings", format)
+
+@app.get("/bookings/", response_model=BookingPage)
+async def get_bookings(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    user_id: Optional[int] = None,
+    booking_type: Optional[BookingType] = None,
+    flight_id: Optional[int] = None,
+    hotel_id: Optional[int] = None,
+):
+    values = {"user_id": user_id, "booking_type": booking_type, "flight_id": flight_id, "hotel_id": hotel_id}
+    items, next_cursor = await list_page(bookings_db, booking_filters, values, cursor, limit,
+                                         Booking, crud.get_bookings)
+    return ORJSONResponse(BookingPage(items=items, next_cursor=next_cursor))
 
 @app.get("/bookings/{booking_id}", response_model=Booking)
-def get_booking(booking_id: int):
-    booking = next((booking for booking in bookings_db if booking.booking_id == booking_id), None)
+async def get_booking(booking_id: int):
+    booking = await lookup(bookings_db, booking_id, Booking, crud.get_booking)
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
-    return booking
+    return ORJSONResponse(booking)
+
+def booking_details(booking: Booking, expand) -> BookingDetails:
+    # Joins go through primary keys and the payments-by-booking index, so
+    # each related record is a dict lookup rather than a scan.
+    related = {}
+    if BookingExpand.user in expand:
+        related["user"] = users_db.get(booking.user_id)
+    if BookingExpand.flight in expand and booking.flight_id is not None:
+        related["flight"] = flights_db.get(booking.flight_id)
+    if BookingExpand.hotel in expand and booking.hotel_id is not None:
+        related["hotel"] = hotels_db.get(booking.hotel_id)
+    if BookingExpand.payment in expand:
+        payment_ids = payment_filters["booking_id"].lookup(booking.booking_id)
+        related["payment"] = payments_db.get(payment_ids[-1]) if payment_ids else None
+    return BookingDetails(**booking.dict(), **related)
+
+def row_details(row: models.Booking, expand) -> BookingDetails:
+    # The database path: crud.py loaded the expanded relationships eagerly,
+    # and only those are touched, so nothing is lazy-loaded here.
+    related = {field.value: getattr(row, field.value) for field in expand}
+    return BookingDetails.model_validate({**Booking.model_validate(row).dict(), **related}, from_attributes=True)
+
+def booking_full_row(db, booking_id: int) -> Optional[BookingDetails]:
+    row = crud.get_booking_full(db, booking_id)
+    return row_details(row, set(BookingExpand)) if row is not None else None
+
+def user_booking_rows(db, user_id: int, after: int, limit: int, expand) -> Optional[List[BookingDetails]]:
+    if crud.get_user(db, user_id) is None:
+        return None
+    rows = crud.get_user_bookings(db, user_id, after, limit, [field.value for field in expand])
+    return [row_details(row, expand) for row in rows]
+
+def parse_expand(expand: Optional[str]):
+    if not expand:
+        return set()
+    try:
+        return {BookingExpand(name.strip()) for name in expand.split(",") if name.strip()}
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"expand must be a subset of {[e.value for e in BookingExpand]}")
+
+@app.get("/bookings/{booking_id}/full", response_model=BookingDetails)
+async def get_booking_full(booking_id: int):
+    if reads_database():
+        details = await backend.read(booking_full_row, booking_id)
+    else:
+        booking = bookings_db.get(booking_id)
+        details = booking_details(booking, set(BookingExpand)) if booking else None
+    if not details:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    return ORJSONResponse(details)
+
+@app.get("/users/{user_id}/bookings", response_model=BookingDetailsPage)
+async def get_user_bookings(
+    user_id: int,
+    expand: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+):
+    fields = parse_expand(expand)
+    if reads_database():
+        try:
+            after = decode_cursor(cursor)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        rows = await backend.read(user_booking_rows, user_id, after, limit + 1, fields)
+        if rows is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        items, next_cursor = next_page(rows, "booking_id", limit)
+        return ORJSONResponse(BookingDetailsPage(items=items, next_cursor=next_cursor))
+    if user_id not in users_db:
+        raise HTTPException(status_code=404, detail="User not found")
+    items, next_cursor = await list_page(bookings_db, booking_filters, {"user_id": user_id}, cursor, limit)
+    page = BookingDetailsPage(items=[booking_details(booking, fields) for booking in items], next_cursor=next_cursor)
+    return ORJSONResponse(page)
 
 @app.put("/bookings/{booking_id}", response_model=Booking)
-def update_booking(booking_id: int, booking_update: BookingUpdate):
-    booking = next((booking for booking in bookings_db if booking.booking_id == booking_id), None)
+async def update_booking(booking_id: int, booking_update: BookingUpdate):
+    booking = bookings_db.get(booking_id)
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
 
-    updated_booking = booking.copy(update=booking_update.dict(exclude_unset=True))
-    bookings_db[bookings_db.index(booking)] = updated_booking
-    return updated_booking
+    updated_booking = booking.copy(update=changes(booking_update))
+    try:
+        return inventory.rebook(booking, updated_booking)
+    except (InsufficientInventory, LookupError, ValueError) as exc:
+        raise inventory_error(exc)
 
 @app.delete("/bookings/{booking_id}", response_model=Booking)
-def delete_booking(booking_id: int):
-    booking = next((booking for booking in bookings_db if booking.booking_id == booking_id), None)
+async def delete_booking(booking_id: int):
+    booking = inventory.cancel(booking_id)
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
-    bookings_db.remove(booking)
     return booking
 
 
 # ------------------ PAYMENT ROUTES ------------------
 
+def settle_inventory(payment: Payment):
+    # A failed payment gives the booking's seat or rooms back; any other
+    # status holds them again.
+    booking = bookings_db.get(payment.booking_id)
+    if not booking:
+        return
+    try:
+        if payment.status == PaymentStatus.failed:
+            inventory.release(booking)
+        else:
+            inventory.restore(booking)
+    except (InsufficientInventory, LookupError, ValueError) as exc:
+        raise inventory_error(exc)
+
+async def apply_settlements(statuses: Dict[int, PaymentStatus]) -> None:
+    # What PUT /payments/{id} does for a status change, for the payments
+    # still pending; one may have been settled by hand in the meantime.
+    async with backend.writing():
+        for payment in payments_db.get_many(list(statuses)):
+            if payment is None or payment.status != PaymentStatus.pending:
+                continue
+            updated_payment = payment.copy(update={"status": statuses[payment.payment_id]})
+            try:
+                settle_inventory(updated_payment)
+            except HTTPException:
+                # The booking's seat or rooms went to someone else after an
+                # earlier failed payment.
+                updated_payment = payment.copy(update={"status": PaymentStatus.failed})
+            payments_db.replace(updated_payment)
+        await backend.commit()
+
+# Background settlement of pending payments by the processor named in
+# PAYMENT_PROCESSOR ("fake" is a local test gateway). Unset, payments stay
+# pending until settled with PUT /payments/{id}.
+payment_processor = create_processor()
+settlement = SettlementPipeline(
+    payment_processor, payments_db, apply_settlements,
+    workers=int(os.getenv("PAYMENT_WORKERS", "4")),
+    batch_size=int(os.getenv("PAYMENT_BATCH_SIZE", "50")),
+    max_attempts=int(os.getenv("PAYMENT_MAX_ATTEMPTS", "5")),
+    backoff=float(os.getenv("PAYMENT_RETRY_BACKOFF", "0.5")),
+) if payment_processor is not None else None
+
 @app.post("/payments/", response_model=Payment)
-def create_payment(payment: PaymentCreate):
-    payment_id = len(payments_db) + 1
-    new_payment = Payment(payment_id=payment_id, **payment.dict())
-    payments_db.append(new_payment)
+async def create_payment(payment: PaymentCreate):
+    new_payment = Payment(payment_id=payments_db.next_id(), **payment.dict())
+    settle_inventory(new_payment)
+    payments_db.add(new_payment)
+    if settlement is not None and new_payment.status == PaymentStatus.pending:
+        settlement.submit(new_payment.payment_id)
     return new_payment
 
+@app.post("/payments/bulk", response_model=BulkResult)
+async def create_payments_bulk(items: List[Dict[str, Any]] = Body(...)):
+    return await run_bulk(items, lambda item: create_payment(PaymentCreate(**item)), "payment_id")
+
+@app.patch("/payments/bulk", response_model=BulkResult)
+async def update_payments_bulk(items: List[Dict[str, Any]] = Body(...)):
+    return await run_bulk(items, lambda item: update_payment(item["payment_id"], PaymentUpdate(**item)), "payment_id")
+
+@app.delete("/payments/bulk", response_model=BulkResult)
+async def delete_payments_bulk(ids: List[int] = Body(...)):
+    return await run_bulk(ids, lambda payment_id: delete_payment(payment_id), "payment_id")
+
+@app.get("/payments/export")
+async def export_payments(format: ExportFormat = ExportFormat.ndjson):
+    return export_response(export_source(payments_db, models.Payment, Payment), Payment, "payments", format)
+
+@app.get("/payments/", response_model=PaymentPage)
+async def get_payments(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    booking_id: Optional[int] = None,
+    status: Optional[PaymentStatus] = None,
+    method: Optional[PaymentMethod] = None,
+):
+    values = {"booking_id": booking_id, "status": status, "method": method}
+    items, next_cursor = await list_page(payments_db, payment_filters, values, cursor, limit,
+                                         Payment, crud.get_payments)
+    return ORJSONResponse(PaymentPage(items=items, next_cursor=next_cursor))
+
 @app.get("/payments/{payment_id}", response_model=Payment)
-def get_payment(payment_id: int):
-    payment = next((payment for payment in payments_db if payment.payment_id == payment_id), None)
+async def get_payment(payment_id: int):
+    payment = await lookup(payments_db, payment_id, Payment, crud.get_payment)
     if not payment:
         raise HTTPException(status_code=404, detail="Payment not found")
-    return payment
+    return ORJSONResponse(payment)
+
+@app.get("/payments/{payment_id}/status", response_model=Payment)
+async def get_payment_status(payment_id: int, wait: float = Query(0, ge=0, le=60)):
+    # Long poll: with ``wait`` the response is held until the payment is no
+    # longer pending or the time is up. Other workers' changes only show up
+    # on refresh, so the payment is looked at again every second.
+    deadline = time.monotonic() + wait
+    while True:
+        payment = payments_db.get(payment_id)
+        if not payment:
+            raise HTTPException(status_code=404, detail="Payment not found")
+        remaining = deadline - time.monotonic()
+        if payment.status != PaymentStatus.pending or remaining <= 0:
+            return ORJSONResponse(payment)
+        await settlement_watch.wait(payment_id, min(remaining, 1.0))
+        backend.refresh()
 
 @app.put("/payments/{payment_id}", response_model=Payment)
-def update_payment(payment_id: int, payment_update: PaymentUpdate):
-    payment = next((payment for payment in payments_db if payment.payment_id == payment_id), None)
+async def update_payment(payment_id: int, payment_update: PaymentUpdate):
+    payment = payments_db.get(payment_id)
     if not payment:
         raise HTTPException(status_code=404, detail="Payment not found")
 
-    updated_payment = payment.copy(update=payment_update.dict(exclude_unset=True))
-    payments_db[payments_db.index(payment)] = updated_payment
-    return updated_payment
+    updated_payment = payment.copy(update=changes(payment_update))
+    if updated_payment.status != payment.status:
+        settle_inventory(updated_payment)
+    return payments_db.replace(updated_payment)
 
 @app.delete("/payments/{payment_id}", response_model=Payment)
-def delete_payment(payment_id: int):
-    payment = next((payment for payment in payments_db if payment.payment_id == payment_id), None)
+async def delete_payment(payment_id: int):
+    payment = payments_db.get(payment_id)
     if not payment:
         raise HTTPException(status_code=404, detail="Payment not found")
-    payments_db.remove(payment)
+    payments_db.remove(payment_id)
     return payment
+
+
+# ------------------ ANALYTICS ROUTES ------------------
+
+# Aggregations run in a worker thread; numpy releases the GIL for most of
+# the work, so other requests keep being served meanwhile.
+
+@app.get("/analytics/revenue", response_model=List[RevenueGroup])
+async def get_revenue(
+    group_by: RevenueGroupBy = RevenueGroupBy.day,
+    basis: RevenueBasis = RevenueBasis.payments,
+    status: Optional[PaymentStatus] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+):
+    # Payments default to successful ones; bookings are filtered only when
+    # a status is asked for.
+    if status is None and basis == RevenueBasis.payments:
+        status = PaymentStatus.successful
+    try:
+        groups = await asyncio.to_thread(
+            analytics.revenue, payment_columns, booking_columns, flight_columns, inventory.released(),
+            group_by.value, basis.value, status, date_from, date_to)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return ORJSONResponse(groups)
+
+@app.get("/analytics/load-factor", response_model=List[FlightLoad])
+async def get_load_factor(airline: Optional[str] = None, limit: int = Query(100, ge=1, le=10000)):
+    return ORJSONResponse(await asyncio.to_thread(
+        analytics.load_factor, flight_columns, booking_columns, inventory.released(), airline, limit))
+
+@app.get("/analytics/occupancy", response_model=List[HotelOccupancy])
+async def get_occupancy(date_from: date, date_to: date, location: Optional[str] = None,
+                        limit: int = Query(100, ge=1, le=10000)):
+    check_stay(date_from, date_to)
+    return ORJSONResponse(await asyncio.to_thread(
+        analytics.occupancy, hotel_columns, booking_columns, inventory.released(),
+        date_from, date_to, location, limit))
+
+# ------------------ AGGREGATE ROUTES ------------------
+
+@app.get("/aggregates/revenue", response_model=List[StatusRevenue])
+async def get_revenue_by_status():
+    return [StatusRevenue(status=status, revenue=revenue_by_status.total(status.value),
+                          count=revenue_by_status.count(status.value)) for status in PaymentStatus]
+
+@app.get("/aggregates/flights/{flight_id}/bookings", response_model=FlightBookings)
+async def get_flight_bookings(flight_id: int):
+    if flight_id not in flights_db:
+        raise HTTPException(status_code=404, detail="Flight not found")
+    return FlightBookings(flight_id=flight_id, bookings=bookings_per_flight.count(flight_id))
+
+@app.get("/aggregates/hotels/{hotel_id}/nights", response_model=List[HotelNight])
+async def get_hotel_nights(hotel_id: int, date_from: date, date_to: date):
+    if hotel_id not in hotels_db:
+        raise HTTPException(status_code=404, detail="Hotel not found")
+    check_stay(date_from, date_to)
+    if (date_to - date_from).days > 366:
+        raise HTTPException(status_code=400, detail="Date range is limited to 366 nights")
+    return [HotelNight(night=night, rooms_booked=rooms)
+            for night, rooms in hotel_occupancy.nightly(hotel_id, date_from, date_to).items()]
+
+def aggregate_check() -> AggregateCheck:
+    last_checked = aggregate_verifier.last_checked
+    return AggregateCheck(runs=aggregate_verifier.runs, corrections=aggregate_verifier.corrections,
+                          last_checked=datetime.fromtimestamp(last_checked) if last_checked else None)
+
+@app.get("/aggregates/consistency", response_model=AggregateCheck)
+async def get_aggregate_check():
+    return aggregate_check()
+
+@app.post("/aggregates/consistency", response_model=AggregateCheck)
+async def run_aggregate_check():
+    await asyncio.to_thread(aggregate_verifier.run)
+    return aggregate_check()
+
+# ------------------ CACHE ROUTES ------------------
+
+@app.get("/cache/stats", response_model=CacheStats)
+async def get_cache_stats():
+    return CacheStats(**response_cache.stats())
+
+# ------------------ METRICS & PROFILING ROUTES ------------------
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    sample_threadpool()
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+def check_profiler(request: Request):
+    if not profiler.authorized(request.headers.get("x-profile")):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+@app.post("/admin/profile", response_class=PlainTextResponse)
+async def profile_process(request: Request, seconds: float = Query(5, gt=0, le=60)):
+    # Profiles everything the process does for the next ``seconds``.
+    check_profiler(request)
+    session = profiler.start()
+    if session is None:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    await asyncio.sleep(seconds)
+    profile_id = profiler.finish(session, f"process for {seconds:g}s")
+    return PlainTextResponse(profiler.reports[profile_id], headers={"X-Profile-Id": str(profile_id)})
+
+@app.get("/admin/profiles", response_model=Dict[int, str])
+async def list_profiles(request: Request):
+    check_profiler(request)
+    return {profile_id: report.split("\n", 1)[0] for profile_id, report in list(profiler.reports.items())}
+
+@app.get("/admin/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(request: Request, profile_id: int):
+    check_profiler(request)
+    report = profiler.reports.get(profile_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(report)
+
+# ------------------ BULK TRANSFER ROUTES ------------------
+
+# Whole tables as Parquet or Arrow IPC, for schedule dumps from the data
+# team and warehouse extracts. Users are not offered: their rows carry
+# password hashes. The routes are off unless ADMIN_TOKEN is set; requests
+# must then send it in X-Admin-Token.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+ARROW_RESOURCES = {
+    "flights": (flights_db, Flight, models.Flight),
+    "hotels": (hotels_db, Hotel, models.Hotel),
+    "bookings": (bookings_db, Booking, models.Booking),
+    "payments": (payments_db, Payment, models.Payment),
+}
+IMPORT_MAX_ERRORS = 100
+
+def check_admin(request: Request):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin routes are disabled")
+    if request.headers.get("x-admin-token") != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+def arrow_resource(resource: str):
+    if resource not in ARROW_RESOURCES:
+        raise HTTPException(status_code=404, detail="Unknown resource")
+    return ARROW_RESOURCES[resource]
+
+def missing_reference(record) -> Optional[str]:
+    # The same foreign keys models.py declares; imported rows are stored
+    # as given, without reserving seats or rooms.
+    if isinstance(record, Booking):
+        if record.user_id not in users_db:
+            return "User not found"
+        if record.flight_id is not None and record.flight_id not in flights_db:
+            return "Flight not found"
+        if record.hotel_id is not None and record.hotel_id not in hotels_db:
+            return "Hotel not found"
+    elif isinstance(record, Payment) and record.booking_id not in bookings_db:
+        return "Booking not found"
+    return None
+
+@app.get("/admin/export/{resource}")
+async def export_arrow(request: Request, resource: str, format: ArrowFormat = ArrowFormat.parquet):
+    check_admin(request)
+    table, schema, model = arrow_resource(resource)
+    chunks = arrow_io.export_chunks(table.scan(), arrow_io.arrow_schema(schema, model), format)
+    return StreamingResponse(
+        chunks,
+        media_type=arrow_io.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{resource}.{arrow_io.EXTENSIONS[format]}"'},
+    )
+
+@app.post("/admin/import/{resource}", response_model=ImportResult)
+async def import_arrow(
+    request: Request,
+    resource: str,
+    format: ArrowFormat = ArrowFormat.parquet,
+    batch_size: int = Query(arrow_io.BATCH_SIZE, ge=1, le=100000),
+):
+    # Rows with a known primary key replace the stored record, rows
+    # without one get a new key. Decoding and validation run in a worker
+    # thread one record batch at a time; each batch is committed before
+    # the next is read.
+    check_admin(request)
+    table, schema, _ = arrow_resource(resource)
+    path = await arrow_io.spool(request.stream())
+    batches = arrow_io.read_batches(path, format, schema, table.key, batch_size)
+    imported, failed, errors, offset = 0, 0, [], 0
+    try:
+        while (batch := await asyncio.to_thread(next, batches, None)) is not None:
+            rows = await asyncio.to_thread(arrow_io.validate_rows, batch, schema, table.key)
+            for index, (record, error) in enumerate(rows, offset):
+                error = error or missing_reference(record)
+                if error:
+                    failed += 1
+                    if len(errors) < IMPORT_MAX_ERRORS:
+                        errors.append(BulkItemError(index=index, detail=error))
+                elif getattr(record, table.key) is None:
+                    table.add(record.copy(update={table.key: table.next_id()}))
+                    imported += 1
+                elif getattr(record, table.key) in table:
+                    table.replace(record)
+                    imported += 1
+                else:
+                    table.add(record)
+                    imported += 1
+                if index % 1000 == 999:
+                    await asyncio.sleep(0)
+            offset += len(rows)
+            await backend.commit()
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    finally:
+        batches.close()
+        os.unlink(path)
+    return ImportResult(imported=imported, failed=failed, errors=errors)
+
+
+# ------------------ CHANGE FEED ROUTES ------------------
+
+@app.get("/changes/stream")
+async def stream_changes(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0),
+    resource: Optional[List[ChangeResource]] = Query(None),
+):
+    # Resumes after ``since``, or after the Last-Event-ID an EventSource
+    # sends when it reconnects; with neither, starts at the next change. A
+    # Last-Event-ID from another process's feed starts with a reset.
+    reset = False
+    if since is None and "last-event-id" in request.headers:
+        try:
+            since = change_feed.position(request.headers["last-event-id"])
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Last-Event-ID is not a change event ID")
+        reset = since is None
+    resources = {item.value for item in resource} if resource else None
+    return StreamingResponse(
+        change_events(change_feed.seq if since is None else since, resources, reset),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def change_events(cursor: int, resources: Optional[set], reset: bool = False):
+    idle = 0.0
+    if reset:
+        yield b"event: reset\ndata: {}\n\n"
+    while True:
+        events, after, missed = change_feed.read(cursor, resources)
+        if missed:
+            # Events were overwritten before this client read them; it
+            # should reload what it tracks and carry on from here.
+            yield b"event: reset\ndata: {}\n\n"
+        if events:
+            idle = 0.0
+            yield b"".join(events)
+        if after != cursor:
+            cursor = after
+            continue
+        if await change_feed.wait(cursor, 1.0):
+            continue
+        # Changes other worker processes made arrive with a refresh.
+        backend.refresh()
+        idle += 1.0
+        if idle >= CHANGE_FEED_KEEPALIVE:
+            idle = 0.0
+            yield b": keepalive\n\n"
@@ -0,0 +1,255 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+# ------------------ METRICS REGISTRY ------------------
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow exports.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_labels(self.labels, key)} {value}" for key, value in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram:
+    """Cumulative-bucket histogram; ``observe`` is a bisect and two additions."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # One count per bucket plus +Inf, then the running sum.
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = [(key, list(values)) for key, values in self._series.items()]
+        lines = []
+        for key, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {values[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format, version 0.0.4."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status")))
+request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("route", "method")))
+requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled.", ("method",)))
+threadpool_busy = registry.register(Gauge(
+    "threadpool_busy_threads", "Worker threads busy running sync handlers and dependencies."))
+threadpool_queued = registry.register(Gauge(
+    "threadpool_queued_tasks", "Tasks waiting for a free worker thread."))
+db_queries_total = registry.register(Counter(
+    "db_queries_total", "SQL statements executed, by engine.", ("engine",)))
+db_query_duration = registry.register(Histogram(
+    "db_query_duration_seconds", "SQL statement latency, by engine.", ("engine",)))
+request_db_queries = registry.register(Histogram(
+    "http_request_db_queries", "SQL statements executed per request.", ("route",), COUNT_BUCKETS))
+request_db_duration = registry.register(Histogram(
+    "http_request_db_duration_seconds", "Time spent in SQL per request.", ("route",)))
+requests_shed = registry.register(Counter(
+    "http_requests_shed_total", "Requests answered 503 by admission control, by route pool and reason.",
+    ("route", "reason")))
+admission_wait = registry.register(Histogram(
+    "http_admission_wait_seconds", "Time admitted requests waited for a slot, by route pool.", ("route",)))
+requests_coalesced = registry.register(Counter(
+    "http_requests_coalesced_total", "GETs answered with the response of an identical request in flight.",
+    ("route",)))
+payments_settled = registry.register(Counter(
+    "payments_settled_total", "Payments settled in the background, by final status.", ("status",)))
+payment_settlement_errors = registry.register(Counter(
+    "payment_settlement_errors_total", "Settlement batches that failed and were retried.", ("kind",)))
+payment_batch_duration = registry.register(Histogram(
+    "payment_batch_duration_seconds", "Payment processor latency per batch."))
+payment_queue_depth = registry.register(Gauge(
+    "payment_queue_depth", "Payments waiting to be settled, including those backing off."))
+
+# ------------------ PER-REQUEST DB ACCOUNTING ------------------
+
+class QueryStats:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+# Set by the metrics middleware; statements run outside a request (startup,
+# the SQLite writer thread) are still counted in the engine-level metrics.
+current_queries: ContextVar[Optional[QueryStats]] = ContextVar("current_queries", default=None)
+
+
+def instrument_engine(engine, name: str = "default"):
+    """Count and time every statement on ``engine`` (sync, or an AsyncEngine's sync_engine)."""
+    engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        db_queries_total.inc(name)
+        db_query_duration.observe(elapsed, name)
+        stats = current_queries.get()
+        if stats is not None:
+            stats.count += 1
+            stats.seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+    return engine
+
+
+def sample_threadpool() -> None:
+    """Read AnyIO's default thread limiter; must run on the event loop."""
+    from anyio import to_thread
+
+    limiter = to_thread.current_default_thread_limiter()
+    statistics = limiter.statistics()
+    threadpool_busy.set(value=statistics.borrowed_tokens)
+    threadpool_queued.set(value=statistics.tasks_waiting)
+
+
+def route_template(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+# ------------------ MIDDLEWARE ------------------
+
+class MetricsMiddleware:
+    """Plain ASGI middleware recording the request metrics above.
+
+    Written against raw ASGI rather than ``@app.middleware`` because
+    BaseHTTPMiddleware runs every request through an extra task group,
+    which costs more than all of the bookkeeping here. Add it last so it
+    wraps the other middleware. A request carrying the profiler token in
+    X-Profile is profiled and answered with an X-Profile-Id header.
+    """
+
+    def __init__(self, app, profiler=None):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status = 500
+        session = None
+        if self.profiler is not None and self.profiler.token and not scope["path"].startswith("/admin/"):
+            token = next((value for name, value in scope["headers"] if name == b"x-profile"), None)
+            if token is not None and self.profiler.authorized(token.decode("latin-1")):
+                session = self.profiler.start()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if session is not None:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-profile-id", str(session.profile_id).encode())]
+            await send(message)
+
+        queries = QueryStats()
+        context = current_queries.set(queries)
+        requests_in_flight.inc(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            requests_in_flight.dec(method)
+            current_queries.reset(context)
+            route = route_template(scope)
+            requests_total.inc(route, method, str(status))
+            request_duration.observe(elapsed, route, method)
+            if queries.count:
+                request_db_queries.observe(queries.count, route)
+                request_db_duration.observe(queries.seconds, route)
+            if session is not None:
+                self.profiler.finish(session, f"{method} {scope['path']} ({elapsed * 1000:.1f} ms)")
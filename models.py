@@ -3,7 +3,7 @@ from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import ENUM
 from datetime import datetime
 from enum import Enum
-from .database import Base
+from database import Base
 
 # ------------------ USER MODEL ------------------
 
@@ -17,7 +17,7 @@ class User(Base):
     user_id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String, nullable=False)
     email = Column(String, unique=True, nullable=False)
-    role = Column(ENUM(UserRole), nullable=False)
+    role = Column(ENUM(UserRole), nullable=False, index=True)
     contact = Column(String, nullable=True)
     password_hash = Column(String, nullable=False)
 
@@ -31,11 +31,11 @@ class Flight(Base):
 
     flight_id = Column(Integer, primary_key=True, autoincrement=True)
     flight_number = Column(String, nullable=False)
-    departure_city = Column(String, nullable=False)
-    arrival_city = Column(String, nullable=False)
+    departure_city = Column(String, nullable=False, index=True)
+    arrival_city = Column(String, nullable=False, index=True)
     departure_time = Column(DateTime, nullable=False)
     arrival_time = Column(DateTime, nullable=False)
-    airline = Column(String, nullable=False)
+    airline = Column(String, nullable=False, index=True)
     price = Column(Float, nullable=False)
     seats_available = Column(Integer, nullable=False)
 
@@ -49,7 +49,7 @@ class Hotel(Base):
 
     hotel_id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String, nullable=False)
-    location = Column(String, nullable=False)
+    location = Column(String, nullable=False, index=True)
     available_rooms = Column(Integer, nullable=False)
     price_per_night = Column(Float, nullable=False)
     rating = Column(Float, nullable=True)
@@ -67,10 +67,10 @@ class Booking(Base):
     __tablename__ = "bookings"
 
     booking_id = Column(Integer, primary_key=True, autoincrement=True)
-    user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
-    booking_type = Column(ENUM(BookingType), nullable=False)
-    flight_id = Column(Integer, ForeignKey("flights.flight_id"), nullable=True)
-    hotel_id = Column(Integer, ForeignKey("hotels.hotel_id"), nullable=True)
+    user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False, index=True)
+    booking_type = Column(ENUM(BookingType), nullable=False, index=True)
+    flight_id = Column(Integer, ForeignKey("flights.flight_id"), nullable=True, index=True)
+    hotel_id = Column(Integer, ForeignKey("hotels.hotel_id"), nullable=True, index=True)
     check_in = Column(DateTime, nullable=True)
     check_out = Column(DateTime, nullable=True)
     booking_date = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -99,10 +99,34 @@ class Payment(Base):
     __tablename__ = "payments"
 
     payment_id = Column(Integer, primary_key=True, autoincrement=True)
-    booking_id = Column(Integer, ForeignKey("bookings.booking_id"), nullable=False)
+    booking_id = Column(Integer, ForeignKey("bookings.booking_id"), nullable=False, index=True)
     payment_date = Column(DateTime, nullable=False, default=datetime.utcnow)
     amount = Column(Float, nullable=False)
-    method = Column(ENUM(PaymentMethod), nullable=False)
-    status = Column(ENUM(PaymentStatus), default=PaymentStatus.pending)
+    method = Column(ENUM(PaymentMethod), nullable=False, index=True)
+    status = Column(ENUM(PaymentStatus), default=PaymentStatus.pending, index=True)
 
     booking = relationship("Booking", back_populates="payment")
+
+
+# ------------------ ID SEQUENCE MODEL ------------------
+
+# Next ID per table, so IDs of deleted rows are not handed out again.
+class IdSequence(Base):
+    __tablename__ = "id_sequences"
+
+    resource = Column(String, primary_key=True)
+    next_id = Column(Integer, nullable=False)
+
+
+# ------------------ IDEMPOTENCY KEY MODEL ------------------
+
+# Stored responses of create requests sent with an Idempotency-Key.
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True)
+    fingerprint = Column(String, nullable=False)
+    status_code = Column(Integer, nullable=False)
+    content_type = Column(String, nullable=True)
+    body = Column(String, nullable=False)
+    expires_at = Column(Float, nullable=False, index=True)
@@ -0,0 +1,55 @@
+import base64
+import binascii
+from typing import Any, Dict, List, Optional, Tuple
+
+# ------------------ KEYSET PAGINATION ------------------
+
+# Cursors are the last primary key of a page, base64-encoded so clients
+# treat them as opaque. Each page starts with a bisect on the table's key
+# list, or on a secondary index when a filter is given, so page cost does
+# not depend on how deep the client has paged.
+
+def encode_cursor(record_id: int) -> str:
+    return base64.urlsafe_b64encode(str(record_id).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        return int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, binascii.Error):
+        raise ValueError("Invalid cursor")
+
+
+def paginate(table, indexes: Dict[str, Any], filters: Dict[str, Any],
+             cursor: Optional[str], limit: int) -> Tuple[List[Any], Optional[str]]:
+    after = decode_cursor(cursor)
+    active = {field: value for field, value in filters.items() if value is not None}
+    with table.lock:
+        if not active:
+            records = table.page(after, limit + 1)
+        elif hasattr(table, "where"):
+            # Columnar tables test every filter in one vectorized pass.
+            records = table.where(active, after, limit + 1)
+        else:
+            # Walk the smallest matching index and check the other filters
+            # on each record.
+            field = min(active, key=lambda f: indexes[f].count(active[f]))
+            rest = [(f, v) for f, v in active.items() if f != field]
+            records = []
+            for record_id in indexes[field].ids_after(active[field], after):
+                record = table.get(record_id)
+                if record is not None and all(getattr(record, f) == v for f, v in rest):
+                    records.append(record)
+                    if len(records) > limit:
+                        break
+    return next_page(records, table.key, limit)
+
+
+def next_page(records: List[Any], key: str, limit: int) -> Tuple[List[Any], Optional[str]]:
+    """The page and next cursor from up to ``limit + 1`` records in key order."""
+    if len(records) > limit:
+        records = records[:limit]
+        return records, encode_cursor(getattr(records[-1], key))
+    return records, None
@@ -0,0 +1,84 @@
+import cProfile
+import io
+import itertools
+import os
+import pstats
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+
+try:
+    from pyinstrument import Profiler as _SamplingProfiler
+except ImportError:  # pragma: no cover - pyinstrument is optional
+    _SamplingProfiler = None
+
+# ------------------ ON-DEMAND PROFILING ------------------
+
+# Profiling is off unless PROFILE_TOKEN is set; a request carrying the token
+# in X-Profile is profiled, as are the /admin/profile endpoints.
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+
+
+class _Session:
+    """One running profile: pyinstrument's sampler when installed, else cProfile."""
+
+    def __init__(self, profile_id: int):
+        self.profile_id = profile_id
+        if _SamplingProfiler is not None:
+            self._profiler = _SamplingProfiler(interval=0.001, async_mode="disabled")
+            self._profiler.start()
+        else:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def stop(self) -> str:
+        if _SamplingProfiler is not None:
+            self._profiler.stop()
+            return self._profiler.output_text(unicode=True, show_all=False)
+        self._profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(self._profiler, stream=out).sort_stats("cumulative").print_stats(60)
+        return out.getvalue()
+
+
+class Profiler:
+    """Runs at most one profile at a time and keeps the last ``keep`` reports.
+
+    Only one session can be active because both profilers hook the
+    interpreter globally; a request asking for a profile while another is
+    running is simply served unprofiled.
+    """
+
+    def __init__(self, token: Optional[str] = PROFILE_TOKEN, keep: int = 20):
+        self.token = token
+        self.keep = keep
+        self.reports: "OrderedDict[int, str]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = Lock()
+        self._active = False
+
+    def authorized(self, token: Optional[str]) -> bool:
+        return bool(self.token) and token == self.token
+
+    def start(self) -> Optional[_Session]:
+        with self._lock:
+            if self._active:
+                return None
+            self._active = True
+            profile_id = next(self._ids)
+        try:
+            return _Session(profile_id)
+        except Exception:
+            self._active = False
+            raise
+
+    def finish(self, session: _Session, title: str) -> int:
+        try:
+            report = f"{title}\n\n{session.stop()}"
+        finally:
+            self._active = False
+        with self._lock:
+            self.reports[session.profile_id] = report
+            while len(self.reports) > self.keep:
+                self.reports.popitem(last=False)
+        return session.profile_id
@@ -0,0 +1,44 @@
+import json
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+# ------------------ FAST JSON RESPONSES ------------------
+
+# Records in the tables were validated when they were stored. Returning one
+# through response_model makes FastAPI validate and serialize it a second
+# time; handlers on hot paths return ORJSONResponse(record) instead, which
+# FastAPI passes through untouched (the response_model still documents the
+# route in OpenAPI). Every JSON body the API caches or returns goes through
+# dumps, so a record renders to the same bytes (and ETag) on every path.
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    encoded = jsonable_encoder(content, custom_encoder={BaseModel: lambda obj: jsonable_encoder(_default(obj))})
+    return json.dumps(encoded, separators=(",", ":")).encode()
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson, accepting Pydantic models directly."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def changes(update: BaseModel) -> dict:
+    """The fields a client actually sent in an update body."""
+    return {field: getattr(update, field) for field in update.__fields_set__}
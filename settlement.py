@@ -0,0 +1,238 @@
+import asyncio
+import os
+import random
+import time
+from abc import ABC, abstractmethod
+from threading import Lock
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from Schema import Payment, PaymentStatus
+from metrics import payment_batch_duration, payment_queue_depth, payment_settlement_errors, payments_settled
+
+# ------------------ PAYMENT SETTLEMENT ------------------
+
+# Pending payments are charged in the background instead of in the request
+# that created them: POST /payments/ queues the payment and returns, worker
+# tasks hand queued payments to the processor in batches and write back the
+# outcome, and GET /payments/{id}/status long-polls for it.
+
+class GatewayError(Exception):
+    """The gateway could not process a batch right now; it is retried."""
+
+
+class PaymentProcessor(ABC):
+    """Charges pending payments with a payment gateway.
+
+    ``settle`` gets a batch of pending payments and returns the final status
+    of each payment it processed. Payments left out are retried, and so is
+    the whole batch when it raises GatewayError. A payment may be handed
+    over again after such a retry or a restart, so a real gateway should be
+    given ``payment_id`` as its idempotency reference.
+    """
+
+    @abstractmethod
+    async def settle(self, payments: List[Payment]) -> Dict[int, PaymentStatus]:
+        ...
+
+
+class FakeGateway(PaymentProcessor):
+    """Local stand-in for a gateway, for tests and benchmarks.
+
+    Answers each batch after ``latency`` seconds, declining a
+    ``decline_rate`` share of payments; an ``error_rate`` share of batches
+    fails with GatewayError instead.
+    """
+
+    def __init__(self, latency: Optional[float] = None, decline_rate: Optional[float] = None,
+                 error_rate: Optional[float] = None, seed: Optional[int] = None):
+        self.latency = latency if latency is not None else float(os.getenv("FAKE_GATEWAY_LATENCY", "0.05"))
+        self.decline_rate = decline_rate if decline_rate is not None else float(
+            os.getenv("FAKE_GATEWAY_DECLINE_RATE", "0.05"))
+        self.error_rate = error_rate if error_rate is not None else float(os.getenv("FAKE_GATEWAY_ERROR_RATE", "0"))
+        self._random = random.Random(seed)
+
+    async def settle(self, payments: List[Payment]) -> Dict[int, PaymentStatus]:
+        await asyncio.sleep(self.latency)
+        if self._random.random() < self.error_rate:
+            raise GatewayError("Gateway temporarily unavailable")
+        return {
+            payment.payment_id: PaymentStatus.failed if self._random.random() < self.decline_rate
+            else PaymentStatus.successful
+            for payment in payments
+        }
+
+
+PROCESSORS = {
+    "fake": FakeGateway,
+}
+
+
+def create_processor(name: Optional[str] = None) -> Optional[PaymentProcessor]:
+    """The processor named by PAYMENT_PROCESSOR, or None to settle by hand."""
+    name = name if name is not None else os.getenv("PAYMENT_PROCESSOR", "")
+    if not name:
+        return None
+    if name not in PROCESSORS:
+        raise ValueError(f"Unknown payment processor: {name}")
+    return PROCESSORS[name]()
+
+
+class SettlementPipeline:
+    """Queue of pending payment IDs drained by ``workers`` tasks.
+
+    Each worker takes up to ``batch_size`` queued payments, drops those no
+    longer pending (settled by hand or deleted), hands the rest to the
+    processor and passes the outcome to ``apply``. A failed attempt is
+    queued again after an exponential backoff with jitter; after
+    ``max_attempts`` the payment is marked failed. With a gateway latency
+    of L seconds per batch, throughput tops out near
+    ``workers * batch_size / L`` payments per second.
+    """
+
+    def __init__(self, processor: PaymentProcessor, payments,
+                 apply: Callable[[Dict[int, PaymentStatus]], Awaitable[None]], workers: int = 4,
+                 batch_size: int = 50, max_attempts: int = 5, backoff: float = 0.5, max_backoff: float = 30.0):
+        self.processor = processor
+        self.payments = payments
+        self.apply = apply
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.queue: "asyncio.Queue[int]" = asyncio.Queue()
+        self._attempts: Dict[int, int] = {}
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def submit(self, payment_id: int) -> None:
+        self.queue.put_nowait(payment_id)
+        self._gauge()
+
+    async def start(self, recover: bool = True) -> None:
+        """Start the workers, first queueing payments left pending by the
+        previous run when ``recover``. With several worker processes only
+        one should recover, or each would charge the same payments.
+        """
+        if recover:
+            for payment in self.payments:
+                if payment.status == PaymentStatus.pending:
+                    self.submit(payment.payment_id)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for timer in self._timers.values():
+            timer.cancel()
+        self._tasks, self._timers = [], {}
+
+    def _gauge(self) -> None:
+        payment_queue_depth.set(value=self.queue.qsize() + len(self._timers))
+
+    async def _next_batch(self) -> List[int]:
+        payment_ids = [await self.queue.get()]
+        while len(payment_ids) < self.batch_size and not self.queue.empty():
+            payment_ids.append(self.queue.get_nowait())
+        self._gauge()
+        return list(dict.fromkeys(payment_ids))
+
+    async def _work(self) -> None:
+        while True:
+            payment_ids = await self._next_batch()
+            try:
+                await self._settle(payment_ids)
+            except Exception:
+                payment_settlement_errors.inc("internal")
+                await self._retry(payment_ids)
+
+    async def _settle(self, payment_ids: List[int]) -> None:
+        batch = [payment for payment in self.payments.get_many(payment_ids)
+                 if payment is not None and payment.status == PaymentStatus.pending]
+        if not batch:
+            return
+        started = time.perf_counter()
+        try:
+            results = await self.processor.settle(batch)
+        except GatewayError:
+            payment_settlement_errors.inc("gateway")
+            await self._retry([payment.payment_id for payment in batch])
+            return
+        finally:
+            payment_batch_duration.observe(time.perf_counter() - started)
+        settled = {payment.payment_id: results[payment.payment_id] for payment in batch
+                   if results.get(payment.payment_id, PaymentStatus.pending) != PaymentStatus.pending}
+        if settled:
+            await self._finish(settled)
+        await self._retry([payment.payment_id for payment in batch if payment.payment_id not in settled])
+
+    async def _finish(self, statuses: Dict[int, PaymentStatus]) -> None:
+        await self.apply(statuses)
+        for payment_id, status in statuses.items():
+            self._attempts.pop(payment_id, None)
+            payments_settled.inc(status.value)
+
+    async def _retry(self, payment_ids: List[int]) -> None:
+        exhausted = {}
+        loop = asyncio.get_running_loop()
+        for payment_id in payment_ids:
+            if payment_id in self._timers:
+                continue
+            attempts = self._attempts.get(payment_id, 0) + 1
+            if attempts >= self.max_attempts:
+                exhausted[payment_id] = PaymentStatus.failed
+                continue
+            self._attempts[payment_id] = attempts
+            delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+            self._timers[payment_id] = loop.call_later(delay, self._requeue, payment_id)
+        self._gauge()
+        if exhausted:
+            await self._finish(exhausted)
+
+    def _requeue(self, payment_id: int) -> None:
+        self._timers.pop(payment_id, None)
+        self.submit(payment_id)
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class SettlementWatch:
+    """Payments observer waking requests that wait for a payment to change."""
+
+    def __init__(self):
+        self._waiters: Dict[int, List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+        self._lock = Lock()
+
+    def _notify(self, payment_id: int) -> None:
+        with self._lock:
+            waiters = self._waiters.pop(payment_id, ())
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+    def insert(self, payment) -> None:
+        self._notify(payment.payment_id)
+
+    def remove(self, payment) -> None:
+        self._notify(payment.payment_id)
+
+    async def wait(self, payment_id: int, timeout: float) -> None:
+        """Return once ``payment_id`` changes, or after ``timeout`` seconds."""
+        loop = asyncio.get_running_loop()
+        waiter = (loop, loop.create_future())
+        with self._lock:
+            self._waiters.setdefault(payment_id, []).append(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(payment_id)
+                if waiters is not None and waiter in waiters:
+                    waiters.remove(waiter)
+                    if not waiters:
+                        del self._waiters[payment_id]
@@ -0,0 +1,99 @@
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, List, Tuple
+
+from sqlalchemy.orm import Session
+
+# ------------------ SQLITE SINGLE-WRITER QUEUE ------------------
+
+class SQLiteWriter:
+    """Runs write functions on one dedicated thread with group commit.
+
+    SQLite allows a single writer at a time, so instead of threads fighting
+    over the write lock (and each paying for its own fsync), writers queue
+    ``fn(db, *args)`` calls here; backends.SQLAlchemyBackend queues its
+    flushes. The writer drains up to ``max_batch`` queued calls and runs
+    them in one transaction, each inside a savepoint of its own: a call
+    that raises is rolled back alone, and the batch still commits once.
+    Calls leave committing to the writer.
+    """
+
+    def __init__(self, engine, max_batch: int = 256, max_wait: float = 0.002):
+        self.engine = engine
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[Tuple[Callable, tuple, Future]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+        self._stopped = threading.Event()
+        self._thread.start()
+
+    def submit(self, fn: Callable[..., Any], *args) -> Future:
+        future: Future = Future()
+        self._queue.put((fn, args, future))
+        return future
+
+    def run(self, fn: Callable[..., Any], *args) -> Any:
+        return self.submit(fn, *args).result()
+
+    async def run_async(self, fn: Callable[..., Any], *args) -> Any:
+        import asyncio
+
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def _next_batch(self) -> List[Tuple[Callable, tuple, Future]]:
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get(timeout=self.max_wait))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not (self._stopped.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._commit(batch)
+
+    def _commit(self, batch) -> None:
+        results = []
+        with self.engine.connect() as connection:
+            transaction = connection.begin()
+            db = Session(bind=connection, expire_on_commit=False)
+            try:
+                for fn, args, future in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    savepoint = db.begin_nested()
+                    try:
+                        result = fn(db, *args)
+                        savepoint.commit()
+                        results.append((future, result, None))
+                    except Exception as exc:
+                        savepoint.rollback()
+                        results.append((future, None, exc))
+                    # Detach what this call loaded so a later rollback in
+                    # the batch cannot expire it.
+                    db.expunge_all()
+                transaction.commit()
+            except Exception as exc:
+                transaction.rollback()
+                for _, _, future in batch:
+                    if not future.cancelled():
+                        future.set_exception(exc)
+                return
+            finally:
+                db.close()
+        for future, result, exc in results:
+            if exc is not None:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
@@ -0,0 +1,155 @@
+from bisect import bisect_left, bisect_right, insort
+from threading import RLock
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# ------------------ IN-MEMORY TABLE ------------------
+
+def update_indexes(indexes: List[Any], old, new, undo: Callable[[], None]) -> None:
+    """Move ``indexes`` from ``old`` to ``new`` once the row is written.
+
+    Either record may be None (an insert or a delete). If an index raises,
+    ``undo`` puts the row back, the indexes already updated are reverted,
+    and the error propagates: the table is left as it was before the call.
+    """
+    removed, inserted = [], []
+    try:
+        if old is not None:
+            for index in indexes:
+                index.remove(old)
+                removed.append(index)
+        if new is not None:
+            for index in indexes:
+                index.insert(new)
+                inserted.append(index)
+    except BaseException:
+        undo()
+        for index in reversed(inserted):
+            index.remove(new)
+        for index in reversed(removed):
+            index.insert(old)
+        raise
+
+
+class Table:
+    """Primary-key indexed, insertion-ordered collection of records.
+
+    Records live in a dict keyed by their primary key, so lookup, replace and
+    delete are O(1) and iteration follows insertion order. IDs come from a
+    monotonic counter and are never reused after a delete. A sorted list of
+    keys alongside the dict gives ordered pages without copying the table.
+
+    Secondary indexes are registered with ``add_index`` and receive
+    ``insert(record)`` / ``remove(record)`` calls for every mutation.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self._rows: Dict[int, Any] = {}
+        self._keys: List[int] = []
+        self._next_id = 1
+        self._indexes: List[Any] = []
+        self.lock = RLock()
+
+    def next_id(self) -> int:
+        with self.lock:
+            record_id = self._next_id
+            self._next_id += 1
+            return record_id
+
+    def peek_id(self) -> int:
+        """The ID ``next_id`` hands out next, without taking it."""
+        return self._next_id
+
+    def skip_ids(self, next_id: int) -> None:
+        """Never hand out an ID below ``next_id``, e.g. one restored by a backend."""
+        with self.lock:
+            self._next_id = max(self._next_id, next_id)
+
+    def add_index(self, index, backfill: bool = True) -> None:
+        with self.lock:
+            if backfill:
+                for record in self._rows.values():
+                    index.insert(record)
+            self._indexes.append(index)
+
+    def get(self, record_id: int) -> Optional[Any]:
+        return self._rows.get(record_id)
+
+    def get_many(self, record_ids: List[int]) -> List[Optional[Any]]:
+        return [self._rows.get(record_id) for record_id in record_ids]
+
+    def add(self, record):
+        with self.lock:
+            record_id = getattr(record, self.key)
+            next_id = self._next_id
+            if record_id >= next_id:
+                self._next_id = record_id + 1
+            old = self._rows.get(record_id)
+            if old is None:
+                if not self._keys or record_id > self._keys[-1]:
+                    self._keys.append(record_id)
+                else:
+                    insort(self._keys, record_id)
+            self._rows[record_id] = record
+
+            def undo():
+                if old is None:
+                    del self._rows[record_id]
+                    del self._keys[bisect_left(self._keys, record_id)]
+                else:
+                    self._rows[record_id] = old
+                self._next_id = next_id
+
+            update_indexes(self._indexes, old, record, undo)
+        return record
+
+    def replace(self, record):
+        with self.lock:
+            record_id = getattr(record, self.key)
+            old = self._rows[record_id]
+            self._rows[record_id] = record
+
+            def undo():
+                self._rows[record_id] = old
+
+            update_indexes(self._indexes, old, record, undo)
+        return record
+
+    def remove(self, record_id: int) -> Optional[Any]:
+        with self.lock:
+            record = self._rows.pop(record_id, None)
+            if record is not None:
+                position = bisect_left(self._keys, record_id)
+                del self._keys[position]
+
+                def undo():
+                    self._rows[record_id] = record
+                    self._keys.insert(position, record_id)
+
+                update_indexes(self._indexes, record, None, undo)
+        return record
+
+    def page(self, after: int = 0, limit: int = 100) -> List[Any]:
+        """Up to ``limit`` records with a primary key greater than ``after``."""
+        with self.lock:
+            start = bisect_right(self._keys, after)
+            return [self._rows[record_id] for record_id in self._keys[start:start + limit]]
+
+    def scan(self, batch_size: int = 1000) -> Iterator[Any]:
+        """Iterate lazily in primary-key order, one page at a time."""
+        after = 0
+        while True:
+            records = self.page(after, batch_size)
+            if not records:
+                return
+            yield from records
+            after = getattr(records[-1], self.key)
+
+    def __contains__(self, record_id: int) -> bool:
+        return record_id in self._rows
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(list(self._rows.values()))
+
+    def __len__(self) -> int:
+        return len(self._rows)
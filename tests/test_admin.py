@@ -0,0 +1,39 @@
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi.testclient import TestClient
+
+import main
+
+
+def test_admin_routes_are_off_without_a_token(monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", None)
+    client = TestClient(main.app)
+    assert client.get("/admin/export/flights").status_code == 403
+    assert client.post("/admin/import/flights", content=b"").status_code == 403
+
+
+def test_admin_routes_need_the_configured_token(monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+    client = TestClient(main.app)
+    assert client.get("/admin/export/flights").status_code == 403
+    assert client.get("/admin/export/flights", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.get("/admin/export/flights", headers={"X-Admin-Token": "secret"}).status_code == 200
+
+
+def test_rejected_import_rows_use_up_no_ids(monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+    client = TestClient(main.app)
+    rows = [{"name": "A", "location": "L", "available_rooms": 1, "price_per_night": 10.0},
+            {"name": "B", "location": "L", "available_rooms": -1.5, "price_per_night": 10.0},
+            {"name": "C", "location": "L", "available_rooms": 1, "price_per_night": 10.0}]
+    upload = io.BytesIO()
+    pq.write_table(pa.Table.from_pylist(rows), upload)
+    first = main.hotels_db.peek_id()
+
+    response = client.post("/admin/import/hotels", content=upload.getvalue(),
+                           headers={"X-Admin-Token": "secret"})
+    assert response.json()["imported"] == 2 and response.json()["failed"] == 1
+    assert [main.hotels_db.get(hotel_id).name for hotel_id in (first, first + 1)] == ["A", "C"]
+    assert main.hotels_db.peek_id() == first + 2
@@ -0,0 +1,90 @@
+import asyncio
+
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from admission import AdmissionMiddleware, Limit, SingleFlight
+
+
+def service(delay=0.05):
+    """An app with a slow ``/hot/{id}`` route and a ``/cold`` route, counting the calls it serves."""
+    calls = []
+
+    async def hot(request):
+        calls.append(request.url.path)
+        await asyncio.sleep(delay)
+        return JSONResponse({"id": request.path_params["id"], "call": len(calls)})
+
+    async def cold(request):
+        calls.append(request.url.path)
+        await asyncio.sleep(delay)
+        return JSONResponse({"call": len(calls)})
+
+    app = Starlette(routes=[Route("/hot/{id}", hot), Route("/cold", cold)])
+    return app, calls
+
+
+def fetch(app, paths, headers=None):
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(client.get(path, headers=headers) for path in paths))
+
+    return asyncio.run(run())
+
+
+def test_requests_beyond_the_queue_are_shed():
+    app, calls = service()
+    admitted = AdmissionMiddleware(app, app.routes, {"/cold": Limit(concurrency=1, queue=1, timeout=1)},
+                                   default=Limit(concurrency=8), retry_after=3)
+    responses = fetch(admitted, ["/cold"] * 4)
+
+    assert sorted(response.status_code for response in responses) == [200, 200, 503, 503]
+    assert len(calls) == 2
+    shed = next(response for response in responses if response.status_code == 503)
+    assert shed.headers["retry-after"] == "3"
+
+
+def test_requests_waiting_past_their_budget_are_shed():
+    app, calls = service(delay=0.2)
+    admitted = AdmissionMiddleware(app, app.routes, {}, default=Limit(concurrency=1, queue=4, timeout=0.01))
+    responses = fetch(admitted, ["/cold", "/hot/1"])
+
+    assert [response.status_code for response in responses] == [200, 503]
+    assert calls == ["/cold"]
+
+
+def test_identical_reads_share_one_call():
+    app, calls = service()
+    admitted = AdmissionMiddleware(app, app.routes, {}, default=Limit(concurrency=8), coalesce=["/hot/{id}"])
+    responses = fetch(admitted, ["/hot/1"] * 5 + ["/hot/2"])
+
+    assert sorted(calls) == ["/hot/1", "/hot/2"]
+    assert len({response.content for response in responses[:5]}) == 1
+    assert responses[5].json()["id"] == "2"
+
+
+def test_routes_outside_coalesce_run_every_call():
+    app, calls = service()
+    admitted = AdmissionMiddleware(app, app.routes, {}, default=Limit(concurrency=8), coalesce=["/hot/{id}"])
+    fetch(admitted, ["/cold"] * 3)
+    assert len(calls) == 3
+
+
+def test_single_flight_shares_errors():
+    async def run():
+        flights, started = SingleFlight(), []
+
+        async def fail():
+            started.append(1)
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(*(flights.do("key", fail) for _ in range(3)), return_exceptions=True)
+        return results, started
+
+    results, started = asyncio.run(run())
+    assert len(started) == 1
+    assert all(isinstance(result, ValueError) for result in results)
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from aggregates import GroupTotals, Verifier, verify
+from Schema import Payment, PaymentMethod, PaymentStatus
+from store import Table
+
+
+def payment(payment_id, amount, status=PaymentStatus.pending):
+    return Payment(payment_id=payment_id, booking_id=1, payment_date=datetime(2030, 1, 1), amount=amount,
+                   method=PaymentMethod.credit_card, status=status)
+
+
+def payments():
+    table, totals = Table("payment_id"), GroupTotals("status", "amount")
+    table.add_index(totals)
+    for payment_id in range(1, 11):
+        table.add(payment(payment_id, 0.1))
+    return table, totals
+
+
+def test_totals_follow_updates_and_deletes():
+    table, totals = payments()
+    table.replace(payment(1, 0.1, PaymentStatus.successful))
+    table.replace(payment(2, 0.3, PaymentStatus.successful))
+    table.remove(3)
+
+    assert (totals.count("pending"), totals.total("pending")) == (7, 0.7)
+    assert (totals.count("successful"), totals.total("successful")) == (2, 0.4)
+    assert totals.count("failed") == 0 and "failed" not in totals.counts
+    assert verify(table, totals) == 0
+
+
+def test_verify_corrects_drift():
+    table, totals = payments()
+    totals.counts["pending"] += 2
+    totals.cents["failed"] = 500
+    verifier = Verifier({"payments": (table, totals)})
+
+    assert verifier.run() == {"payments": 2}
+    assert totals.state() == {("pending", "count"): 10, ("pending", "cents"): 100}
+    assert verifier.run() == {"payments": 0}
+    assert verifier.corrections == {"payments": 2} and verifier.runs == 2
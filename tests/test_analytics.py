@@ -0,0 +1,69 @@
+from datetime import date, datetime
+
+import analytics
+from columns import ColumnStore
+from Schema import Booking, BookingType, Flight, Hotel, Payment, PaymentMethod, PaymentStatus
+from store import Table
+
+
+def columns(key, spec, records):
+    table, store = Table(key), ColumnStore(key, spec)
+    table.add_index(store)
+    for record in records:
+        table.add(record)
+    return store
+
+
+def booking(booking_id, amount):
+    return Booking(booking_id=booking_id, user_id=1, booking_type=BookingType.hotel, hotel_id=1,
+                   check_in=datetime(2030, 1, 1), check_out=datetime(2030, 1, 2),
+                   booking_date=datetime(2029, 12, 1), total_amount=amount)
+
+
+def payment(payment_id, booking_id, status):
+    return Payment(payment_id=payment_id, booking_id=booking_id, payment_date=datetime(2029, 12, 1),
+                   amount=1.0, method=PaymentMethod.cash, status=status)
+
+
+def test_bookings_revenue_applies_the_status_filter():
+    bookings = columns("booking_id", analytics.BOOKING_COLUMNS, [booking(1, 100.0), booking(2, 50.0)])
+    payments = columns("payment_id", analytics.PAYMENT_COLUMNS, [
+        payment(1, 1, PaymentStatus.successful), payment(2, 2, PaymentStatus.pending)])
+    flights = columns("flight_id", analytics.FLIGHT_COLUMNS, [])
+
+    def total(status):
+        return analytics.revenue(payments, bookings, flights, set(), "day", "bookings", status)
+
+    assert total(None) == [{"key": "2029-12-01", "revenue": 150.0, "count": 2}]
+    assert total(PaymentStatus.successful) == [{"key": "2029-12-01", "revenue": 100.0, "count": 1}]
+    assert total(PaymentStatus.failed) == []
+
+
+def test_occupancy_counts_held_hotel_nights_in_the_window():
+    hotels = columns("hotel_id", analytics.HOTEL_COLUMNS, [
+        Hotel(hotel_id=1, name="H", location="L", available_rooms=2, price_per_night=10.0)])
+    stays = [booking(1, 10.0).copy(update={"check_in": datetime(2029, 12, 30), "check_out": datetime(2030, 1, 2)}),
+             booking(2, 10.0), booking(3, 10.0),
+             booking(4, 10.0).copy(update={"booking_type": BookingType.flight, "flight_id": 1})]
+    bookings = columns("booking_id", analytics.BOOKING_COLUMNS, stays)
+
+    # Window of 4 nights x 2 rooms; bookings 1 and 2 hold one night each in
+    # it, booking 3 is released and booking 4 is a flight.
+    result = analytics.occupancy(hotels, bookings, {3}, date(2030, 1, 1), date(2030, 1, 5))
+    assert [(row["room_nights"], row["occupancy"]) for row in result] == [(2, 0.25)]
+
+
+def test_load_factor_counts_held_seats():
+    flights = columns("flight_id", analytics.FLIGHT_COLUMNS, [
+        Flight(flight_id=flight_id, flight_number=f"F{flight_id}", departure_city="X", arrival_city="Y",
+               departure_time=datetime(2030, 1, 1, 10), arrival_time=datetime(2030, 1, 1, 12),
+               airline=airline, price=100.0, seats_available=3) for flight_id, airline in ((1, "A"), (2, "B"))])
+    seats = [Booking(booking_id=booking_id, user_id=1, booking_type=BookingType.flight, flight_id=flight_id,
+                     booking_date=datetime(2029, 12, 1), total_amount=100.0)
+             for booking_id, flight_id in ((1, 1), (2, 2), (3, 2), (4, 2))]
+    # A hotel booking carrying a flight_id takes no seat.
+    bookings = columns("booking_id", analytics.BOOKING_COLUMNS, seats + [booking(5, 10.0).copy(update={"flight_id": 1})])
+
+    result = analytics.load_factor(flights, bookings, {4})
+    assert [(row["flight_id"], row["seats_sold"], row["load_factor"]) for row in result] == [(2, 2, 0.4), (1, 1, 0.25)]
+    assert [row["flight_id"] for row in analytics.load_factor(flights, bookings, set(), airline="A")] == [1]
@@ -0,0 +1,16 @@
+import pyarrow as pa
+
+import arrow_io
+from Schema import Hotel
+
+
+def test_rows_without_a_key_are_validated_before_getting_one():
+    batch = pa.RecordBatch.from_pylist([
+        {"hotel_id": None, "name": "A", "location": "L", "available_rooms": 1, "price_per_night": 10.0},
+        {"hotel_id": None, "name": "B", "location": "L", "available_rooms": -1.5, "price_per_night": 10.0},
+        {"hotel_id": 7, "name": "C", "location": "L", "available_rooms": 1, "price_per_night": 10.0},
+    ])
+    (new, ok), (bad, error), (known, _) = arrow_io.validate_rows(batch, Hotel, "hotel_id")
+    assert ok is None and new.name == "A" and new.hotel_id is None
+    assert bad is None and "available_rooms" in error
+    assert known.hotel_id == 7
@@ -0,0 +1,22 @@
+from datetime import date, datetime
+
+from availability import OccupancyIndex
+from Schema import Booking, BookingType
+
+
+def booking(booking_id, booking_type):
+    return Booking(booking_id=booking_id, user_id=1, booking_type=booking_type, hotel_id=1,
+                   check_in=datetime(2030, 1, 1), check_out=datetime(2030, 1, 3),
+                   booking_date=datetime(2029, 12, 1), total_amount=10.0)
+
+
+def test_only_hotel_bookings_occupy_rooms():
+    occupancy = OccupancyIndex()
+    occupancy.insert(booking(1, BookingType.hotel))
+    occupancy.insert(booking(2, BookingType.flight))
+    assert occupancy.booked(1, date(2030, 1, 1), date(2030, 1, 3)) == 1
+
+    occupancy.remove(booking(2, BookingType.flight))
+    assert occupancy.booked(1, date(2030, 1, 1), date(2030, 1, 3)) == 1
+    occupancy.remove(booking(1, BookingType.hotel))
+    assert occupancy.booked(1, date(2030, 1, 1), date(2030, 1, 3)) == 0
@@ -0,0 +1,213 @@
+import asyncio
+import sqlite3
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+from backends import JournalBackend, SharedJournalBackend, SQLAlchemyBackend
+from idempotency import IdempotencyStore
+from Schema import Flight, IdempotentResponse
+from store import Table
+
+
+def flight(flight_id):
+    return Flight(flight_id=flight_id, flight_number="F1", departure_city="X", arrival_city="Y",
+                  departure_time=datetime(2030, 1, 1, 10), arrival_time=datetime(2030, 1, 1, 12),
+                  airline="A", price=100.0, seats_available=5)
+
+
+def restart_after_delete(make_backend):
+    async def run():
+        flights = Table("flight_id")
+        backend = make_backend()
+        backend.attach({"flights": (flights, Flight)})
+        await backend.start()
+        flights.add(flight(flights.next_id()))
+        await backend.commit()
+        flights.remove(1)
+        await backend.commit()
+        await backend.stop()
+
+        flights = Table("flight_id")
+        backend = make_backend()
+        backend.attach({"flights": (flights, Flight)})
+        await backend.start()
+        try:
+            return len(flights), flights.next_id()
+        finally:
+            await backend.stop()
+
+    return asyncio.run(run())
+
+
+def test_journal_snapshot_restores_next_id(tmp_path):
+    # stop() writes a snapshot, which the restart loads.
+    assert restart_after_delete(lambda: JournalBackend(str(tmp_path))) == (0, 2)
+
+
+def test_journal_log_replay_restores_next_id(tmp_path):
+    async def run():
+        flights = Table("flight_id")
+        backend = JournalBackend(str(tmp_path))
+        backend.attach({"flights": (flights, Flight)})
+        await backend.start()
+        flights.add(flight(flights.next_id()))
+        flights.remove(1)
+        await backend.commit()
+        # No snapshot on the way down: recovery replays the log.
+        backend._timer.cancel()
+        await asyncio.to_thread(backend._log.close)
+
+        flights = Table("flight_id")
+        backend = JournalBackend(str(tmp_path))
+        backend.attach({"flights": (flights, Flight)})
+        await backend.start()
+        try:
+            return flights.next_id()
+        finally:
+            await backend.stop()
+
+    assert asyncio.run(run()) == 2
+
+
+def test_sqlalchemy_does_not_reuse_deleted_ids(tmp_path):
+    pytest.importorskip("aiosqlite")
+    url = f"sqlite+aiosqlite:///{tmp_path / 'test.db'}"
+    assert restart_after_delete(lambda: SQLAlchemyBackend(url)) == (0, 2)
+
+
+def test_sqlalchemy_writes_through_sqlite_writer(tmp_path, monkeypatch):
+    pytest.importorskip("aiosqlite")
+    import database
+
+    monkeypatch.setattr(database, "SQLITE_TUNING", True)
+    url = f"sqlite+aiosqlite:///{tmp_path / 'test.db'}"
+
+    async def run():
+        flights = Table("flight_id")
+        backend = SQLAlchemyBackend(url)
+        backend.attach({"flights": (flights, Flight)})
+        await backend.start()
+        assert backend.writer is not None
+        flights.add(flight(flights.next_id()))
+        flights.add(flight(flights.next_id()))
+        await backend.commit()
+        flights.remove(2)
+        await backend.commit()
+        await backend.stop()
+
+        flights = Table("flight_id")
+        backend = SQLAlchemyBackend(url)
+        backend.attach({"flights": (flights, Flight)})
+        await backend.start()
+        try:
+            return [record.flight_id for record in flights], flights.next_id()
+        finally:
+            await backend.stop()
+
+    assert asyncio.run(run()) == ([1], 3)
+
+
+def test_sqlalchemy_restart_restores_records_and_idempotency_keys(tmp_path):
+    pytest.importorskip("aiosqlite")
+    url = f"sqlite+aiosqlite:///{tmp_path / 'test.db'}"
+
+    def attach(backend):
+        flights, keys = Table("flight_id"), IdempotencyStore()
+        backend.attach({"flights": (flights, Flight), "idempotency": (keys, IdempotentResponse)})
+        return flights, keys
+
+    async def run():
+        backend = SQLAlchemyBackend(url)
+        flights, keys = attach(backend)
+        await backend.start()
+        flights.add(flight(flights.next_id()))
+        flights.replace(flights.get(1).copy(update={"seats_available": 4}))
+        keys.record("kept", "fingerprint", 201, "application/json", b'{"flight_id": 1}')
+        keys.record("expired", "fingerprint", 201, "application/json", b"{}")
+        keys.replace(keys.get("expired").copy(update={"expires_at": time.time() + 0.05}))
+        await backend.commit()
+        await backend.stop()
+        await asyncio.sleep(0.1)
+
+        backend = SQLAlchemyBackend(url)
+        flights, keys = attach(backend)
+        await backend.start()
+        try:
+            return list(flights), keys.get("kept")
+        finally:
+            await backend.stop()
+
+    records, stored = asyncio.run(run())
+    assert records == [flight(1).copy(update={"seats_available": 4})]
+    assert (stored.status_code, stored.body) == (201, '{"flight_id": 1}')
+    with sqlite3.connect(tmp_path / "test.db") as connection:
+        assert connection.execute("SELECT key FROM idempotency_keys").fetchall() == [("kept",)]
+
+
+def test_sqlite_writer_groups_concurrent_commits(tmp_path, monkeypatch):
+    pytest.importorskip("aiosqlite")
+    import database
+
+    monkeypatch.setattr(database, "SQLITE_TUNING", True)
+    url = f"sqlite+aiosqlite:///{tmp_path / 'test.db'}"
+
+    async def run():
+        flights = Table("flight_id")
+        backend = SQLAlchemyBackend(url)
+        backend.attach({"flights": (flights, Flight)})
+        await backend.start()
+        batches = []
+        commit_batch = backend.writer._commit
+        monkeypatch.setattr(backend.writer, "_commit", lambda batch: batches.append(len(batch)) or commit_batch(batch))
+
+        async def request():
+            flights.add(flight(flights.next_id()))
+            await backend.commit()
+
+        try:
+            await asyncio.gather(*(request() for _ in range(20)))
+            with pytest.raises(Exception, match="readonly"):
+                await backend.read(lambda db: db.execute(text("DELETE FROM flights")))
+            return await backend.read(lambda db: db.execute(text("SELECT COUNT(*) FROM flights")).scalar()), batches
+        finally:
+            await backend.stop()
+
+    count, batches = asyncio.run(run())
+    assert count == 20
+    assert sum(batches) == 20 and len(batches) < 20
+
+
+def test_shared_workers_see_each_others_writes_and_share_ids(tmp_path):
+    async def run():
+        workers = []
+        for _ in range(2):
+            flights, backend = Table("flight_id"), SharedJournalBackend(str(tmp_path))
+            backend.attach({"flights": (flights, Flight)})
+            await backend.start()
+            workers.append((flights, backend))
+        (first, one), (second, two) = workers
+
+        async def write(flights, backend, change):
+            async with backend.writing():
+                change(flights)
+                await backend.commit()
+
+        try:
+            await write(first, one, lambda flights: flights.add(flight(flights.next_id())))
+            two.refresh()
+            seen = [record.flight_id for record in second]
+            # The second worker catches up before writing, so its ID follows.
+            await write(second, two, lambda flights: flights.add(flight(flights.next_id())))
+            await write(second, two, lambda flights: flights.replace(flight(1).copy(update={"seats_available": 4})))
+            one.refresh()
+            return seen, list(first), list(second)
+        finally:
+            for _, backend in workers:
+                await backend.stop()
+
+    seen, first, second = asyncio.run(run())
+    assert seen == [1]
+    assert first == second == [flight(1).copy(update={"seats_available": 4}), flight(2)]
@@ -0,0 +1,29 @@
+import main
+from benchmarks.compare import change
+from benchmarks.data import counts_for, seed
+from benchmarks.mix import MIXES, SCENARIOS, plan
+from store import Table
+
+
+def test_every_scenario_is_an_app_route():
+    routes = {f"{method} {route.path}" for route in main.app.routes for method in getattr(route, "methods", ())}
+    assert set(SCENARIOS) <= routes
+    assert all(set(weights) <= set(SCENARIOS) for weights in MIXES.values())
+
+
+def test_seeded_data_and_plans_are_reproducible():
+    def tables():
+        return {name: Table(key) for name, key in (("users", "user_id"), ("flights", "flight_id"), ("hotels", "hotel_id"),
+                                                   ("bookings", "booking_id"), ("payments", "payment_id"))}
+
+    first, second = tables(), tables()
+    dataset = seed(first, rows=500, seed=3)
+    seed(second, rows=500, seed=3)
+    assert {name: len(table) for name, table in first.items()} == counts_for(500) == dataset.counts
+    assert list(first["bookings"]) == list(second["bookings"])
+    assert plan("browse", 200, dataset, seed=1) == plan("browse", 200, dataset, seed=1)
+
+
+def test_change_is_a_percentage():
+    assert change(200.0, 150.0) == -25.0
+    assert change(0.0, 5.0) == 0.0
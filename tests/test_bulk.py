@@ -0,0 +1,25 @@
+from fastapi.testclient import TestClient
+
+import main
+
+HOTEL = {"name": "H", "location": "L", "available_rooms": 3, "price_per_night": 10.0}
+
+
+def test_bulk_writes_report_failures_by_index():
+    client = TestClient(main.app)
+    created = client.post("/hotels/bulk", json=[HOTEL, dict(HOTEL, price_per_night="free"), HOTEL]).json()
+    first, second = created["succeeded"]
+    assert [error["index"] for error in created["errors"]] == [1]
+    assert "price_per_night" in created["errors"][0]["detail"]
+
+    updated = client.patch("/hotels/bulk", json=[{"hotel_id": first, "available_rooms": 9},
+                                                 {"hotel_id": 987654321, "available_rooms": 1},
+                                                 {"available_rooms": 1}]).json()
+    assert updated["succeeded"] == [first]
+    assert [(error["index"], error["detail"]) for error in updated["errors"]] == [
+        (1, "Hotel not found"), (2, "Invalid item: 'hotel_id'")]
+    assert main.hotels_db.get(first).available_rooms == 9
+
+    deleted = client.request("DELETE", "/hotels/bulk", json=[second, second]).json()
+    assert deleted["succeeded"] == [second] and deleted["errors"][0]["index"] == 1
+    assert second not in main.hotels_db
@@ -0,0 +1,48 @@
+from fastapi.testclient import TestClient
+
+import main
+from cache import ResponseCache, etag_matches
+
+FLIGHT = {"flight_number": "F1", "departure_city": "X", "arrival_city": "Y",
+          "departure_time": "2030-01-01T10:00:00Z", "arrival_time": "2030-01-01T12:00:00Z",
+          "airline": "A", "price": 100.0, "seats_available": 5}
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.put("a", b"1")
+    cache.put("b", b"2")
+    cache.get("a")
+    cache.put("c", b"3")
+    assert cache.get("b") is None
+    assert cache.get("a").body == b"1"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entries_are_misses():
+    cache = ResponseCache(ttl=-1)
+    cache.put("a", b"1")
+    assert cache.get("a") is None
+    assert cache.stats() == {"entries": 0, "hits": 0, "misses": 1, "evictions": 0, "invalidations": 0}
+
+
+def test_etag_matches_lists_weak_tags_and_star():
+    assert etag_matches('"x", W/"y"', '"y"')
+    assert etag_matches("*", '"y"')
+    assert not etag_matches('"x"', '"y"')
+    assert not etag_matches(None, '"y"')
+
+
+def test_conditional_get_and_invalidation_on_write():
+    client = TestClient(main.app)
+    flight_id = client.post("/flights/", json=FLIGHT).json()["flight_id"]
+
+    first = client.get(f"/flights/{flight_id}")
+    etag = first.headers["etag"]
+    assert client.get(f"/flights/{flight_id}").content == first.content
+    assert client.get(f"/flights/{flight_id}", headers={"If-None-Match": etag}).status_code == 304
+
+    client.put(f"/flights/{flight_id}", json=dict(FLIGHT, price=120.0)).raise_for_status()
+    changed = client.get(f"/flights/{flight_id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["price"] == 120.0 and changed.headers["etag"] != etag
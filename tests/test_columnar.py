@@ -0,0 +1,73 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+from columnar import FLIGHT_STORAGE, ColumnarRoutes, ColumnarTable
+from indexes import FieldIndex, RouteIndex
+from Schema import Flight
+from serialization import dumps
+from store import Table
+
+
+def flight(flight_id, airline="A"):
+    return Flight(flight_id=flight_id, flight_number="F1", departure_city="X", arrival_city="Y",
+                  departure_time=datetime(2030, 1, 1, 10), arrival_time=datetime(2030, 1, 1, 12),
+                  airline=airline, price=100.0, seats_available=5)
+
+
+def test_add_over_an_existing_key_reindexes_it():
+    flights = ColumnarTable(Flight, "flight_id", FLIGHT_STORAGE)
+    airlines = FieldIndex("airline", "flight_id")
+    flights.add_index(airlines)
+    flights.add(flight(1, "A"))
+    flights.add(flight(1, "B"))
+
+    assert len(flights) == 1
+    assert airlines.lookup("A") == []
+    assert airlines.lookup("B") == [1]
+
+
+def records(count):
+    """Flights with naive, UTC and offset times, several per route and instant."""
+    rng = random.Random(0)
+    zones = [None, timezone.utc, timezone(timedelta(hours=5, minutes=30)), timezone(timedelta(hours=-8))]
+    for flight_id in range(1, count + 1):
+        departure = datetime(2030, 1, 1) + timedelta(hours=rng.randrange(48))
+        zone = rng.choice(zones)
+        if zone is not None:
+            departure = departure.replace(tzinfo=zone)
+        yield Flight(flight_id=flight_id, flight_number=f"F{flight_id}", departure_city=rng.choice("ABC"),
+                     arrival_city=rng.choice("XY"), departure_time=departure,
+                     arrival_time=departure + timedelta(hours=2), airline=rng.choice("PQ"),
+                     price=float(flight_id), seats_available=5)
+
+
+def catalogs():
+    objects, columnar = Table("flight_id"), ColumnarTable(Flight, "flight_id", FLIGHT_STORAGE)
+    routes, compact = RouteIndex(), ColumnarRoutes()
+    objects.add_index(routes)
+    columnar.add_index(compact)
+    for record in records(200):
+        objects.add(record)
+        columnar.add(record)
+    for flight_id in range(1, 200, 7):
+        objects.remove(flight_id)
+        columnar.remove(flight_id)
+    return (objects, routes), (columnar, compact)
+
+
+def test_records_and_json_match_object_mode():
+    (objects, _), (columnar, _) = catalogs()
+    assert list(columnar) == list(objects)
+    assert dumps(columnar.page(0, 1000)) == dumps(objects.page(0, 1000))
+    assert dumps(columnar.get(2)) == dumps(objects.get(2))
+    assert {record.departure_time.utcoffset() for record in columnar} == {
+        None, timedelta(0), timedelta(hours=5, minutes=30), timedelta(hours=-8)}
+
+
+def test_route_search_matches_route_index():
+    (_, routes), (_, compact) = catalogs()
+    window = datetime(2030, 1, 1, 6, tzinfo=timezone.utc), datetime(2030, 1, 1, 20, tzinfo=timezone.utc)
+    for origin in "ABC":
+        for destination in "XY":
+            assert compact.search(origin, destination) == routes.search(origin, destination)
+            assert compact.search(origin, destination, *window) == routes.search(origin, destination, *window)
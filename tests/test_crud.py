@@ -0,0 +1,49 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import crud
+import models
+import Schema
+from database import Base
+from inventory import InsufficientInventory
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(models.User(user_id=1, name="A", email="a@example.com", role=models.UserRole.customer,
+                                password_hash="x"))
+        session.add(models.Hotel(hotel_id=1, name="H", location="L", available_rooms=1, price_per_night=10.0))
+        session.commit()
+        yield session
+
+
+def stay(check_in, check_out):
+    return Schema.BookingCreate(user_id=1, booking_type=Schema.BookingType.hotel, hotel_id=1,
+                                check_in=datetime(2030, 1, check_in), check_out=datetime(2030, 1, check_out),
+                                booking_date=datetime(2029, 12, 1), total_amount=10.0)
+
+
+def test_hotel_rooms_are_checked_per_night(db):
+    first = crud.create_booking(db, stay(1, 3))
+    with pytest.raises(InsufficientInventory):
+        crud.create_booking(db, stay(2, 4))
+    # Checking out on the 3rd frees the room for that night.
+    crud.create_booking(db, stay(3, 5))
+    assert crud.get_hotel(db, 1).available_rooms == 1
+
+    crud.delete_booking(db, first.booking_id)
+    crud.create_booking(db, stay(2, 3))
+    assert crud.get_hotel(db, 1).available_rooms == 1
+
+
+def test_flight_bookings_do_not_take_hotel_rooms(db):
+    flight = stay(1, 3).copy(update={"booking_type": Schema.BookingType.flight})
+    db.add(models.Booking(booking_id=10, **flight.dict()))
+    db.commit()
+    crud.create_booking(db, stay(1, 3))
@@ -0,0 +1,119 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import main
+from backends import SQLAlchemyBackend
+
+pytest.importorskip("aiosqlite")
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "backend", SQLAlchemyBackend(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}"))
+    main.backend.attach(main.PERSISTED_TABLES)
+    with TestClient(main.app) as client:
+        yield client
+
+
+def record_statements():
+    statements = []
+    event.listen(main.backend.engine.sync_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+def test_lookups_read_the_database(client):
+    user = client.post("/users/", json={"name": "A", "email": "reads@example.com", "role": "Customer", "contact": None,
+                                        "password_hash": "x"}).json()
+    assert client.get(f"/users/{user['user_id']}").json() == user
+
+    # A record only in memory is not in the system of record.
+    main.users_db.remove(user["user_id"])
+    main.backend.pending.clear()
+    assert client.get(f"/users/{user['user_id']}").json() == user
+    assert client.get("/users/999999").status_code == 404
+
+
+def test_list_pages_are_keyset_queries(client):
+    for location in ["Oslo", "Rome", "Oslo", "Oslo"]:
+        client.post("/hotels/", json={"name": "H", "location": location, "available_rooms": 1,
+                                      "price_per_night": 10.0})
+    page = client.get("/hotels/", params={"location": "Oslo", "limit": 2}).json()
+    rest = client.get("/hotels/", params={"location": "Oslo", "limit": 2, "cursor": page["next_cursor"]}).json()
+    ids = [hotel["hotel_id"] for hotel in page["items"] + rest["items"]]
+    assert len(ids) == 3 and ids == sorted(ids) and rest["next_cursor"] is None
+
+    statements = record_statements()
+    client.get("/hotels/", params={"location": "Oslo", "limit": 2, "cursor": page["next_cursor"]})
+    print(statements)
+    assert any("WHERE hotels.hotel_id > ?" in statement for statement in statements)
+
+
+def test_exports_stream_database_rows(client):
+    ids = [client.post("/hotels/", json={"name": f"Export {n}", "location": "Lima", "available_rooms": 1,
+                                         "price_per_night": 10.0}).json()["hotel_id"] for n in range(3)]
+    main.hotels_db.remove(ids[0])
+    main.backend.pending.clear()
+
+    lines = client.get("/hotels/export", params={"format": "ndjson"}).text.splitlines()
+    assert [json.loads(line)["hotel_id"] for line in lines][-3:] == ids
+    rows = client.get("/hotels/export", params={"format": "csv"}).text.splitlines()
+    assert rows[0].startswith("name,location") and rows[-1].startswith("Export 2,Lima")
+
+
+def book(client, count):
+    user = client.post("/users/", json={"name": "T", "email": f"traveller{count}@example.com", "role": "Customer",
+                                        "contact": None, "password_hash": "x"}).json()["user_id"]
+    hotel = client.post("/hotels/", json={"name": "H", "location": "Kyiv", "available_rooms": 100,
+                                          "price_per_night": 10.0}).json()["hotel_id"]
+    flight = client.post("/flights/", json={
+        "flight_number": "F1", "departure_city": "A", "arrival_city": "B", "departure_time": "2030-01-01T10:00:00",
+        "arrival_time": "2030-01-01T12:00:00", "airline": "X", "price": 10.0, "seats_available": 100,
+    }).json()["flight_id"]
+    bookings = []
+    for day in range(1, count + 1):
+        booking = client.post("/bookings/", json={
+            "user_id": user, "booking_type": "hotel", "hotel_id": hotel, "flight_id": flight,
+            "check_in": f"2030-02-{day:02}T00:00:00", "check_out": f"2030-02-{day + 1:02}T00:00:00",
+            "booking_date": "2030-01-01T00:00:00", "total_amount": 10.0}).json()["booking_id"]
+        client.post("/payments/", json={"booking_id": booking, "payment_date": "2030-01-01T00:00:00",
+                                        "amount": 10.0, "method": "cash"})
+        bookings.append(booking)
+    return user, bookings
+
+
+def test_booking_details_take_a_fixed_number_of_queries(client):
+    counts = []
+    for size in (2, 6):
+        user, bookings = book(client, size)
+        statements = record_statements()
+        page = client.get(f"/users/{user}/bookings", params={"expand": "flight,hotel,payment"}).json()
+        assert [item["booking_id"] for item in page["items"]] == bookings
+        assert all(item["flight"] and item["hotel"] and item["payment"] and item["user"] is None
+                   for item in page["items"])
+        counts.append(len(statements))
+
+        del statements[:]
+        full = client.get(f"/bookings/{bookings[0]}/full").json()
+        assert full["user"]["user_id"] == user and full["payment"]["booking_id"] == bookings[0]
+        assert len(statements) == 1
+    assert counts[0] == counts[1] == 5
+
+
+def test_bulk_create_is_one_executemany(client):
+    inserts = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO hotels"):
+            inserts.append((len(parameters), executemany))
+
+    event.listen(main.backend.engine.sync_engine, "before_cursor_execute", record)
+    items = [{"name": f"Bulk {n}", "location": "Lima", "available_rooms": 1, "price_per_night": 10.0}
+             for n in range(50)]
+    items.insert(10, {"name": "Broken"})
+    result = client.post("/hotels/bulk", json=items).json()
+    assert len(result["succeeded"]) == 50 and [error["index"] for error in result["errors"]] == [10]
+    assert inserts == [(50, True)]
@@ -0,0 +1,31 @@
+import asyncio
+from types import SimpleNamespace
+
+from export import async_chunks, csv_chunks, ndjson_chunks
+from Schema import ExportFormat
+
+
+def rows(count):
+    return [SimpleNamespace(id=n, name=f"row {n}") for n in range(count)]
+
+
+def collect(records, format, batch_size):
+    async def source():
+        for record in records:
+            yield record
+
+    async def run():
+        return [chunk async for chunk in async_chunks(source(), ["id", "name"], format, batch_size)]
+
+    return asyncio.run(run())
+
+
+def test_async_stream_matches_table_export():
+    for count in (0, 1, 5, 6):
+        assert "".join(collect(rows(count), ExportFormat.csv, 2)) == "".join(csv_chunks(rows(count), ["id", "name"]))
+        assert "".join(collect(rows(count), ExportFormat.ndjson, 2)) == "".join(
+            ndjson_chunks(rows(count), ["id", "name"]))
+
+
+def test_async_stream_is_written_in_batches():
+    assert len(collect(rows(5), ExportFormat.ndjson, 2)) == 3
@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+import pytest
+
+from feed import ChangeFeed, ChangeRecorder
+from store import Table
+
+
+def published(count):
+    feed = ChangeFeed(capacity=8)
+    for record_id in range(1, count + 1):
+        feed.publish("flights", record_id, "created", {"price": 100.0})
+    return feed
+
+
+def test_read_past_the_end_resets_to_the_end():
+    feed = published(3)
+    assert feed.read(5000) == ([], 3, True)
+    assert feed.read(3) == ([], 3, False)
+
+
+def test_read_after_overwrite_reports_missed():
+    feed = published(20)
+    events, cursor, missed = feed.read(2)
+    assert missed and cursor == 20 and len(events) == 8
+
+
+def test_event_ids_carry_the_feed_epoch():
+    feed = published(2)
+    events, _, _ = feed.read(0)
+    event_id = events[1].split(b"\n")[0][len(b"id: "):].decode()
+    assert feed.position(event_id) == 2
+    assert published(2).position(event_id) is None
+    with pytest.raises(ValueError):
+        feed.position("not-an-id")
+
+
+def test_add_over_an_existing_record_publishes_an_update():
+    feed, rows = ChangeFeed(capacity=8), Table("id")
+    rows.add_index(ChangeRecorder(feed, "rows", rows, ["name"]))
+    rows.add(SimpleNamespace(id=1, name="old"))
+    rows.add(SimpleNamespace(id=1, name="new"))
+    events, _, _ = feed.read(0)
+    assert [b"created" in event for event in events] == [True, False]
+    assert b"updated" in events[1]
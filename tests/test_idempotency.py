@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+import main
+from backends import JournalBackend
+from idempotency import IdempotencyStore
+from Schema import IdempotentResponse
+
+
+def journal(directory, ttl=60.0):
+    store = IdempotencyStore(ttl=ttl)
+    backend = JournalBackend(str(directory))
+    backend.attach({"idempotency": (store, IdempotentResponse)})
+    return store, backend
+
+
+def test_keys_survive_restart(tmp_path):
+    async def run():
+        store, backend = journal(tmp_path)
+        await backend.start()
+        store.record("kept", "fingerprint", 201, "application/json", b'{"id": 1}')
+        await backend.commit()
+        await backend.stop()
+
+        store, backend = journal(tmp_path)
+        await backend.start()
+        try:
+            assert store.get("kept").body == '{"id": 1}'
+        finally:
+            await backend.stop()
+
+    asyncio.run(run())
+
+
+def test_restart_after_ttl_drops_expired_keys(tmp_path):
+    async def run():
+        store, backend = journal(tmp_path, ttl=0.05)
+        await backend.start()
+        store.record("expired", "fingerprint", 200, "application/json", b"{}")
+        await backend.commit()
+        await backend.snapshot()
+        store.record("expired-in-log", "fingerprint", 200, "application/json", b"{}")
+        await backend.commit()
+        await backend.stop()
+        await asyncio.sleep(0.1)
+
+        store, backend = journal(tmp_path)
+        await backend.start()
+        try:
+            assert len(store) == 0
+            assert store.get("expired") is None
+        finally:
+            await backend.stop()
+
+    asyncio.run(run())
+
+
+def test_zero_ttl_stores_nothing():
+    store = IdempotencyStore(ttl=0)
+    for attempt in range(3):
+        store.record("key", "fingerprint", 200, "application/json", b"{}")
+    time.sleep(0.001)
+    store.record("other", "fingerprint", 200, "application/json", b"{}")
+    assert store.get("key") is None
+
+
+def test_failed_commit_does_not_record_the_key(monkeypatch):
+    async def fail():
+        raise OSError("disk full")
+
+    hotel = {"name": "H", "location": "L", "available_rooms": 1, "price_per_night": 10.0}
+    monkeypatch.setattr(main.backend, "commit", fail)
+    client = TestClient(main.app, raise_server_exceptions=False)
+    assert client.post("/hotels/", json=hotel, headers={"Idempotency-Key": "unsaved"}).status_code == 500
+    assert main.idempotency_keys.get("unsaved") is None
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+
+import main
+from indexes import DepartureIndex, RouteIndex
+from Schema import Flight
+from store import Table
+
+UTC = timezone.utc
+
+
+def flight(flight_id, departure_time, departure_city="X", arrival_city="Y"):
+    return Flight(flight_id=flight_id, flight_number=f"F{flight_id}", departure_city=departure_city,
+                  arrival_city=arrival_city, departure_time=departure_time,
+                  arrival_time=departure_time + timedelta(hours=2), airline="A", price=100.0,
+                  seats_available=5)
+
+
+def test_route_index_mixes_naive_and_aware_times():
+    index = RouteIndex()
+    naive = flight(1, datetime(2030, 1, 1, 10))
+    aware = flight(2, datetime(2030, 1, 1, 11, tzinfo=timezone(timedelta(hours=2))))
+    index.insert(naive)
+    index.insert(aware)
+
+    assert index.search("X", "Y") == [2, 1]
+    assert index.search("X", "Y", start=datetime(2030, 1, 1, 9, 30, tzinfo=UTC)) == [1]
+    assert index.search("X", "Y", end=datetime(2030, 1, 1, 9, 30)) == [2]
+
+    index.remove(aware)
+    assert index.search("X", "Y") == [1]
+
+
+def test_departure_index_mixes_naive_and_aware_times():
+    index = DepartureIndex()
+    index.insert(flight(1, datetime(2030, 1, 1, 10, tzinfo=UTC)))
+    index.insert(flight(2, datetime(2030, 1, 1, 11)))
+
+    assert index.departing("X", datetime(2030, 1, 1, 11, 30, tzinfo=timezone(timedelta(hours=1)))) == [2]
+
+
+def test_route_index_follows_updates():
+    flights, routes = Table("flight_id"), RouteIndex()
+    flights.add_index(routes)
+    flights.add(flight(1, datetime(2030, 1, 1, 10)))
+    flights.add(flight(2, datetime(2030, 1, 1, 12)))
+    flights.replace(flight(1, datetime(2030, 1, 1, 14)))
+    flights.replace(flight(2, datetime(2030, 1, 1, 12), arrival_city="Z"))
+
+    assert routes.search("X", "Y") == [1]
+    assert routes.search("X", "Z", end=datetime(2030, 1, 1, 12)) == [2]
+    assert routes.search("X", "Y", end=datetime(2030, 1, 1, 13)) == []
+
+
+def test_search_route_filters_window_and_price():
+    client = TestClient(main.app)
+    for hour, price in ((8, 100.0), (10, 300.0), (12, 200.0), (20, 100.0)):
+        client.post("/flights/", json={
+            "flight_number": "S1", "departure_city": "Search-A", "arrival_city": "Search-B",
+            "departure_time": f"2031-03-01T{hour:02d}:00:00Z", "arrival_time": f"2031-03-01T{hour + 2:02d}:00:00Z",
+            "airline": "A", "price": price, "seats_available": 5}).raise_for_status()
+
+    found = client.get("/flights/search", params={
+        "from": "Search-A", "to": "Search-B", "date_from": "2031-03-01T09:00:00Z",
+        "date_to": "2031-03-01T12:00:00Z", "max_price": 250}).json()
+    assert [(item["departure_time"], item["price"]) for item in found] == [("2031-03-01T12:00:00+00:00", 200.0)]
@@ -0,0 +1,76 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+
+from availability import OccupancyIndex
+from inventory import InsufficientInventory, Inventory
+from Schema import Booking, BookingType, Flight, Hotel
+from store import Table
+
+
+def inventory(seats=3, rooms=1):
+    flights, hotels, bookings, occupancy = Table("flight_id"), Table("hotel_id"), Table("booking_id"), OccupancyIndex()
+    bookings.add_index(occupancy)
+    flights.add(Flight(flight_id=1, flight_number="F1", departure_city="X", arrival_city="Y",
+                       departure_time=datetime(2030, 1, 1, 10), arrival_time=datetime(2030, 1, 1, 12),
+                       airline="A", price=100.0, seats_available=seats))
+    hotels.add(Hotel(hotel_id=1, name="H", location="L", available_rooms=rooms, price_per_night=10.0))
+    return Inventory(flights, hotels, bookings, occupancy)
+
+
+def seat(booking_id):
+    return Booking(booking_id=booking_id, user_id=1, booking_type=BookingType.flight, flight_id=1,
+                   booking_date=datetime(2029, 12, 1), total_amount=100.0)
+
+
+def stay(booking_id, check_in, check_out):
+    return Booking(booking_id=booking_id, user_id=1, booking_type=BookingType.hotel, hotel_id=1,
+                   check_in=datetime(2030, 1, check_in), check_out=datetime(2030, 1, check_out),
+                   booking_date=datetime(2029, 12, 1), total_amount=10.0)
+
+
+def test_concurrent_bookings_never_oversell_seats():
+    stock = inventory(seats=10)
+
+    def book(booking_id):
+        try:
+            stock.book(seat(booking_id))
+            return True
+        except InsufficientInventory:
+            return False
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(book, range(1, 51)))
+
+    assert results.count(True) == 10
+    assert len(stock.bookings) == 10
+    assert stock.flights.get(1).seats_available == 0
+
+
+def test_release_and_cancel_return_a_seat_once():
+    stock = inventory(seats=1)
+    stock.book(seat(1))
+    stock.release(stock.bookings.get(1))
+    stock.release(stock.bookings.get(1))
+    assert stock.flights.get(1).seats_available == 1
+
+    stock.cancel(1)
+    assert stock.flights.get(1).seats_available == 1
+
+
+def test_rooms_are_reserved_per_night():
+    stock = inventory(rooms=1)
+    stock.book(stay(1, 1, 3))
+    with pytest.raises(InsufficientInventory):
+        stock.book(stay(2, 2, 4))
+    stock.book(stay(3, 3, 5))
+
+    with pytest.raises(InsufficientInventory):
+        stock.rebook(stock.bookings.get(1), stay(1, 1, 4))
+    assert stock.bookings.get(1) == stay(1, 1, 3)
+
+    stock.release(stock.bookings.get(1))
+    stock.book(stay(4, 1, 3))
+    with pytest.raises(InsufficientInventory):
+        stock.restore(stock.bookings.get(1))
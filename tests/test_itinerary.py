@@ -0,0 +1,78 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from indexes import DepartureIndex
+from itinerary import search_itineraries
+from Schema import Flight, ItinerarySort
+from store import Table
+
+START = datetime(2030, 1, 1)
+
+
+def network(legs):
+    """Tables for ``(from, to, departure hour, arrival hour, price)`` legs."""
+    flights, departures = Table("flight_id"), DepartureIndex()
+    flights.add_index(departures)
+    for origin, destination, departs, arrives, price in legs:
+        flights.add(Flight(flight_id=flights.next_id(), flight_number="F", departure_city=origin,
+                           arrival_city=destination, departure_time=START + timedelta(hours=departs),
+                           arrival_time=START + timedelta(hours=arrives), airline="A", price=price,
+                           seats_available=1))
+    return flights, departures
+
+
+def cost(itinerary, sort):
+    return itinerary.duration_minutes if sort == ItinerarySort.duration else itinerary.total_price
+
+
+def brute_force(flights, origin, destination, k, sort, max_stops):
+    found = []
+
+    def extend(path, visited):
+        if path[-1].arrival_city == destination:
+            found.append(path)
+            return
+        if len(path) > max_stops:
+            return
+        for flight in flights:
+            if (flight.departure_city == path[-1].arrival_city and flight.arrival_city not in visited
+                    and flight.departure_time >= path[-1].arrival_time):
+                extend(path + [flight], visited | {flight.arrival_city})
+
+    for flight in flights:
+        if flight.departure_city == origin and flight.arrival_city != origin:
+            extend([flight], {origin, flight.arrival_city})
+    if sort == ItinerarySort.duration:
+        costs = [(path[-1].arrival_time - path[0].departure_time).total_seconds() / 60 for path in found]
+    else:
+        costs = [sum(flight.price for flight in path) for path in found]
+    return sorted(costs)[:k]
+
+
+def test_duration_sort_is_not_pruned_by_an_earlier_arrival():
+    # Leaving at 0:00 reaches B first, but leaving at 5:00 makes the
+    # shorter trip; only the later departure should be returned.
+    flights, departures = network([
+        ("A", "B", 0, 1, 100), ("A", "B", 5, 7, 100), ("B", "C", 8, 9, 100)])
+    result = search_itineraries(flights, departures, "A", "C", k=1, sort=ItinerarySort.duration)
+    assert [itinerary.duration_minutes for itinerary in result] == [240]
+
+
+@pytest.mark.parametrize("sort", [ItinerarySort.price, ItinerarySort.duration])
+@pytest.mark.parametrize("seed", range(30))
+def test_matches_exhaustive_search(sort, seed):
+    rng = random.Random(seed)
+    cities = "ABCDE"
+    legs = []
+    for _ in range(25):
+        origin, destination = rng.sample(cities, 2)
+        departs = rng.randint(0, 40)
+        legs.append((origin, destination, departs, departs + rng.randint(1, 6), rng.randint(1, 9) * 10))
+    flights, departures = network(legs)
+    for k in (1, 3):
+        result = search_itineraries(flights, departures, "A", "E", k=k, sort=sort, max_stops=3,
+                                    min_layover=timedelta(0))
+        assert [cost(itinerary, sort) for itinerary in result] == brute_force(
+            list(flights), "A", "E", k, sort, max_stops=3)
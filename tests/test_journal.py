@@ -0,0 +1,63 @@
+import asyncio
+import os
+from datetime import datetime
+
+import pytest
+
+from backends import JournalBackend
+from journal import LOG_NAME, CorruptJournal, list_files, read_snapshot, write_snapshot
+from Schema import Flight
+from store import Table
+
+
+def flight(flight_id):
+    return Flight(flight_id=flight_id, flight_number="F1", departure_city="X", arrival_city="Y",
+                  departure_time=datetime(2030, 1, 1, 10), arrival_time=datetime(2030, 1, 1, 12),
+                  airline="A", price=100.0, seats_available=5)
+
+
+async def open_journal(directory):
+    flights, backend = Table("flight_id"), JournalBackend(str(directory))
+    backend.attach({"flights": (flights, Flight)})
+    await backend.start()
+    return flights, backend
+
+
+async def crash(backend):
+    """Stop without the snapshot a clean shutdown writes."""
+    backend._timer.cancel()
+    await asyncio.to_thread(backend._log.close)
+
+
+def test_torn_write_at_the_end_of_the_log_is_cut_off(tmp_path):
+    async def run():
+        flights, backend = await open_journal(tmp_path)
+        flights.add(flight(flights.next_id()))
+        flights.add(flight(flights.next_id()))
+        await backend.commit()
+        await crash(backend)
+        (_, path), = list_files(str(tmp_path), LOG_NAME)
+        with open(path, "ab") as handle:
+            handle.write(b"\x00\x00\x01\x00half a frame")
+
+        flights, backend = await open_journal(tmp_path)
+        recovered = [record.flight_id for record in flights]
+        flights.add(flight(flights.next_id()))
+        await backend.commit()
+        await crash(backend)
+
+        flights, backend = await open_journal(tmp_path)
+        try:
+            return recovered, [record.flight_id for record in flights]
+        finally:
+            await backend.stop()
+
+    assert asyncio.run(run()) == ([1, 2], [1, 2, 3])
+
+
+def test_incomplete_snapshot_is_rejected(tmp_path):
+    path = write_snapshot(str(tmp_path), 7, {"flights": [flight(1).dict()]})
+    with open(path, "r+b") as handle:
+        handle.truncate(os.path.getsize(path) - 3)
+    with pytest.raises(CorruptJournal):
+        list(read_snapshot(path))
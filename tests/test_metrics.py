@@ -0,0 +1,54 @@
+from fastapi.testclient import TestClient
+
+import main
+from metrics import Counter, Histogram, Registry
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    latency = registry.register(Histogram("latency", "Latency.", ("route",), buckets=(0.1, 1.0)))
+    hits = registry.register(Counter("hits", "Hits.", ("route",)))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        latency.observe(value, "/a")
+    hits.inc('say "hi"')
+
+    assert registry.render().splitlines() == [
+        "# HELP latency Latency.",
+        "# TYPE latency histogram",
+        'latency_bucket{route="/a",le="0.1"} 1',
+        'latency_bucket{route="/a",le="1.0"} 3',
+        'latency_bucket{route="/a",le="+Inf"} 4',
+        'latency_sum{route="/a"} 4.05',
+        'latency_count{route="/a"} 4',
+        "# HELP hits Hits.",
+        "# TYPE hits counter",
+        'hits{route="say \\"hi\\""} 1',
+    ]
+
+
+def sample(metrics, series):
+    return next((float(line.rsplit(" ", 1)[1]) for line in metrics.splitlines() if line.startswith(series + " ")), 0)
+
+
+def test_requests_are_counted_by_route_template():
+    client = TestClient(main.app)
+    total = 'http_requests_total{route="/flights/{flight_id}",method="GET",status="404"}'
+    timed = 'http_request_duration_seconds_count{route="/flights/{flight_id}",method="GET"}'
+    before = client.get("/metrics").text
+    for _ in range(3):
+        assert client.get("/flights/987654321").status_code == 404
+    after = client.get("/metrics").text
+
+    assert sample(after, total) - sample(before, total) == 3
+    assert sample(after, timed) - sample(before, timed) == 3
+
+
+def test_profiled_request_returns_a_report_id(monkeypatch):
+    monkeypatch.setattr(main.profiler, "token", "secret")
+    client = TestClient(main.app)
+    response = client.get("/flights/987654321", headers={"X-Profile": "secret"})
+    profile_id = response.headers["x-profile-id"]
+
+    report = client.get(f"/admin/profiles/{profile_id}", headers={"X-Profile": "secret"})
+    assert report.text.startswith("GET /flights/987654321")
+    assert client.get("/admin/profiles", headers={"X-Profile": "wrong"}).status_code == 404
@@ -0,0 +1,44 @@
+import pytest
+
+from columnar import HOTEL_STORAGE, ColumnarTable
+from indexes import FieldIndex
+from pagination import decode_cursor, paginate
+from Schema import Hotel
+from store import Table
+
+
+def hotels(table):
+    filters = {"location": FieldIndex("location", "hotel_id"), "available_rooms": FieldIndex("available_rooms", "hotel_id")}
+    for index in filters.values():
+        table.add_index(index)
+    for hotel_id in range(1, 51):
+        table.add(Hotel(hotel_id=hotel_id, name=f"H{hotel_id}", location="AB"[hotel_id % 2],
+                        available_rooms=hotel_id % 3, price_per_night=10.0))
+    for hotel_id in range(5, 50, 5):
+        table.remove(hotel_id)
+    return filters
+
+
+def walk(table, filters, values, limit):
+    pages, cursor = [], None
+    while True:
+        records, cursor = paginate(table, filters, values, cursor, limit)
+        pages.append([record.hotel_id for record in records])
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("values", [{}, {"location": "A"}, {"location": "B", "available_rooms": 2}])
+def test_pages_cover_every_match_once_in_both_storages(values):
+    for table in (Table("hotel_id"), ColumnarTable(Hotel, "hotel_id", HOTEL_STORAGE)):
+        filters = hotels(table)
+        expected = [hotel.hotel_id for hotel in table
+                    if all(getattr(hotel, field) == value for field, value in values.items())]
+        pages = walk(table, filters, values, limit=7)
+        assert sum(pages, []) == expected
+        assert all(len(page) == 7 for page in pages[:-1])
+
+
+def test_bad_cursors_are_rejected():
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor!")
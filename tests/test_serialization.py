@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+
+import main
+import serialization
+from Schema import Flight
+
+
+def flight(flight_id):
+    return Flight(flight_id=flight_id, flight_number="F1", departure_city="X", arrival_city="Y",
+                  departure_time=datetime(2030, 1, 1, 10, tzinfo=timezone.utc),
+                  arrival_time=datetime(2030, 1, 1, 12, tzinfo=timezone(timedelta(hours=2))),
+                  airline="A", price=100.0, seats_available=5)
+
+
+def test_fallback_encoder_matches_orjson(monkeypatch):
+    content = {"flight": flight(1), "flights": [flight(2)]}
+    fast = serialization.dumps(content)
+    monkeypatch.setattr(serialization, "orjson", None)
+    assert serialization.dumps(content) == fast
+    assert b'"2030-01-01T10:00:00+00:00"' in fast
+
+
+def test_cached_and_uncached_responses_are_identical():
+    record = main.flights_db.add(flight(main.flights_db.next_id()))
+    client = TestClient(main.app)
+    cached = client.get(f"/flights/{record.flight_id}")
+    assert cached.content == serialization.ORJSONResponse(record).body
+    main.response_cache.invalidate(("flights", record.flight_id))
+    assert client.get(f"/flights/{record.flight_id}").headers["etag"] == cached.headers["etag"]
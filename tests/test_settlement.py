@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from backends import SharedJournalBackend
+from Schema import Payment, PaymentMethod, PaymentStatus
+from settlement import FakeGateway, PaymentProcessor, SettlementPipeline
+from store import Table
+
+
+def payments(count, status=PaymentStatus.pending):
+    table = Table("payment_id")
+    for _ in range(count):
+        table.add(Payment(payment_id=table.next_id(), booking_id=1, payment_date=datetime(2030, 1, 1),
+                          amount=10.0, method=PaymentMethod.credit_card, status=status))
+    return table
+
+
+class CountingGateway(FakeGateway):
+    def __init__(self, **options):
+        super().__init__(latency=0, **options)
+        self.charged = []
+
+    async def settle(self, batch):
+        self.charged.extend(payment.payment_id for payment in batch)
+        return await super().settle(batch)
+
+
+def settle(table, gateway, submit=(), recover=True, wait_for=None, **options):
+    """Run a pipeline until ``wait_for`` (default: every payment) is settled, or 5s pass."""
+    async def apply(statuses):
+        for payment_id, status in statuses.items():
+            table.replace(table.get(payment_id).copy(update={"status": status}))
+
+    async def run():
+        pipeline = SettlementPipeline(gateway, table, apply, backoff=0.001, max_backoff=0.01, **options)
+        await pipeline.start(recover=recover)
+        for payment_id in submit:
+            pipeline.submit(payment_id)
+        waiting = wait_for or [payment.payment_id for payment in table]
+        try:
+            for _ in range(500):
+                if all(payment.status != PaymentStatus.pending for payment in table.get_many(waiting)):
+                    return
+                await asyncio.sleep(0.01)
+        finally:
+            await pipeline.stop()
+
+    asyncio.run(run())
+    return {payment.payment_id: payment.status for payment in table}
+
+
+def test_processor_must_implement_settle():
+    with pytest.raises(TypeError):
+        PaymentProcessor()
+
+
+def test_pending_payments_are_settled_in_batches():
+    table = payments(25)
+    gateway = CountingGateway(decline_rate=0)
+    statuses = settle(table, gateway, workers=2, batch_size=10)
+    assert set(statuses.values()) == {PaymentStatus.successful}
+    assert sorted(gateway.charged) == list(range(1, 26))
+
+
+def test_declined_payments_fail():
+    statuses = settle(payments(3), CountingGateway(decline_rate=1))
+    assert set(statuses.values()) == {PaymentStatus.failed}
+
+
+def test_gateway_errors_are_retried():
+    gateway = CountingGateway(decline_rate=0, error_rate=0.5, seed=1)
+    statuses = settle(payments(5), gateway, max_attempts=20)
+    assert set(statuses.values()) == {PaymentStatus.successful}
+    assert len(gateway.charged) > 5
+
+
+def test_payment_fails_after_max_attempts():
+    gateway = CountingGateway(error_rate=1)
+    statuses = settle(payments(2), gateway, max_attempts=3)
+    assert set(statuses.values()) == {PaymentStatus.failed}
+    assert sorted(gateway.charged) == [1, 1, 1, 2, 2, 2]
+
+
+def test_start_without_recover_leaves_old_payments_alone():
+    table = payments(3)
+    gateway = CountingGateway(decline_rate=0)
+    statuses = settle(table, gateway, submit=[2], recover=False, wait_for=[2])
+    assert gateway.charged == [2]
+    assert statuses == {1: PaymentStatus.pending, 2: PaymentStatus.successful, 3: PaymentStatus.pending}
+
+
+def test_only_one_shared_worker_claims_recovery(tmp_path):
+    async def run():
+        workers = [SharedJournalBackend(str(tmp_path)) for _ in range(2)]
+        for worker in workers:
+            worker.attach({"payments": (payments(0), Payment)})
+            await worker.start()
+        try:
+            return [worker.claim("settlement") for worker in workers]
+        finally:
+            for worker in workers:
+                await worker.stop()
+
+    assert asyncio.run(run()) == [True, False]
@@ -0,0 +1,34 @@
+import threading
+
+from sqlalchemy import create_engine, text
+
+from sqlite_writer import SQLiteWriter
+
+
+def insert(db, row_id, fail=False):
+    db.execute(text("INSERT INTO rows (id) VALUES (:id)"), {"id": row_id})
+    if fail:
+        raise ValueError(row_id)
+    return row_id
+
+
+def test_failed_call_is_rolled_back_alone(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE rows (id INTEGER PRIMARY KEY)"))
+    writer = SQLiteWriter(engine)
+    try:
+        # Hold the writer on a first call so the next three queue up and
+        # run as one batch.
+        release = threading.Event()
+        blocker = writer.submit(lambda db: release.wait())
+        futures = [writer.submit(insert, 1), writer.submit(insert, 2, True), writer.submit(insert, 3)]
+        release.set()
+        blocker.result()
+
+        assert futures[0].result() == 1 and futures[2].result() == 3
+        assert isinstance(futures[1].exception(), ValueError)
+    finally:
+        writer.stop()
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT id FROM rows ORDER BY id")).scalars().all() == [1, 3]
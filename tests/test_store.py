@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+
+import pytest
+
+from indexes import FieldIndex
+from store import Table
+
+
+class Refusing:
+    """Index raising on records whose name is "bad"."""
+
+    def insert(self, record):
+        if record.name == "bad":
+            raise TypeError("refused")
+
+    def remove(self, record):
+        pass
+
+
+def table():
+    rows = Table("id")
+    names = FieldIndex("name", "id")
+    rows.add_index(names)
+    rows.add_index(Refusing())
+    return rows, names
+
+
+def test_failed_add_leaves_table_unchanged():
+    rows, names = table()
+    rows.add(SimpleNamespace(id=1, name="good"))
+
+    with pytest.raises(TypeError):
+        rows.add(SimpleNamespace(id=2, name="bad"))
+
+    assert 2 not in rows
+    assert [record.id for record in rows.page()] == [1]
+    assert names.lookup("bad") == []
+    assert rows.next_id() == 2
+
+
+def test_add_over_an_existing_key_reindexes_it():
+    rows, names = table()
+    rows.add(SimpleNamespace(id=1, name="old"))
+    rows.add(SimpleNamespace(id=1, name="new"))
+
+    assert len(rows) == 1
+    assert names.lookup("old") == []
+    assert names.lookup("new") == [1]
+
+
+def test_failed_replace_keeps_old_record_indexed():
+    rows, names = table()
+    rows.add(SimpleNamespace(id=1, name="good"))
+
+    with pytest.raises(TypeError):
+        rows.replace(SimpleNamespace(id=1, name="bad"))
+
+    assert rows.get(1).name == "good"
+    assert names.lookup("good") == [1]
+    assert names.lookup("bad") == []